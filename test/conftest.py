@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 from unittest.mock import Mock, patch, MagicMock
 
 @pytest.fixture(autouse=True)
@@ -15,6 +16,11 @@ def mock_csv_files():
         mock_read_csv.return_value = mock_df
         yield mock_read_csv
 
+@pytest.fixture
+def casos():
+    """Base de casos inteira, como a codificada pelo Dados, para os testes dos backends de índice"""
+    return np.random.default_rng(0).integers(-100, 50, (800, 5)).astype(float)
+
 @pytest.fixture
 def mock_carta():
     """Fixture para criar cartas mock"""
@@ -101,4 +107,13 @@ def mock_cbr():
     cbr.envido = Mock(return_value=1)  # Por padrão aceita envido
     cbr.flor = Mock(return_value=True)  # Por padrão tem flor
     cbr.jogar_carta = Mock(return_value=0)  # Por padrão joga primeira carta
-    return cbr
\ No newline at end of file
+    return cbr
+
+
+@pytest.fixture(autouse=True)
+def limpar_bases_carregadas():
+    """Descarta as bases de casos carregadas por testes anteriores"""
+    from truco.dados import bases_carregadas
+    bases_carregadas.clear()
+    yield
+    bases_carregadas.clear()
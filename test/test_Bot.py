@@ -116,4 +116,36 @@ class TestBot:
         # Assert
         assert bot.mao == []
         assert bot.rodadas == 0
-        assert bot.rodada == 1
\ No newline at end of file
+        assert bot.rodada == 1
+
+    def test_avaliar_truco_usa_heuristica_quando_prazo_expira(self):
+        """Testa se o bot recorre à heurística quando o CBR não responde dentro do prazo"""
+        # Setup
+        bot = Bot("TestBot", prazos={'truco': 0.01})
+        bot.qualidade_mao = 40
+        bot.heuristica = bot.calcular_heuristica()
+        cbr_mock = Mock()
+        cbr_mock.truco.return_value = None
+
+        # Execute
+        resultado = bot.avaliar_truco(cbr_mock, 'truco', 1)
+
+        # Assert
+        assert resultado == 2
+        cbr_mock.truco.assert_called_once_with('truco', 1, 40, prazo=0.01)
+
+    def test_avaliar_envido_usa_resposta_do_cbr_dentro_do_prazo(self):
+        """Testa se a resposta do CBR prevalece sobre a heurística quando chega a tempo"""
+        # Setup
+        bot = Bot("TestBot")
+        bot.envido = 33
+        bot.heuristica = bot.calcular_heuristica()
+        cbr_mock = Mock()
+        cbr_mock.envido.return_value = 0
+
+        # Execute
+        resultado = bot.avaliar_envido(cbr_mock, 6, 1, 0)
+
+        # Assert
+        assert resultado == 0
+        assert bot.heuristica_envido(6, 1) == 2
@@ -0,0 +1,47 @@
+import pytest
+from truco.cache import CacheLRU
+
+
+class TestCache:
+    def test_obter_contabiliza_acertos_e_falhas(self):
+        """Testa os contadores de acertos e falhas"""
+        # Setup
+        cache = CacheLRU(2)
+        cache.guardar('a', 1)
+
+        # Execute
+        cache.obter('a')
+        cache.obter('b')
+
+        # Assert
+        assert cache.acertos == 1
+        assert cache.falhas == 1
+
+    def test_descarta_item_menos_usado(self):
+        """Testa se o item usado há mais tempo é descartado ao exceder a capacidade"""
+        # Setup
+        cache = CacheLRU(2)
+        cache.guardar('a', 1)
+        cache.guardar('b', 2)
+        cache.obter('a')
+
+        # Execute
+        cache.guardar('c', 3)
+
+        # Assert
+        assert cache.obter('b') is None
+        assert cache.obter('a') == 1
+        assert cache.obter('c') == 3
+
+    def test_limpar(self):
+        """Testa se limpar descarta todos os itens"""
+        # Setup
+        cache = CacheLRU()
+        cache.guardar('a', 1)
+
+        # Execute
+        cache.limpar()
+
+        # Assert
+        assert cache.obter('a') is None
+        assert cache.estatisticas()['tamanho'] == 0
@@ -0,0 +1,96 @@
+import os
+import pytest
+import numpy as np
+from truco.cache_casos import assinatura_arquivo, caminho_cache, carregar_cache, salvar_cache
+
+COLUNAS = ['idMao', 'jogadorMao', 'naipeCartaAltaRobo']
+
+
+@pytest.fixture
+def csv_casos(tmp_path):
+    """Arquivo csv fictício: o cache só o lê para validar seu conteúdo"""
+    caminho = tmp_path / 'casos.csv'
+    caminho.write_text('idMao,jogadorMao,naipeCartaAltaRobo\n1,1,ESPADAS\n2,0,COPAS\n')
+    return str(caminho)
+
+
+@pytest.fixture
+def base():
+    """Base codificada como a produzida pelo Dados: matriz int16 em ordem de colunas, índice e quantidades"""
+    return {
+        'colunas_casos': ['jogadorMao', 'naipeCartaAltaRobo'],
+        'nome_indice': 'idMao',
+        'indice_casos': np.array([1, 2]),
+        'matriz': np.asfortranarray([[1, 1], [0, 4]], dtype=np.int16),
+        'quantidades': np.array([1, 1], dtype=np.int32),
+    }
+
+
+class TestCacheCasos:
+    def test_sem_cache_retorna_none(self, csv_casos):
+        """Testa se a carga sem cache gravado, ou sem o csv, retorna None"""
+        # Execute / Assert
+        assert carregar_cache(csv_casos, COLUNAS, assinatura_arquivo(csv_casos)) is None
+        assert carregar_cache(csv_casos, COLUNAS, None) is None
+
+    def test_carga_mapeia_em_memoria(self, csv_casos, base):
+        """Testa se o cache gravado é carregado mapeado em memória, somente leitura, com os mesmos valores"""
+        # Setup
+        salvar_cache(csv_casos, COLUNAS, base, assinatura_arquivo(csv_casos))
+
+        # Execute
+        carregado = carregar_cache(csv_casos, COLUNAS, assinatura_arquivo(csv_casos))
+
+        # Assert
+        assert isinstance(carregado['matriz'], np.memmap)
+        assert not carregado['matriz'].flags.writeable
+        assert carregado['matriz'].flags.f_contiguous
+        assert (carregado['matriz'] == base['matriz']).all()
+        assert carregado['colunas_casos'] == base['colunas_casos']
+        assert carregado['nome_indice'] == 'idMao'
+
+    def test_csv_tocado_sem_alteracao_mantem_cache(self, csv_casos, base):
+        """Testa se uma nova data de modificação com o mesmo conteúdo mantém o cache válido"""
+        # Setup
+        salvar_cache(csv_casos, COLUNAS, base, assinatura_arquivo(csv_casos))
+        estado = os.stat(csv_casos)
+        os.utime(csv_casos, ns=(estado.st_atime_ns, estado.st_mtime_ns + 10 ** 9))
+
+        # Execute
+        carregado = carregar_cache(csv_casos, COLUNAS, assinatura_arquivo(csv_casos))
+
+        # Assert
+        assert carregado is not None
+
+    def test_csv_alterado_invalida_cache(self, csv_casos, base):
+        """Testa se a alteração do conteúdo do csv invalida o cache, mesmo com o mesmo tamanho"""
+        # Setup
+        salvar_cache(csv_casos, COLUNAS, base, assinatura_arquivo(csv_casos))
+        with open(csv_casos, 'r+') as arquivo:
+            arquivo.seek(len('idMao,jogadorMao,naipeCartaAltaRobo\n1,'))
+            arquivo.write('0')
+
+        # Execute / Assert
+        assert carregar_cache(csv_casos, COLUNAS, assinatura_arquivo(csv_casos)) is None
+
+    def test_colunas_diferentes_usam_outro_cache(self, csv_casos, base):
+        """Testa se outro conjunto de colunas não reaproveita o cache gravado"""
+        # Setup
+        salvar_cache(csv_casos, COLUNAS, base, assinatura_arquivo(csv_casos))
+
+        # Execute / Assert
+        assert caminho_cache(csv_casos, COLUNAS[:2]) != caminho_cache(csv_casos, COLUNAS)
+        assert carregar_cache(csv_casos, COLUNAS[:2], assinatura_arquivo(csv_casos)) is None
+
+    def test_csv_alterado_durante_leitura_nao_grava(self, csv_casos, base):
+        """Testa se nada é gravado quando o csv mudou depois da assinatura tirada antes da leitura"""
+        # Setup
+        assinatura = assinatura_arquivo(csv_casos)
+        with open(csv_casos, 'a') as arquivo:
+            arquivo.write('3,1,OURO\n')
+
+        # Execute
+        salvar_cache(csv_casos, COLUNAS, base, assinatura)
+
+        # Assert
+        assert not os.path.exists(caminho_cache(csv_casos, COLUNAS))
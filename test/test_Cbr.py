@@ -0,0 +1,479 @@
+import pytest
+import threading
+import numpy as np
+import pandas as pd
+from unittest.mock import Mock
+from truco.cache import CacheLRU
+from sklearn.neighbors import NearestNeighbors
+from truco.indice_incremental import IndiceIncremental
+from truco.cbr import Cbr, moda_vizinhos, COLUNAS_DECISAO
+from truco.dados import Dados
+from truco.registro import Registro
+
+
+def moda_pandas(jogadas, coluna):
+    """Moda da coluna como no Cbr original: o primeiro valor do value_counts"""
+    return jogadas[coluna].value_counts().index.to_list()[0]
+
+
+def jogar_carta_pandas(jogadas, rodada, pontuacao_cartas):
+    """jogar_carta do Cbr original, sobre os vizinhos já selecionados"""
+    vencidas = jogadas[(((jogadas.ganhadorPrimeiraRodada == 2) & (jogadas.ganhadorSegundaRodada == 2) | (jogadas.ganhadorPrimeiraRodada == 2)) & (jogadas.ganhadorTerceiraRodada == 2)) | ((jogadas.ganhadorSegundaRodada == 2) & (jogadas.ganhadorTerceiraRodada == 2))]
+    valor_referencia = moda_pandas(vencidas, {3: 'primeiraCartaRobo', 2: 'segundaCartaRobo', 1: 'terceiraCartaRobo'}[rodada])
+    if (valor_referencia <= 0):
+        return -1
+
+    return pontuacao_cartas.index(min(pontuacao_cartas, key=lambda x: abs(x - valor_referencia)))
+
+
+def truco_pandas(jogadas, qualidade_mao_bot):
+    """truco do Cbr original, sobre os vizinhos já selecionados"""
+    ganhas = jogadas[jogadas.quemGanhouTruco == 2]
+    vencidas = moda_pandas(ganhas, 'quemGanhouTruco')
+    perdidas = moda_pandas(jogadas[jogadas.quemGanhouTruco == 1], 'quemGanhouTruco')
+    qualidade_mao_humana = moda_pandas(ganhas, 'qualidadeMaoHumano')
+    if (vencidas > perdidas and qualidade_mao_bot > qualidade_mao_humana):
+        return 2
+
+    return 1 if qualidade_mao_bot > qualidade_mao_humana else 0
+
+
+def envido_pandas(jogadas, tipo, quem_pediu, pontos_envido_robo, robo_perdendo):
+    """envido do Cbr original, sobre os vizinhos já selecionados"""
+    ganhas = jogadas[(jogadas.pontosEnvidoRobo > jogadas.pontosEnvidoHumano) | (jogadas.quemGanhouEnvido == 2)]
+    perdidas = jogadas[(jogadas.pontosEnvidoRobo < jogadas.pontosEnvidoHumano) | (jogadas.quemGanhouEnvido == 1)]
+    envido_ganhas = moda_pandas(ganhas, 'quemGanhouEnvido')
+    envido_perdidas = moda_pandas(perdidas, 'quemGanhouEnvido')
+    real_envido_favoravel = moda_pandas(ganhas, 'quemPediuRealEnvido') > moda_pandas(perdidas, 'quemPediuFaltaEnvido') and envido_ganhas > envido_perdidas
+    falta_envido_favoravel = moda_pandas(ganhas, 'quemPediuFaltaEnvido') > moda_pandas(perdidas, 'quemPediuFaltaEnvido')
+    pontos_maiores = moda_pandas(ganhas, 'pontosEnvidoHumano') < pontos_envido_robo
+    if (quem_pediu == 2 and pontos_envido_robo > 5):
+        if (pontos_maiores and real_envido_favoravel):
+            return 8 if robo_perdendo else 7
+        elif (envido_ganhas != envido_perdidas):
+            return 8 if robo_perdendo else 6
+
+    if (tipo == 6):
+        if (pontos_maiores and real_envido_favoravel):
+            return 2
+        elif (real_envido_favoravel and robo_perdendo):
+            return 3
+
+        return 1 if envido_ganhas != envido_perdidas else 0
+
+    if (tipo == 7):
+        return 1 if pontos_maiores or real_envido_favoravel else 0
+
+    return 1 if pontos_maiores or (falta_envido_favoravel and pontos_maiores) else 0
+
+
+class TestCbr:
+    def test_moda_vizinhos_empate_como_value_counts(self):
+        """Testa se os empates são resolvidos pelo vizinho mais próximo, como no value_counts"""
+        # Setup
+        valores = np.array([[3, 1, 1, 3, 2], [5, 4, 2, 2, 4]])
+
+        # Execute
+        moda, suporte = moda_vizinhos(valores)
+
+        # Assert
+        assert moda.tolist() == [pd.Series(linha).value_counts().index[0] for linha in valores]
+        assert suporte.tolist() == [2, 2]
+
+    def test_moda_vizinhos_respeita_mascara(self):
+        """Testa se apenas os vizinhos selecionados pela máscara são contados"""
+        # Setup
+        valores = np.array([[-100, -100, 7, 7, 9]])
+        mascara = np.array([[False, False, False, True, True]])
+
+        # Execute
+        moda, suporte = moda_vizinhos(valores, mascara)
+
+        # Assert
+        assert moda.tolist() == [7]
+        assert suporte.tolist() == [1]
+
+    def test_moda_vizinhos_sem_suporte(self):
+        """Testa se uma linha sem vizinhos selecionados retorna suporte zero"""
+        # Setup
+        valores = np.array([[1, 2, 3], [1, 1, 2]])
+        mascara = np.array([[False, False, False], [True, True, True]])
+
+        # Execute
+        moda, suporte = moda_vizinhos(valores, mascara)
+
+        # Assert
+        assert suporte.tolist() == [0, 2]
+        assert moda[1] == 1
+
+    def test_moda_vizinhos_com_pesos(self):
+        """Testa se cada vizinho conta tantas vezes quanto o seu peso"""
+        # Setup
+        valores = np.array([[3, 1, 1, 3]])
+        pesos = np.array([[3, 1, 1, 0]])
+
+        # Execute
+        moda, suporte = moda_vizinhos(valores, pesos=pesos)
+
+        # Assert
+        assert moda.tolist() == [3]
+        assert suporte.tolist() == [3]
+
+    def test_pesos_vizinhos_limitados_a_k(self):
+        """Testa se as quantidades dos vizinhos são truncadas para somar k, como na base sem deduplicação"""
+        # Setup
+        cbr = Cbr.__new__(Cbr)
+        cbr.casos = {'quantidadeCasos': np.array([2, 1, 3, 1], dtype=np.int32)}
+        indices = np.array([[2, 0, 1, 3], [1, 3, 0, 2]])
+
+        # Execute
+        pesos = cbr.pesos_vizinhos(indices)
+
+        # Assert
+        assert pesos.tolist() == [[3, 1, 0, 0], [1, 1, 2, 0]]
+
+    def test_consultar_vizinhos_com_prazo_excedido(self):
+        """Testa se a consulta que excede o prazo retorna None, é contabilizada e tem o resultado guardado no cache ao terminar"""
+        # Setup
+        liberar = threading.Event()
+        cbr = Cbr.__new__(Cbr)
+        cbr.colunas_decisao = {'truco': ['a']}
+        cbr.cache_vizinhos = CacheLRU()
+        cbr.executor = None
+        cbr.busca_em_andamento = None
+        cbr.consultas_com_prazo = {'truco': 0}
+        cbr.prazos_excedidos = {'truco': 0}
+        cbr.chave_consulta = Mock(return_value=('chave', np.zeros((1, 1))))
+        cbr.vizinhos_adaptativos = lambda decisao, consulta: [(np.array([0]), liberar.wait() and np.array([[4, 2]]))]
+
+        # Execute
+        resultado = cbr.consultar_vizinhos('truco', prazo=0.01)
+        liberar.set()
+        cbr.executor.shutdown(wait=True)
+
+        # Assert
+        assert resultado is None
+        assert cbr.estatisticas_prazo() == {'truco': {'consultas': 1, 'excedidos': 1}}
+        assert cbr.consultar_vizinhos('truco', prazo=0.01).tolist() == [4, 2]
+
+    def test_consultar_vizinhos_com_busca_em_andamento(self):
+        """Testa se, com uma busca atrasada ainda em execução, a nova consulta retorna None sem enfileirar outra busca"""
+        # Setup
+        liberar = threading.Event()
+        cbr = Cbr.__new__(Cbr)
+        cbr.colunas_decisao = {'truco': ['a']}
+        cbr.cache_vizinhos = CacheLRU()
+        cbr.executor = None
+        cbr.busca_em_andamento = None
+        cbr.consultas_com_prazo = {'truco': 0}
+        cbr.prazos_excedidos = {'truco': 0}
+        cbr.chave_consulta = Mock(side_effect=[('chave1', np.zeros((1, 1))), ('chave2', np.ones((1, 1)))])
+        buscas = Mock(side_effect=lambda decisao, consulta: [(np.array([0]), liberar.wait() and np.array([[4, 2]]))])
+        cbr.vizinhos_adaptativos = buscas
+        cbr.consultar_vizinhos('truco', prazo=0.01)
+
+        # Execute
+        resultado = cbr.consultar_vizinhos('truco', prazo=10)
+        liberar.set()
+        cbr.executor.shutdown(wait=True)
+
+        # Assert
+        assert resultado is None
+        assert buscas.call_count == 1
+        assert cbr.estatisticas_prazo() == {'truco': {'consultas': 2, 'excedidos': 2}}
+
+    def test_indice_e_consulta_na_mesma_projecao(self, monkeypatch):
+        """Testa se o índice de cada decisão é treinado nas colunas declaradas e se a consulta projeta o registro nas mesmas colunas, na mesma ordem"""
+        # Setup
+        registro = Registro(sorted({coluna for colunas in COLUNAS_DECISAO.values() for coluna in colunas}))
+        for posicao, coluna in enumerate(registro.colunas):
+            registro.definir(coluna, posicao + 1)
+        cbr = Cbr.__new__(Cbr)
+        cbr.dataset = pd.DataFrame([registro.valores, 2 * registro.valores], columns=registro.colunas)
+        cbr.backend = 'ball_tree'
+        cbr.parametros_backend = {}
+        cbr.colunas_decisao = COLUNAS_DECISAO
+        cbr.colunas_particao = []
+        monkeypatch.setattr('truco.cbr.obter_indice', lambda caminho, colunas, construir, parametros, reconstruir: construir())
+
+        for decisao, colunas in COLUNAS_DECISAO.items():
+            # Execute
+            nbrs = cbr.carregar_indice(colunas)
+            consulta, _ = cbr.codificar_consulta(registro, decisao)
+
+            # Assert
+            assert nbrs._fit_X.shape == (2, len(colunas))
+            assert consulta.shape == (1, len(colunas))
+            assert (nbrs._fit_X[0] == consulta[0]).all()
+
+    def test_n_probe_nao_reconstroi_indice(self, tmp_path, monkeypatch):
+        """Testa se mudar o n_probe do ivf reaproveita o artefato persistido, sem treinar nem remover índices, e vale no índice carregado"""
+        # Setup
+        caminho = tmp_path / 'casos.csv'
+        caminho.write_text('idMao,jogadorMao\n1,1\n')
+        monkeypatch.setattr('truco.cbr.CAMINHO_CASOS', str(caminho))
+        cbr = Cbr.__new__(Cbr)
+        cbr.dataset = pd.DataFrame(np.random.default_rng(0).integers(0, 30, size=(200, 2)), columns=['a', 'b'])
+        cbr.backend = 'ivf'
+        cbr.parametros_backend = {'n_clusters': 8, 'n_probe': 2}
+        treinos = Mock(side_effect=cbr.vizinhos_proximos)
+        cbr.vizinhos_proximos = treinos
+        cbr.carregar_indice(['a', 'b'])
+
+        # Execute
+        cbr.parametros_backend = {'n_clusters': 8, 'n_probe': 6}
+        nbrs = cbr.carregar_indice(['a', 'b'])
+
+        # Assert
+        assert treinos.call_count == 1
+        assert nbrs.n_probe == 6
+        assert len(list(tmp_path.glob('*.indice'))) == 1
+
+    def test_envido_consulta_com_pontos_do_bot(self):
+        """Testa se a consulta do envido é feita com os pontos do bot e o pedido gravados no registro"""
+        # Setup
+        cbr = Cbr.__new__(Cbr)
+        cbr.dados = Dados()
+        cbr.colunas_decisao = COLUNAS_DECISAO
+        cbr.colunas_particao = []
+        cbr.tabela = None
+        consultas = []
+        cbr.consultar_vizinhos = lambda decisao, prazo: consultas.append(cbr.codificar_consulta(cbr.dados.registro, decisao)[0])
+
+        # Execute
+        cbr.envido(6, 1, 29)
+
+        # Assert
+        projecao = dict(zip(COLUNAS_DECISAO['envido'], consultas[0][0]))
+        assert projecao['pontosEnvidoRobo'] == 29
+        assert projecao['quemPediuEnvido'] == 1
+
+    def criar_cbr_adaptativo(self, vencidas, k_maximo):
+        """Cbr mínimo sobre casos em uma reta (posição = distância da consulta 0), com o rótulo bot_venceu_mao informado"""
+        casos = np.arange(len(vencidas), dtype=float).reshape(-1, 1)
+        construir = lambda X: NearestNeighbors(n_neighbors=2, algorithm='ball_tree').fit(X)
+        cbr = Cbr.__new__(Cbr)
+        cbr.colunas_decisao = {'jogar_carta': ['a']}
+        cbr.nbrs = {'jogar_carta': IndiceIncremental(construir(casos), construir)}
+        cbr.rotulos = {'bot_venceu_mao': np.array(vencidas)}
+        cbr.casos = {'quantidadeCasos': np.ones(len(vencidas), dtype=np.int32), 'terceiraCartaRobo': np.array([7, 5, 3, 3, 9, 9, 9, 9])}
+        cbr.tamanho_casos = len(vencidas)
+        cbr.suporte_minimo = 1
+        cbr.k_maximo = k_maximo
+        cbr.expansoes = {'jogar_carta': {}}
+        cbr.fallbacks_marginais = {'jogar_carta': 0}
+        cbr.modas_globais = {}
+        return cbr
+
+    def test_vizinhos_adaptativos_dobra_k_sem_suporte(self):
+        """Testa se k dobra apenas para as consultas sem vizinhos no filtro, registrando a expansão"""
+        # Setup
+        cbr = self.criar_cbr_adaptativo([False, False, False, True, False, False, False, False], k_maximo=8)
+
+        # Execute
+        grupos = list(cbr.vizinhos_adaptativos('jogar_carta', np.array([[0.0], [3.0]])))
+
+        # Assert
+        assert [linhas.tolist() for linhas, _ in grupos] == [[1], [0]]
+        assert grupos[1][1].shape == (1, 4)
+        assert cbr.estatisticas_expansao() == {'jogar_carta': {'expansoes': {4: 1}, 'marginais': 0}}
+
+    def test_vizinhos_adaptativos_busca_expansoes_uma_vez(self):
+        """Testa se as expansões sucessivas usam prefixos de uma única busca com k_maximo, sem voltar ao índice a cada k"""
+        # Setup
+        cbr = self.criar_cbr_adaptativo([False, False, False, False, False, False, False, True], k_maximo=8)
+        busca = cbr.nbrs['jogar_carta'].kneighbors
+        cbr.nbrs['jogar_carta'].kneighbors = Mock(side_effect=busca)
+
+        # Execute
+        grupos = list(cbr.vizinhos_adaptativos('jogar_carta', np.array([[0.0]])))
+
+        # Assert
+        assert [vizinhos.shape for _, vizinhos in grupos] == [(0, 2), (0, 4), (1, 8)]
+        assert [chamada.kwargs['n_neighbors'] for chamada in cbr.nbrs['jogar_carta'].kneighbors.call_args_list] == [2, 8]
+        assert cbr.estatisticas_expansao()['jogar_carta']['expansoes'] == {4: 1, 8: 1}
+
+    def test_moda_coluna_usa_moda_global_sem_suporte(self):
+        """Testa se, sem vizinhos no filtro mesmo com k_maximo, a decisão usa a moda global da coluna entre os casos do filtro"""
+        # Setup
+        cbr = self.criar_cbr_adaptativo([False, False, True, True, False, False, False, False], k_maximo=2)
+
+        # Execute
+        grupos = list(cbr.vizinhos_adaptativos('jogar_carta', np.array([[0.0]])))
+        moda = cbr.moda_coluna('terceiraCartaRobo', grupos[-1][1], 'bot_venceu_mao')
+
+        # Assert
+        assert moda.tolist() == [3]
+        assert cbr.fallbacks_marginais['jogar_carta'] == 1
+
+    def criar_cbr_base(self, tamanho=80, semente=0):
+        """Cbr sobre uma base de casos aleatória com todas as colunas do registro, um índice ball_tree por decisão e sem tabela"""
+        dados = Dados()
+        colunas = dados.novo_registro().colunas
+        rng = np.random.default_rng(semente)
+        casos = pd.DataFrame(rng.integers(0, 30, size=(tamanho, len(colunas))), columns=colunas)
+        for coluna in ['ganhadorPrimeiraRodada', 'ganhadorSegundaRodada', 'ganhadorTerceiraRodada', 'quemGanhouEnvido', 'quemGanhouTruco']:
+            casos[coluna] = rng.integers(1, 3, size=tamanho)
+        construir = lambda X: NearestNeighbors(n_neighbors=8, algorithm='ball_tree').fit(X)
+        cbr = Cbr.__new__(Cbr)
+        cbr.dados = dados
+        cbr.colunas_casos = colunas
+        cbr.casos = {coluna: casos[coluna].to_numpy() for coluna in colunas}
+        cbr.casos['quantidadeCasos'] = np.ones(tamanho, dtype=np.int32)
+        cbr.rotulos = dados.calcular_rotulos(casos)
+        cbr.tamanho_casos = tamanho
+        cbr.colunas_decisao = COLUNAS_DECISAO
+        cbr.colunas_particao = []
+        cbr.nbrs = {decisao: IndiceIncremental(construir(casos[colunas_decisao].to_numpy(dtype=float)), construir) for decisao, colunas_decisao in COLUNAS_DECISAO.items()}
+        cbr.suporte_minimo = 1
+        cbr.k_maximo = 32
+        cbr.expansoes = {decisao: {} for decisao in COLUNAS_DECISAO}
+        cbr.fallbacks_marginais = {decisao: 0 for decisao in COLUNAS_DECISAO}
+        cbr.modas_globais = {}
+        cbr.k_agregacao = None
+        cbr.agregadores = {}
+        cbr.cache_vizinhos = CacheLRU(64)
+        cbr.consultas_registro = {}
+        cbr.versao_indice = 0
+        cbr.tabela = None
+        return cbr, casos
+
+    def decisoes_individuais(self, cbr, registros, decisao, argumentos):
+        """Chama a decisão do Cbr uma vez por registro, com o registro gravado no Dados como no jogo"""
+        respostas = []
+        for valores, argumento in zip(registros, argumentos):
+            cbr.dados.registro = cbr.dados.novo_registro()
+            cbr.dados.registro.valores[:] = valores
+            cbr.dados.versao_registro += 1
+            respostas.append(getattr(cbr, decisao)(*argumento))
+
+        return respostas
+
+    def test_decisoes_em_lote_iguais_as_individuais(self):
+        """Testa se jogar_carta_lote, truco_lote e envido_lote respondem como uma chamada individual por registro"""
+        # Setup
+        cbr, casos = self.criar_cbr_base()
+        rng = np.random.default_rng(1)
+        registros = rng.integers(0, 30, size=(12, len(cbr.colunas_casos))).astype(float)
+        rodadas = rng.integers(1, 4, size=12).tolist()
+        maos = [rng.integers(1, 30, size=3).tolist() for _ in range(12)]
+        qualidades = rng.uniform(0, 30, size=12).tolist()
+        tipos = [6, 7, 8, 'Envido'] * 3
+        quem_pediu = [1, 1, 1, 2] * 3
+        pontos = rng.integers(0, 34, size=12).tolist()
+        perdendo = [False, True] * 6
+
+        # Execute
+        jogar_carta = cbr.jogar_carta_lote(registros, rodadas, maos)
+        truco = cbr.truco_lote(pd.DataFrame(registros, columns=cbr.colunas_casos), qualidades)
+        envido = cbr.envido_lote(registros, tipos, quem_pediu, pontos, perdendo)
+
+        # Assert
+        assert jogar_carta.tolist() == self.decisoes_individuais(cbr, registros, 'jogar_carta', zip(rodadas, maos))
+        assert truco.tolist() == self.decisoes_individuais(cbr, registros, 'truco', [(6, 1, qualidade) for qualidade in qualidades])
+        assert envido.tolist() == self.decisoes_individuais(cbr, registros, 'envido', zip(tipos, quem_pediu, pontos, perdendo))
+
+    def test_argumentos_escalares_valem_para_todos_os_registros(self):
+        """Testa se escalares valem para todos os registros e se uma mão por registro é exigida, mesmo com três registros"""
+        # Setup
+        cbr, casos = self.criar_cbr_base()
+        registros = casos[cbr.colunas_casos].to_numpy(dtype=float)[:3]
+
+        # Execute
+        jogar_carta = cbr.jogar_carta_lote(registros, 2, [[10, 20, 30]] * 3)
+        envido = cbr.envido_lote(registros, 6, 1, 27, True)
+
+        # Assert
+        assert jogar_carta.tolist() == cbr.jogar_carta_lote(registros, [2, 2, 2], [[10, 20, 30]] * 3).tolist()
+        assert envido.tolist() == cbr.envido_lote(registros, [6] * 3, [1] * 3, [27] * 3, [True] * 3).tolist()
+        with pytest.raises(ValueError):
+            cbr.jogar_carta_lote(registros, 2, [10, 20, 30])
+        with pytest.raises(ValueError):
+            cbr.truco_lote(registros, [20.0, 10.0])
+
+    def test_decisoes_iguais_ao_value_counts(self):
+        """Testa se as decisões vetorizadas respondem como o Cbr original, com value_counts do pandas sobre os mesmos vizinhos"""
+        # Setup
+        cbr, casos = self.criar_cbr_base(tamanho=60)
+        rng = np.random.default_rng(2)
+        indices = np.array([rng.choice(60, size=20, replace=False) for _ in range(40)])
+        rodadas = rng.integers(1, 4, size=40).tolist()
+        maos = [rng.integers(1, 30, size=3).tolist() for _ in range(40)]
+        qualidades = rng.uniform(0, 30, size=40).tolist()
+        tipos = [6, 7, 8, 'Envido'] * 10
+        quem_pediu = [1, 1, 1, 2] * 10
+        pontos = rng.integers(0, 34, size=40).tolist()
+        perdendo = [False, True] * 20
+
+        # Execute
+        jogar_carta = cbr.decidir_jogar_carta(indices, rodadas, maos)
+        truco = cbr.decidir_truco(indices, qualidades)
+        envido = cbr.decidir_envido(indices, tipos, quem_pediu, pontos, perdendo)
+
+        # Assert
+        for linha, vizinhos in enumerate(indices):
+            jogadas = casos.iloc[vizinhos]
+            assert jogar_carta[linha] == jogar_carta_pandas(jogadas, rodadas[linha], maos[linha])
+            assert truco[linha] == truco_pandas(jogadas, qualidades[linha])
+            assert envido[linha] == envido_pandas(jogadas, tipos[linha], quem_pediu[linha], pontos[linha], perdendo[linha])
+
+    def test_reter_caso_consultado_e_compactado(self):
+        """Testa se o caso retido é o vizinho mais próximo da consulta seguinte, se a compactação esvazia o delta de cada índice
+        e se as colunas e rótulos originais, somente leitura, não são copiados"""
+        # Setup
+        cbr, casos = self.criar_cbr_base(tamanho=60)
+        construir = lambda X: NearestNeighbors(n_neighbors=8, algorithm='ball_tree').fit(X)
+        cbr.nbrs = {decisao: IndiceIncremental(construir(casos[colunas].to_numpy(dtype=float)), construir, limite_delta=2) for decisao, colunas in COLUNAS_DECISAO.items()}
+        registro = cbr.dados.novo_registro()
+        registro.valores[:] = 100
+        cbr.dados.registro = registro
+        # Arrays somente leitura, como os anexados da memória compartilhada
+        originais = {**cbr.casos, **cbr.rotulos}
+        for array in originais.values():
+            array.flags.writeable = False
+
+        # Execute
+        cbr.reter_caso(registro)
+        vizinhos = cbr.consultar_vizinhos('truco')
+        cbr.reter_caso(registro)
+        for indice in cbr.nbrs.values():
+            indice.aguardar_compactacao()
+        vizinhos_compactados = cbr.consultar_vizinhos('truco')
+
+        # Assert
+        assert vizinhos[0] == 60
+        assert cbr.tamanho_casos == 62
+        assert all(len(indice.delta) == 0 and indice.compactacoes == 1 for indice in cbr.nbrs.values())
+        assert sorted(vizinhos_compactados[:2].tolist()) == [60, 61]
+        assert all(np.shares_memory(coluna.base, originais[nome]) for nome, coluna in {**cbr.casos, **cbr.rotulos}.items())
+
+    def test_decisoes_agregadas_iguais_linha_a_linha(self):
+        """Testa se as decisões com os votos contados pelos histogramas da árvore, em lote e individuais, são iguais às contadas
+        linha a linha, também com um caso retido no delta do índice"""
+        # Setup
+        cbr, casos = self.criar_cbr_base(tamanho=300)
+        registro = cbr.dados.novo_registro()
+        registro.valores[:] = casos[cbr.colunas_casos].to_numpy(dtype=float)[0]
+        cbr.reter_caso(registro)
+        rng = np.random.default_rng(3)
+        registros = rng.integers(0, 30, size=(20, len(cbr.colunas_casos))).astype(float)
+        rodadas = rng.integers(1, 4, size=20).tolist()
+        maos = [rng.integers(1, 30, size=3).tolist() for _ in range(20)]
+        qualidades = rng.uniform(0, 30, size=20).tolist()
+        pontos = rng.integers(0, 34, size=20).tolist()
+        decidir = lambda: [
+            cbr.jogar_carta_lote(registros, rodadas, maos).tolist(),
+            cbr.truco_lote(registros, qualidades).tolist(),
+            cbr.envido_lote(registros, 6, 1, pontos, True).tolist(),
+            self.decisoes_individuais(cbr, registros, 'truco', [(6, 1, qualidade) for qualidade in qualidades]),
+        ]
+        linha_a_linha = decidir()
+
+        # Execute
+        cbr.k_agregacao = 1
+        cbr.invalidar_cache()
+        agregadas = decidir()
+
+        # Assert
+        assert agregadas == linha_a_linha
+        assert set(cbr.agregadores) == set(COLUNAS_DECISAO)
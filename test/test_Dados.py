@@ -1,8 +1,14 @@
 import pytest
+import numpy as np
 import pandas as pd
 import os
 from unittest.mock import Mock, patch, MagicMock
 from truco.dados import Dados
+from truco.escritor_jogadas import obter_escritor
+from truco.registro import Registro
+
+# Leitura real do csv, guardada antes de o conftest substituí-la por um mock
+ler_csv = pd.read_csv
 
 class TestDados:
 
@@ -123,7 +129,7 @@ class TestDados:
         assert dados.registro.cartaAltaRobo == 24
         assert dados.registro.cartaMediaRobo == 16
         assert dados.registro.cartaBaixaRobo == 8
-        assert dados.registro.qualidadeMaoBot == 18.5
+        assert dados.registro.qualidadeMaoRobo == 18.5
         assert dados.registro.primeiraCartaHumano == 2
         assert dados.registro.naipePrimeiraCartaHumano == 4
 
@@ -162,7 +168,7 @@ class TestDados:
 
         # Assert
         assert dados.registro.ganhadorSegundaRodada == 2
-        assert dados.registro.SegundaCartaHumano == 12
+        assert dados.registro.segundaCartaHumano == 12
         assert dados.registro.naipeSegundaCartaHumano == 2
 
     def test_finalizar_rodadas_registro_completo(self):
@@ -193,11 +199,29 @@ class TestDados:
         dados.envido(1, 2, 0, 1)  # quem_envido, quem_real_envido, quem_falta_envido, quem_ganhou_envido
 
         # Assert
-        assert dados.registro.quemEnvido == 1
-        assert dados.registro.quemRealEnvido == 2
-        assert dados.registro.quemFaltaEnvido == 0
+        assert dados.registro.quemPediuEnvido == 1
+        assert dados.registro.quemPediuRealEnvido == 2
+        assert dados.registro.quemPediuFaltaEnvido == 0
         assert dados.registro.quemGanhouEnvido == 1
 
+    def test_pedido_envido_registra_pontos_e_pedido(self):
+        """Testa se o pedido de envido grava os pontos do bot e quem fez o pedido, e se o bot avaliando pedir envido grava só os pontos"""
+        # Setup
+        dados = Dados()
+
+        # Execute
+        dados.pedido_envido(7, 1, 27)
+        real_envido = dados.registro.copy()
+        dados.registro = dados.novo_registro()
+        dados.pedido_envido('Envido', 2, 31)
+
+        # Assert
+        assert real_envido.pontosEnvidoRobo == 27
+        assert real_envido.quemPediuRealEnvido == 1
+        assert real_envido.quemPediuEnvido == 0
+        assert dados.registro.pontosEnvidoRobo == 31
+        assert dados.registro.quemPediuEnvido == 0
+
     def test_truco_registro_sequencia(self):
         """Testa registro da sequência de truco"""
         # Setup
@@ -264,22 +288,20 @@ class TestDados:
         assert dados.registro.quemGanhouFlor == 2
         assert dados.registro.quemNegouFlor == 1
 
-    @patch('pandas.read_csv')
-    def test_carregar_modelo_zerado(self, mock_read_csv):
-        """Testa carregamento do modelo zerado"""
+    def test_carregar_modelo_zerado(self, mock_csv_files):
+        """Testa se o modelo zerado é criado em memória, com as colunas da base de casos, sem ler csv"""
         # Setup
-        mock_df = MagicMock()
-        mock_read_csv.return_value = mock_df
+        dados = Dados()
+        mock_csv_files.reset_mock()
 
         # Execute
-        dados = Dados()
         resultado = dados.carregar_modelo_zerado()
 
         # Assert
-        mock_read_csv.assert_called_with('modelo_registro.csv',
-                                        usecols=dados.colunas,
-                                        index_col='idMao')
-        assert resultado == mock_df
+        mock_csv_files.assert_not_called()
+        assert 'idMao' not in resultado.colunas
+        assert len(resultado.colunas) == len(set(dados.colunas)) - 1
+        assert not resultado.valores.any()
 
     def test_retornar_registro(self):
         """Testa retorno do registro atual"""
@@ -291,7 +313,7 @@ class TestDados:
 
         # Assert
         assert registro is not None
-        assert hasattr(registro, 'columns')
+        assert registro.colunas == [coluna for coluna in dict.fromkeys(dados.colunas) if coluna != 'idMao']
 
     def test_retornar_casos(self):
         """Testa retorno dos casos carregados"""
@@ -304,67 +326,71 @@ class TestDados:
         # Assert
         assert casos is not None
 
-    @patch('pandas.read_csv')
-    @patch('os.path.isfile')
-    def test_finalizar_partida_novo_arquivo(self, mock_isfile, mock_read_csv):
+    def test_finalizar_partida_novo_arquivo(self, tmp_path, monkeypatch):
         """Testa finalização de partida com criação de novo arquivo"""
         # Setup
-        mock_isfile.return_value = False
-        mock_df = MagicMock()
-        mock_read_csv.return_value = mock_df
-
+        monkeypatch.chdir(tmp_path)
         dados = Dados()
+        dados.registro.jogadorMao = 1
 
-        # Mock do método to_csv
-        with patch.object(dados.registro, 'to_csv') as mock_to_csv:
-            # Execute
-            dados.finalizar_partida()
+        # Execute
+        dados.finalizar_partida()
+        escritor = obter_escritor('jogadas.csv')
+        escritor.fechar()
 
-            # Assert - Verifique se to_csv foi chamado com os parâmetros corretos
-            mock_to_csv.assert_called_once()
-            # Não especifique parâmetros exatos, apenas que foi chamado
-            assert mock_to_csv.called
+        # Assert - O registro é gravado como uma linha, com o cabeçalho das colunas
+        jogadas = ler_csv(tmp_path / 'jogadas.csv', index_col='idMao')
+        assert list(jogadas.columns) == dados.registro.colunas
+        assert jogadas['jogadorMao'].tolist() == [1]
 
-    @patch('pandas.DataFrame.to_csv')
-    @patch('os.path.isfile')
-    def test_finalizar_partida_arquivo_existente(self, mock_isfile, mock_read_csv):
+    def test_finalizar_partida_arquivo_existente(self, tmp_path, monkeypatch):
         """Testa finalização de partida com arquivo existente"""
         # Setup
-        mock_isfile.return_value = True
-        mock_df = MagicMock()
-        mock_read_csv.return_value = mock_df
-
+        monkeypatch.chdir(tmp_path)
         dados = Dados()
+        dados.finalizar_partida()
+        escritor = obter_escritor('jogadas.csv')
+        escritor.fechar()
+        dados.resetar()
+        dados.registro.jogadorMao = 2
 
-        # Mock do método to_csv
-        with patch.object(dados.registro, 'to_csv') as mock_to_csv:
-            # Execute
-            dados.finalizar_partida()
+        # Execute
+        dados.finalizar_partida()
+        escritor.fechar()
 
-            # Assert
-            mock_to_csv.assert_called_once()
-            assert mock_to_csv.called
+        # Assert - A segunda mão é anexada sem repetir o cabeçalho
+        jogadas = ler_csv(tmp_path / 'jogadas.csv', index_col='idMao')
+        assert jogadas['jogadorMao'].tolist() == [0, 2]
 
     @patch.object(Dados, 'tratamento_inicial_df')
     @patch.object(Dados, 'carregar_modelo_zerado')
     def test_resetar(self, mock_carregar_modelo, mock_tratamento_df):
-        """Testa reset completo dos dados"""
+        """Testa se o reset cria um novo registro a partir do modelo em memória, sem reler a base de casos nem o modelo"""
         # Setup
-        mock_carregar_modelo.return_value = MagicMock()
+        mock_carregar_modelo.return_value = Registro(['jogadorMao'])
         mock_tratamento_df.return_value = MagicMock()
 
         # Crie a instância DEPOIS de configurar os mocks
         dados = Dados()
+        dados.registro.jogadorMao = 1
+        registro_anterior = dados.registro
+        versao_anterior = dados.versao_registro
+        base_anterior = dados.base
 
         # Reset call counts porque o init já chamou uma vez
         mock_tratamento_df.reset_mock()
+        mock_carregar_modelo.reset_mock()
 
         # Execute
         dados.resetar()
 
-        # Assert - Agora deve ser chamado apenas uma vez
-        assert mock_tratamento_df.call_count == 1
-        assert mock_carregar_modelo.call_count == 1
+        # Assert - Nenhum csv é lido novamente: só o registro da mão é trocado
+        assert mock_tratamento_df.call_count == 0
+        assert mock_carregar_modelo.call_count == 0
+        assert dados.base is base_anterior
+        assert dados.registro is not registro_anterior
+        assert dados.registro.jogadorMao == 0
+        assert dados.versao_registro == versao_anterior + 1
 
     def test_registro_estrutura_completa(self):
         """Testa se o registro mantém estrutura consistente após múltiplas operações"""
@@ -383,10 +409,10 @@ class TestDados:
         # Assert - Verifica se a estrutura permanece consistente
         registro = dados.retornar_registro()
         assert hasattr(registro, 'primeiraCartaRobo')
-        assert hasattr(registro, 'quemEnvido')
+        assert hasattr(registro, 'quemPediuEnvido')
         assert hasattr(registro, 'quemTruco')
         assert registro.primeiraCartaRobo == 5
-        assert registro.quemEnvido == 1
+        assert registro.quemPediuEnvido == 1
         assert registro.quemTruco == 2
 
     def test_mao_rank_classificacao_correta(self):
@@ -408,4 +434,102 @@ class TestDados:
         assert dados.registro.cartaAltaRobo == 30
         assert dados.registro.cartaMediaRobo == 20
         assert dados.registro.cartaBaixaRobo == 10
-        assert dados.registro.qualidadeMaoBot == 25.0
+        assert dados.registro.qualidadeMaoRobo == 25.0
+
+    def test_setters_incrementam_versao_registro(self):
+        """Testa se as alterações do registro pelos setters incrementam sua versão"""
+        # Setup
+        dados = Dados()
+        versao_inicial = dados.versao_registro
+
+        # Execute
+        dados.truco(1, 0, 0, 0, 1)
+        dados.vencedor_envido(2, 0)
+
+        # Assert
+        assert dados.versao_registro == versao_inicial + 2
+
+    def test_calcular_rotulos(self):
+        """Testa os rótulos de resultado calculados para cada caso"""
+        # Setup
+        dados = Dados()
+        casos = pd.DataFrame({
+            'ganhadorPrimeiraRodada': [2, 1, 2],
+            'ganhadorSegundaRodada': [1, 2, 2],
+            'ganhadorTerceiraRodada': [2, 2, 1],
+            'pontosEnvidoRobo': [30, 20, -100],
+            'pontosEnvidoHumano': [25, 28, -100],
+            'quemGanhouEnvido': [-100, -100, 2],
+            'quemGanhouTruco': [2, 1, -100],
+        })
+
+        # Execute
+        rotulos = dados.calcular_rotulos(casos)
+
+        # Assert
+        assert rotulos['bot_venceu_mao'].tolist() == [True, True, False]
+        assert rotulos['envido_ganho'].tolist() == [True, False, True]
+        assert rotulos['envido_perdido'].tolist() == [False, True, False]
+        assert rotulos['truco_ganho'].tolist() == [True, False, False]
+        assert rotulos['truco_perdido'].tolist() == [False, True, False]
+        assert rotulos['bot_venceu_mao'].dtype == bool
+
+    def test_deduplicar_casos(self):
+        """Testa se linhas codificadas idênticas viram um único caso, na ordem da primeira ocorrência, com a quantidade de repetições"""
+        # Setup
+        dados = Dados()
+        casos = pd.DataFrame({'a': [1, 2, 1, 3, 2, 1], 'b': [5, 6, 5, 7, 6, 9]}, index=pd.Index([10, 11, 12, 13, 14, 15], name='idMao'))
+
+        # Execute
+        deduplicados = dados.deduplicar_casos(casos)
+
+        # Assert
+        assert deduplicados.index.tolist() == [10, 11, 13, 15]
+        assert deduplicados['quantidadeCasos'].tolist() == [2, 2, 1, 1]
+        assert deduplicados['quantidadeCasos'].sum() == len(casos)
+
+    def test_base_casos_carregada_uma_vez_por_processo(self, mock_csv_files):
+        """Testa se várias instâncias de Dados compartilham a base de casos lida uma única vez"""
+        # Execute
+        dados1 = Dados()
+        dados2 = Dados()
+
+        # Assert
+        leituras_casos = [chamada for chamada in mock_csv_files.call_args_list if chamada.args[0] == 'dbtrucoimitacao_maos.csv']
+        assert len(leituras_casos) == 1
+        assert dados1.base is dados2.base
+
+    def test_tratamento_inicial_df_em_blocos(self, mock_csv_files, tmp_path):
+        """Testa se a leitura em blocos codifica naipes e ausentes direto em int16, na ordem das colunas do arquivo"""
+        # Setup
+        dados = Dados()
+        dados.colunas = ['idMao', 'jogadorMao', 'naipeCartaAltaRobo', 'qualidadeMaoRobo']
+        caminho = tmp_path / 'casos.csv'
+        caminho.write_text('idMao,outraColuna,naipeCartaAltaRobo,jogadorMao,qualidadeMaoRobo\n7,9,OURO,1,18.5\n8,9,,2,20\n9,9,COPAS,,21\n')
+        mock_csv_files.side_effect = ler_csv
+
+        # Execute
+        with patch('truco.dados.CAMINHO_CASOS', str(caminho)), patch('truco.dados.LINHAS_BLOCO_CSV', 2):
+            df = dados.tratamento_inicial_df()
+
+        # Assert
+        assert list(df.columns) == ['naipeCartaAltaRobo', 'jogadorMao', 'qualidadeMaoRobo']
+        assert df.index.name == 'idMao'
+        assert df.index.tolist() == [7, 8, 9]
+        assert df['naipeCartaAltaRobo'].tolist() == [2, -100, 4]
+        assert df['jogadorMao'].tolist() == [1, 2, -100]
+        assert df['qualidadeMaoRobo'].tolist() == [18, 20, 21]
+        assert set(df.dtypes) == {np.dtype('int16')}
+
+    def test_tratamento_inicial_df_naipe_desconhecido(self, mock_csv_files, tmp_path):
+        """Testa se um naipe desconhecido no csv gera erro, em vez de virar valor ausente"""
+        # Setup
+        dados = Dados()
+        dados.colunas = ['idMao', 'naipeCartaAltaRobo']
+        caminho = tmp_path / 'casos.csv'
+        caminho.write_text('idMao,naipeCartaAltaRobo\n1,ESPADA\n')
+        mock_csv_files.side_effect = ler_csv
+
+        # Execute / Assert
+        with patch('truco.dados.CAMINHO_CASOS', str(caminho)), pytest.raises(ValueError, match='Naipes desconhecidos'):
+            dados.tratamento_inicial_df()
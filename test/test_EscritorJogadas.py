@@ -0,0 +1,161 @@
+import threading
+import time
+import pytest
+import pandas as pd
+from truco.escritor_jogadas import EscritorJogadas
+from truco.registro import Registro
+
+# Leitura real do csv, guardada antes de o conftest substituí-la por um mock
+ler_csv = pd.read_csv
+
+
+def registro(jogador_mao):
+    """Registro de mão com duas colunas"""
+    registro = Registro(['jogadorMao', 'quemTruco'])
+    registro.jogadorMao = jogador_mao
+    return registro
+
+
+def aguardar_arquivo(caminho, limite=5.0):
+    """Espera, por no máximo limite segundos, a thread de escrita criar o arquivo"""
+    fim = time.monotonic() + limite
+    while (not caminho.exists() and time.monotonic() < fim):
+        time.sleep(0.01)
+
+    return caminho.exists()
+
+
+class TestEscritorJogadas:
+    def test_registrar_apenas_enfileira(self, tmp_path):
+        """Testa se registrar não grava o arquivo antes de o lote encher ou o intervalo vencer"""
+        # Setup
+        caminho = tmp_path / 'jogadas.csv'
+        escritor = EscritorJogadas(str(caminho), linhas_lote=100, intervalo=60)
+
+        # Execute
+        escritor.registrar(registro(1))
+
+        # Assert
+        assert not caminho.exists()
+        escritor.fechar()
+        assert caminho.read_text().splitlines() == ['idMao,jogadorMao,quemTruco', '0,1,0']
+
+    def test_lote_cheio_grava(self, tmp_path):
+        """Testa se o lote é gravado quando atinge linhas_lote registros"""
+        # Setup
+        caminho = tmp_path / 'jogadas.csv'
+        escritor = EscritorJogadas(str(caminho), linhas_lote=3, intervalo=60)
+
+        # Execute
+        for jogador_mao in range(3):
+            escritor.registrar(registro(jogador_mao))
+
+        # Assert
+        assert aguardar_arquivo(caminho)
+        escritor.fechar()
+        assert ler_csv(caminho, index_col='idMao')['jogadorMao'].tolist() == [0, 1, 2]
+
+    def test_intervalo_vencido_grava(self, tmp_path):
+        """Testa se um lote incompleto é gravado quando o intervalo vence"""
+        # Setup
+        caminho = tmp_path / 'jogadas.csv'
+        escritor = EscritorJogadas(str(caminho), linhas_lote=100, intervalo=0.05)
+
+        # Execute
+        escritor.registrar(registro(1))
+
+        # Assert
+        assert aguardar_arquivo(caminho)
+        escritor.fechar()
+
+    def test_um_arquivo_aberto_e_um_cabecalho(self, tmp_path):
+        """Testa se vários lotes usam o mesmo arquivo aberto e o cabeçalho é gravado uma única vez"""
+        # Setup
+        caminho = tmp_path / 'jogadas.csv'
+        escritor = EscritorJogadas(str(caminho), linhas_lote=2, intervalo=60)
+        escritor.registrar(registro(0))
+        escritor.descarregar()
+        arquivo = escritor.arquivo
+
+        # Execute
+        for jogador_mao in range(1, 4):
+            escritor.registrar(registro(jogador_mao))
+        escritor.descarregar()
+
+        # Assert
+        assert escritor.arquivo is arquivo
+        escritor.fechar()
+        assert arquivo.closed
+        assert ler_csv(caminho, index_col='idMao')['jogadorMao'].tolist() == [0, 1, 2, 3]
+
+    def test_erro_de_escrita_levantado(self, tmp_path):
+        """Testa se um erro da thread de escrita é levantado ao descarregar"""
+        # Setup
+        escritor = EscritorJogadas(str(tmp_path / 'inexistente' / 'jogadas.csv'))
+        escritor.registrar(registro(1))
+
+        # Execute / Assert
+        with pytest.raises(OSError):
+            escritor.descarregar()
+        escritor.fechar()
+
+    def test_registrar_durante_fechamento_espera_a_thread_antiga(self, tmp_path):
+        """Testa se um registro feito durante o fechamento espera a thread antiga terminar, sem duas threads na mesma fila"""
+        # Setup
+        caminho = tmp_path / 'jogadas.csv'
+        escritor = EscritorJogadas(str(caminho), linhas_lote=1, intervalo=60)
+        gravando = threading.Event()
+        liberar = threading.Event()
+        gravar = escritor.gravar
+
+        def gravar_lento(lote):
+            gravando.set()
+            liberar.wait()
+            return gravar(lote)
+
+        escritor.gravar = gravar_lento
+        escritor.registrar(registro(1))
+        assert gravando.wait(5)
+
+        # Execute
+        fechamento = threading.Thread(target=escritor.fechar)
+        fechamento.start()
+        while not (escritor.fechando):
+            time.sleep(0.01)
+        novo_registro = threading.Thread(target=escritor.registrar, args=(registro(2),))
+        novo_registro.start()
+        time.sleep(0.05)
+        assert novo_registro.is_alive()
+        liberar.set()
+        fechamento.join(5)
+        novo_registro.join(5)
+        escritor.fechar()
+
+        # Assert
+        assert not fechamento.is_alive() and not novo_registro.is_alive()
+        assert ler_csv(caminho, index_col='idMao')['jogadorMao'].tolist() == [1, 2]
+
+    def test_descarregar_com_registros_continuos(self, tmp_path):
+        """Testa se descarregar retorna enquanto outras partidas continuam enfileirando registros"""
+        # Setup
+        escritor = EscritorJogadas(str(tmp_path / 'jogadas.csv'), linhas_lote=1000, intervalo=60)
+        parar = threading.Event()
+
+        def partida():
+            while not (parar.is_set()):
+                escritor.registrar(registro(0))
+
+        produtor = threading.Thread(target=partida)
+        produtor.start()
+        escritor.registrar(registro(1))
+
+        # Execute
+        descarga = threading.Thread(target=escritor.descarregar)
+        descarga.start()
+        descarga.join(5)
+        parar.set()
+        produtor.join()
+        escritor.fechar()
+
+        # Assert
+        assert not descarga.is_alive()
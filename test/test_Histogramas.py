@@ -0,0 +1,55 @@
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+from truco.cbr import moda_vizinhos
+from truco.histogramas import HistogramasArvore, VizinhancaAgregada
+
+
+class TestHistogramas:
+    def criar_casos(self, continuos):
+        """Casos em 3 dimensões, contínuos ou em uma grade com muitos empates de distância, com valores, quantidades e filtro"""
+        rng = np.random.default_rng(7)
+        matriz = rng.random((600, 3)) if continuos else rng.integers(0, 4, size=(600, 3)).astype(float)
+        valores = rng.integers(0, 5, size=620)
+        quantidades = rng.integers(1, 4, size=620)
+        filtro = rng.random(620) < 0.4
+        return matriz, valores, quantidades, filtro
+
+    def vizinhanca(self, matriz, quantidades, k):
+        """Vizinhos das 30 primeiras linhas entre os casos da árvore e 20 casos do delta (posições 600 em diante), com os pesos
+        limitados a k como no Cbr"""
+        arvore = NearestNeighbors(algorithm='ball_tree', leaf_size=5).fit(matriz)
+        delta = matriz[:20] + 0.01
+        consultas = matriz[:30] + 0.005
+        indices = NearestNeighbors(algorithm='brute').fit(np.vstack([matriz, delta])).kneighbors(consultas, k, return_distance=False)
+        anteriores = np.cumsum(quantidades[indices], axis=1) - quantidades[indices]
+        pesos = np.clip(k - anteriores, 0, quantidades[indices])
+        return VizinhancaAgregada(HistogramasArvore(arvore._tree), indices, consultas, pesos, delta), indices, pesos
+
+    def test_histograma_da_raiz_soma_todos_os_casos(self):
+        """Testa se o histograma da raiz soma, por valor, as quantidades dos casos da árvore que atendem ao filtro"""
+        # Setup
+        matriz, valores, quantidades, filtro = self.criar_casos(continuos=True)
+        histogramas = HistogramasArvore(NearestNeighbors(algorithm='ball_tree', leaf_size=5).fit(matriz)._tree)
+
+        # Execute
+        unicos, _, histograma, _ = histogramas.histograma(('valor', 'filtro'), valores, quantidades, filtro)
+
+        # Assert
+        assert histograma[0].tolist() == [quantidades[:600][(valores[:600] == valor) & filtro[:600]].sum() for valor in unicos]
+
+    def test_moda_igual_a_moda_vizinhos(self):
+        """Testa se a moda pelos nós dentro do raio, com filtro, pesos truncados, empates e casos do delta, é igual à contagem
+        linha a linha, com nós inteiros cobertos nos casos contínuos"""
+        for continuos in [True, False]:
+            # Setup
+            matriz, valores, quantidades, filtro = self.criar_casos(continuos)
+            vizinhanca, indices, pesos = self.vizinhanca(matriz, quantidades, 150)
+
+            # Execute
+            agregada = vizinhanca.moda(('valor', 'filtro'), valores, quantidades, filtro)
+            sem_filtro = vizinhanca.moda(('valor', None), valores, quantidades)
+
+            # Assert
+            assert [resultado.tolist() for resultado in agregada] == [resultado.tolist() for resultado in moda_vizinhos(valores[indices], filtro[indices], pesos)]
+            assert [resultado.tolist() for resultado in sem_filtro] == [resultado.tolist() for resultado in moda_vizinhos(valores[indices], None, pesos)]
+            assert not continuos or len(vizinhanca.nos) > 0
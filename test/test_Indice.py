@@ -0,0 +1,112 @@
+import glob
+import os
+import pytest
+import numpy as np
+from unittest.mock import Mock
+from sklearn.neighbors import NearestNeighbors
+from truco.indice import obter_indice, chave_indice, caminho_indice, carregar_indice
+
+
+@pytest.fixture
+def csv_casos(tmp_path):
+    """Arquivo csv fictício, usado apenas para o cálculo da chave do índice"""
+    caminho = tmp_path / 'casos.csv'
+    caminho.write_text('idMao,jogadorMao\n1,1\n2,0\n')
+    return str(caminho)
+
+
+def construtor():
+    """Cria um construtor de índice que conta quantas vezes foi chamado"""
+    X = np.arange(40, dtype='int16').reshape(20, 2)
+    return Mock(side_effect=lambda: NearestNeighbors(n_neighbors=3, algorithm='ball_tree').fit(X))
+
+
+class TestIndice:
+    def test_primeira_carga_constroi_e_salva(self, csv_casos):
+        """Testa se o índice é construído e persistido na primeira carga"""
+        # Setup
+        construir = construtor()
+
+        # Execute
+        nbrs = obter_indice(csv_casos, ['idMao', 'jogadorMao'], construir)
+
+        # Assert
+        assert construir.call_count == 1
+        chave = chave_indice(csv_casos, ['idMao', 'jogadorMao'])
+        assert carregar_indice(caminho_indice(csv_casos, chave), chave) is not None
+        assert nbrs.kneighbors([[0, 1]], return_distance=False)[0][0] == 0
+
+    def test_segunda_carga_mapeia_sem_reconstruir(self, csv_casos):
+        """Testa se a segunda carga usa o artefato mapeado em memória, sem treinar novamente"""
+        # Setup
+        construir = construtor()
+        obter_indice(csv_casos, ['idMao', 'jogadorMao'], construir)
+
+        # Execute
+        nbrs = obter_indice(csv_casos, ['idMao', 'jogadorMao'], construir)
+
+        # Assert
+        assert construir.call_count == 1
+        assert isinstance(nbrs._fit_X, np.memmap)
+        assert not nbrs._fit_X.flags.writeable
+
+    def test_csv_alterado_reconstroi(self, csv_casos):
+        """Testa se a alteração do csv invalida o artefato"""
+        # Setup
+        construir = construtor()
+        obter_indice(csv_casos, ['idMao', 'jogadorMao'], construir)
+        with open(csv_casos, 'a') as arquivo:
+            arquivo.write('3,1\n')
+
+        # Execute
+        obter_indice(csv_casos, ['idMao', 'jogadorMao'], construir)
+
+        # Assert
+        assert construir.call_count == 2
+
+    def test_colunas_alteradas_reconstroi(self, csv_casos):
+        """Testa se a alteração das colunas invalida o artefato"""
+        # Setup
+        construir = construtor()
+        obter_indice(csv_casos, ['idMao', 'jogadorMao'], construir)
+
+        # Execute
+        obter_indice(csv_casos, ['idMao'], construir)
+
+        # Assert
+        assert construir.call_count == 2
+
+    def test_csv_alterado_remove_artefato_antigo(self, csv_casos):
+        """Testa se o artefato da versão anterior do mesmo grupo, e o do formato antigo, são removidos ao salvar o novo"""
+        # Setup
+        construir = construtor()
+        obter_indice(csv_casos, ['idMao', 'jogadorMao'], construir)
+        antigo = caminho_indice(csv_casos, chave_indice(csv_casos, ['idMao', 'jogadorMao']))
+        legado = f'{csv_casos}.{"0" * 32}.indice'
+        open(legado, 'wb').close()
+        with open(csv_casos, 'a') as arquivo:
+            arquivo.write('3,1\n')
+
+        # Execute
+        obter_indice(csv_casos, ['idMao', 'jogadorMao'], construir)
+
+        # Assert
+        assert not os.path.exists(antigo)
+        assert not os.path.exists(legado)
+        assert glob.glob(f'{csv_casos}.*.indice') == [caminho_indice(csv_casos, chave_indice(csv_casos, ['idMao', 'jogadorMao']))]
+
+    def test_outro_grupo_mantem_artefato(self, csv_casos):
+        """Testa se o artefato de outras colunas, de outro backend, de outros parâmetros do backend ou de outras partições é mantido"""
+        # Setup
+        construir = construtor()
+        obter_indice(csv_casos, ['idMao', 'jogadorMao'], construir)
+
+        # Execute
+        obter_indice(csv_casos, ['idMao'], construir)
+        obter_indice(csv_casos, ['idMao'], construir, {'backend': 'ivf', 'n_clusters': 4})
+        obter_indice(csv_casos, ['idMao'], construir, {'backend': 'ivf', 'n_clusters': 8})
+        obter_indice(csv_casos, ['idMao'], construir, {'particao': ['jogadorMao'], 'valor': 1})
+        obter_indice(csv_casos, ['idMao'], construir, {'particao': ['quemTruco'], 'valor': 1})
+
+        # Assert
+        assert len(glob.glob(f'{csv_casos}.*.indice')) == 6
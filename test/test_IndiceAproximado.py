@@ -0,0 +1,58 @@
+import pytest
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+from truco.indice_aproximado import IndiceAproximado
+from truco.avaliacao import recall_vizinhos
+
+
+class TestIndiceAproximado:
+    def test_kneighbors_retorna_vizinhos_ordenados(self):
+        """Testa se a busca retorna k vizinhos distintos, ordenados pela distância exata"""
+        # Setup
+        X = np.random.default_rng(0).integers(0, 50, (500, 6)).astype(float)
+        indice = IndiceAproximado(n_neighbors=10, n_arvores=4, tamanho_folha=32).fit(X)
+
+        # Execute
+        distancias, indices = indice.kneighbors(X[:5])
+
+        # Assert
+        assert indices.shape == (5, 10)
+        assert all(len(set(linha)) == 10 for linha in indices)
+        assert (np.diff(distancias, axis=1) >= 0).all()
+        assert np.allclose(distancias, np.linalg.norm(X[indices] - X[:5, None, :], axis=2))
+
+    def test_recall_alto_com_muitas_arvores(self):
+        """Testa se mais árvores aproximam o resultado da busca exata"""
+        # Setup
+        X = np.random.default_rng(1).integers(0, 50, (2000, 5)).astype(float)
+        exatos = NearestNeighbors(n_neighbors=20).fit(X).kneighbors(X[:50], return_distance=False)
+
+        # Execute
+        aproximados = IndiceAproximado(n_neighbors=20, n_arvores=16, tamanho_folha=64).fit(X).kneighbors(X[:50], return_distance=False)
+
+        # Assert
+        assert recall_vizinhos(exatos, aproximados) > 0.9
+
+    def test_casos_repetidos_nao_impedem_construcao(self):
+        """Testa se uma base com casos repetidos vira folha em vez de dividir indefinidamente"""
+        # Setup
+        X = np.zeros((300, 3))
+
+        # Execute
+        indice = IndiceAproximado(n_neighbors=5, n_arvores=2, tamanho_folha=10).fit(X)
+
+        # Assert
+        assert indice.kneighbors(X[:1], return_distance=False).shape == (1, 5)
+
+    def test_base_menor_que_k(self):
+        """Testa se, com menos casos que k, a busca retorna todos os casos em vez de falhar"""
+        # Setup
+        X = np.random.default_rng(2).integers(0, 50, (50, 4)).astype(float)
+        indice = IndiceAproximado(n_neighbors=100).fit(X)
+
+        # Execute
+        indices = indice.kneighbors(X[:3], return_distance=False)
+
+        # Assert
+        assert indices.shape == (3, 50)
+        assert all(sorted(linha) == list(range(50)) for linha in indices)
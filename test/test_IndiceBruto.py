@@ -0,0 +1,69 @@
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+from truco.indice_bruto import IndiceForcaBruta
+from truco.indice_incremental import IndiceIncremental
+
+
+class TestIndiceBruto:
+    def test_kneighbors_igual_busca_exata(self, casos):
+        """Testa se, sem padronização, os vizinhos coincidem com a ball tree"""
+        # Setup
+        indice = IndiceForcaBruta(n_neighbors=10, padronizar=False).fit(casos)
+
+        # Execute
+        distancias, _ = indice.kneighbors(casos[:20])
+
+        # Assert
+        esperadas, _ = NearestNeighbors(n_neighbors=10).fit(casos).kneighbors(casos[:20])
+        assert np.allclose(distancias, esperadas, atol=1e-3)
+
+    def test_kneighbors_em_blocos(self, casos):
+        """Testa se dividir consultas e casos em blocos não altera o resultado"""
+        # Setup
+        inteiro = IndiceForcaBruta(n_neighbors=10).fit(casos)
+        em_blocos = IndiceForcaBruta(n_neighbors=10, tamanho_bloco=64).fit(casos)
+
+        # Execute
+        distancias, indices = em_blocos.kneighbors(casos[:30])
+
+        # Assert
+        esperadas, _ = inteiro.kneighbors(casos[:30])
+        assert np.allclose(distancias, esperadas, atol=1e-4)
+        assert indices.shape == (30, 10)
+
+    def test_padronizacao(self, casos):
+        """Testa se as distâncias são medidas na base padronizada"""
+        # Setup
+        indice = IndiceForcaBruta(n_neighbors=5).fit(casos)
+        padronizados = (casos - casos.mean(axis=0)) / casos.std(axis=0)
+
+        # Execute
+        distancias, _ = indice.kneighbors(casos[:10])
+
+        # Assert
+        esperadas, _ = NearestNeighbors(n_neighbors=5).fit(padronizados).kneighbors(padronizados[:10])
+        assert np.allclose(distancias, esperadas, atol=1e-3)
+
+    def test_delta_incremental_no_espaco_padronizado(self, casos):
+        """Testa se o delta do índice incremental usa a mesma padronização do índice principal"""
+        # Setup
+        construir = lambda X: IndiceForcaBruta(n_neighbors=5).fit(X)
+        indice = IndiceIncremental(construir(casos[:500]), construir, limite_delta=1000)
+
+        # Execute
+        indice.adicionar(casos[500:])
+        distancias, indices = indice.kneighbors(casos[550:555])
+
+        # Assert
+        assert (indices[:, 0] == np.arange(550, 555)).all()
+        assert np.allclose(distancias[:, 0], 0, atol=1e-3)
+
+    def test_base_original_em_int16(self, casos):
+        """Testa se a base original é mantida em int16, sem uma cópia float64 ao lado da matriz float32"""
+        # Execute
+        indice = IndiceForcaBruta().fit(casos)
+
+        # Assert
+        assert indice._fit_X.dtype == np.int16
+        assert (indice._fit_X == casos).all()
+        assert indice._fit_X.nbytes + indice.matriz.nbytes < casos.nbytes
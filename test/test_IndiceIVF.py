@@ -0,0 +1,74 @@
+import numpy as np
+from unittest.mock import Mock
+from sklearn.neighbors import NearestNeighbors
+from truco.avaliacao import recall_vizinhos
+from truco.indice_incremental import IndiceIncremental
+from truco.indice_ivf import IndiceIVF
+
+
+class TestIndiceIVF:
+    def test_sondar_todos_os_clusters_igual_busca_exata(self, casos):
+        """Testa se, sondando todos os clusters, as distâncias coincidem com a ball tree"""
+        # Setup
+        indice = IndiceIVF(n_neighbors=10, n_clusters=16, n_probe=16).fit(casos)
+
+        # Execute
+        distancias, indices = indice.kneighbors(casos[:30])
+
+        # Assert
+        esperadas, _ = NearestNeighbors(n_neighbors=10).fit(casos).kneighbors(casos[:30])
+        assert np.allclose(distancias, esperadas)
+        assert np.allclose(distancias, np.linalg.norm(casos[indices] - casos[:30, None, :], axis=2))
+
+    def test_n_probe_aumenta_recall(self, casos):
+        """Testa se sondar mais clusters aproxima o resultado da busca exata"""
+        # Setup
+        exatos = NearestNeighbors(n_neighbors=20).fit(casos).kneighbors(casos[:50], return_distance=False)
+
+        # Execute
+        recalls = [recall_vizinhos(exatos, IndiceIVF(n_neighbors=20, n_clusters=32, n_probe=n_probe).fit(casos).kneighbors(casos[:50], return_distance=False)) for n_probe in [1, 8]]
+
+        # Assert
+        assert recalls[0] < recalls[1]
+        assert recalls[1] > 0.9
+
+    def test_clusters_pequenos_sondam_mais_clusters(self, casos):
+        """Testa se a busca sempre devolve k vizinhos, mesmo quando os clusters sondados têm menos de k casos"""
+        # Setup
+        indice = IndiceIVF(n_neighbors=100, n_clusters=64, n_probe=1).fit(casos)
+
+        # Execute
+        indices = indice.kneighbors(casos[:5], return_distance=False)
+
+        # Assert
+        assert all(len(set(linha)) == 100 for linha in indices)
+
+    def test_estender_atribui_sem_reagrupar(self, casos):
+        """Testa se os novos casos entram no cluster mais próximo, com os mesmos centroides, e passam a ser encontrados"""
+        # Setup
+        indice = IndiceIVF(n_neighbors=5, n_clusters=16).fit(casos[:700])
+
+        # Execute
+        estendido = indice.estender(casos[700:])
+        distancias, indices = estendido.kneighbors(casos[750:755])
+
+        # Assert
+        assert estendido.centroides is indice.centroides
+        assert (estendido.atribuicoes[:700] == indice.atribuicoes).all()
+        assert (indices[:, 0] == np.arange(750, 755)).all()
+        assert np.allclose(distancias[:, 0], 0)
+
+    def test_compactacao_estende_sem_treinar(self, casos):
+        """Testa se a compactação do índice incremental estende o IVF em vez de treinar um novo"""
+        # Setup
+        construir = Mock(side_effect=lambda X: IndiceIVF(n_neighbors=5, n_clusters=16).fit(X))
+        indice = IndiceIncremental(construir(casos[:700]), construir, limite_delta=100)
+
+        # Execute
+        indice.adicionar(casos[700:])
+        indice.aguardar_compactacao()
+
+        # Assert
+        assert construir.call_count == 1
+        assert len(indice.delta) == 0
+        assert len(indice.principal.atribuicoes) == 800
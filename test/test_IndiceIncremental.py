@@ -0,0 +1,88 @@
+import pytest
+import numpy as np
+from unittest.mock import Mock
+from sklearn.neighbors import NearestNeighbors
+from truco.indice_incremental import IndiceIncremental, anexar_linha
+
+
+def construir(X):
+    """Construtor do índice principal usado nos testes"""
+    return NearestNeighbors(n_neighbors=5, algorithm='ball_tree').fit(X)
+
+
+class TestIndiceIncremental:
+    def test_kneighbors_mescla_principal_e_delta(self):
+        """Testa se a busca com delta equivale à busca exata sobre todos os casos"""
+        # Setup
+        rng = np.random.default_rng(0)
+        principal = rng.integers(0, 50, (200, 4)).astype(float)
+        novos = rng.integers(0, 50, (30, 4)).astype(float)
+        indice = IndiceIncremental(construir(principal), construir, limite_delta=1000)
+
+        # Execute
+        indice.adicionar(novos)
+        distancias, indices = indice.kneighbors(novos[:10])
+
+        # Assert
+        esperadas, _ = construir(np.vstack([principal, novos])).kneighbors(novos[:10])
+        assert np.allclose(distancias, esperadas)
+        assert (indices[:, 0] >= 200).all()
+
+    def test_compactacao_incorpora_delta(self):
+        """Testa se a compactação reconstrói o principal ao exceder o limite do delta"""
+        # Setup
+        rng = np.random.default_rng(1)
+        principal = rng.integers(0, 50, (100, 3)).astype(float)
+        indice = IndiceIncremental(construir(principal), construir, limite_delta=10)
+
+        # Execute
+        for linha in rng.integers(0, 50, (10, 3)):
+            indice.adicionar(linha)
+        indice.aguardar_compactacao()
+
+        # Assert
+        assert indice.compactacoes == 1
+        assert len(indice.delta) == 0
+        assert len(indice) == 110
+
+    def test_falha_na_compactacao_nao_dispara_novas(self):
+        """Testa se uma compactação que falha é registrada, mantém o delta consultável e não é disparada de novo a cada caso"""
+        # Setup
+        rng = np.random.default_rng(2)
+        principal = rng.integers(0, 50, (100, 3)).astype(float)
+        construtor = Mock(side_effect=ValueError('base inválida'))
+        indice = IndiceIncremental(construir(principal), construtor, limite_delta=2)
+
+        # Execute
+        with pytest.warns(RuntimeWarning):
+            for linha in rng.integers(0, 50, (2, 3)):
+                indice.adicionar(linha)
+            indice.aguardar_compactacao()
+        for linha in rng.integers(0, 50, (5, 3)):
+            indice.adicionar(linha)
+        _, vizinhos = indice.kneighbors(indice.delta[-1:], n_neighbors=1)
+
+        # Assert
+        assert isinstance(indice.erro_compactacao, ValueError)
+        assert construtor.call_count == 1
+        assert indice.compactacao is None
+        assert len(indice.delta) == 7
+        assert vizinhos.tolist() == [[106]]
+
+    def test_anexar_linha_mantem_array_original(self):
+        """Testa se as linhas anexadas vão para a cauda da coluna, sem alterar nem copiar o array original somente leitura"""
+        # Setup
+        coluna = np.arange(4, dtype=np.int16)
+        coluna.flags.writeable = False
+        colunas = {'jogadorMao': coluna}
+
+        # Execute
+        for valor in range(9, 29):
+            colunas = anexar_linha(colunas, len(colunas['jogadorMao']), {'jogadorMao': valor})
+
+        # Assert
+        assert colunas['jogadorMao'].base is not None and np.shares_memory(colunas['jogadorMao'].base, coluna)
+        assert coluna.tolist() == [0, 1, 2, 3]
+        assert len(colunas['jogadorMao']) == 24
+        assert colunas['jogadorMao'][np.array([[1, 4], [23, 0]])].tolist() == [[1, 9], [28, 0]]
+        assert colunas['jogadorMao'][:6].tolist() == [0, 1, 2, 3, 9, 10]
@@ -0,0 +1,67 @@
+import pytest
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+from truco.indice_incremental import IndiceIncremental
+from truco.indice_particionado import IndiceParticionado, construir_particoes
+
+
+def construir(X):
+    """Construtor dos índices usado nos testes"""
+    return NearestNeighbors(n_neighbors=5, algorithm='ball_tree').fit(X)
+
+
+def criar_indice_particionado(matriz, chaves, suporte_minimo):
+    """Monta o índice particionado sobre a matriz de casos e as chaves de contexto"""
+    global_ = IndiceIncremental(construir(matriz), construir)
+    particoes = construir_particoes(matriz, chaves, construir, suporte_minimo)
+    return IndiceParticionado(global_, particoes, chaves.shape[1], construir)
+
+
+class TestIndiceParticionado:
+    def test_construir_particoes_ignora_contextos_esparsos(self):
+        """Testa se apenas contextos com suporte mínimo ganham partição, com as posições dos seus casos"""
+        # Setup
+        matriz = np.arange(40, dtype=float).reshape(20, 2)
+        chaves = np.array([[0]] * 12 + [[1]] * 6 + [[2]] * 2)
+
+        # Execute
+        particoes = construir_particoes(matriz, chaves, construir, 6)
+
+        # Assert
+        assert set(particoes) == {(0,), (1,)}
+        assert particoes[(1,)][0].tolist() == list(range(12, 18))
+
+    def test_kneighbors_busca_apenas_no_contexto(self):
+        """Testa se a consulta retorna só casos do seu contexto, em posições da base inteira, e usa o global quando não há partição"""
+        # Setup
+        rng = np.random.default_rng(0)
+        matriz = rng.integers(0, 50, (300, 3)).astype(float)
+        chaves = np.array([[0]] * 150 + [[1]] * 145 + [[2]] * 5)
+        indice = criar_indice_particionado(matriz, chaves, 10)
+        consultas = np.hstack([matriz[[0, 200, 297]], [[1], [0], [2]]])
+
+        # Execute
+        distancias, indices = indice.kneighbors(consultas)
+
+        # Assert
+        assert (chaves[indices[0]] == 1).all()
+        assert (chaves[indices[1]] == 0).all()
+        esperadas, _ = construir(matriz).kneighbors(matriz[[297]])
+        assert np.allclose(distancias[2], esperadas[0])
+        assert (indice.consultas_particao, indice.consultas_globais) == (2, 1)
+
+    def test_adicionar_caso_na_particao(self):
+        """Testa se um caso retido entra no índice global e na partição do seu contexto"""
+        # Setup
+        rng = np.random.default_rng(1)
+        matriz = rng.integers(0, 50, (100, 2)).astype(float)
+        chaves = np.array([[0]] * 50 + [[1]] * 50)
+        indice = criar_indice_particionado(matriz, chaves, 10)
+
+        # Execute
+        indice.adicionar([99, 99, 1])
+        indices = indice.kneighbors([[99, 99, 1]], return_distance=False)
+
+        # Assert
+        assert len(indice) == 101
+        assert indices[0, 0] == 100
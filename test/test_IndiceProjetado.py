@@ -0,0 +1,65 @@
+import pytest
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+from truco.avaliacao import relatorio_projecao
+from truco.indice_incremental import IndiceIncremental
+from truco.indice_projetado import IndiceProjetado
+
+
+@pytest.fixture
+def casos():
+    """Casos com 5 colunas correlacionadas, geradas a partir de 2 fatores"""
+    gerador = np.random.default_rng(0)
+    fatores = gerador.normal(size=(600, 2))
+    return fatores @ gerador.normal(size=(2, 5)) * 10
+
+
+class TestIndiceProjetado:
+    def test_todas_as_dimensoes_igual_busca_exata(self, casos):
+        """Testa se, projetando em todas as dimensões, as distâncias coincidem com a ball tree"""
+        # Setup
+        indice = IndiceProjetado(n_neighbors=10, dimensoes=5).fit(casos)
+
+        # Execute
+        distancias, _ = indice.kneighbors(casos[:20])
+
+        # Assert
+        esperadas, _ = NearestNeighbors(n_neighbors=10).fit(casos).kneighbors(casos[:20])
+        assert np.allclose(distancias, esperadas)
+
+    def test_projecao_preserva_vizinhos_de_colunas_correlacionadas(self, casos):
+        """Testa se duas dimensões bastam para casos gerados por dois fatores"""
+        # Setup
+        indice = IndiceProjetado(n_neighbors=10, dimensoes=2).fit(casos)
+
+        # Execute
+        _, indices = indice.kneighbors(casos[:20])
+
+        # Assert
+        _, esperados = NearestNeighbors(n_neighbors=10).fit(casos).kneighbors(casos[:20])
+        assert indice.variancia_explicada == pytest.approx(1.0)
+        assert (np.sort(indices, axis=1) == np.sort(esperados, axis=1)).all()
+
+    def test_delta_incremental_no_espaco_projetado(self, casos):
+        """Testa se o delta do índice incremental é comparado às consultas no espaço projetado"""
+        # Setup
+        construir = lambda X: IndiceProjetado(n_neighbors=5, dimensoes=2).fit(X)
+        indice = IndiceIncremental(construir(casos[:500]), construir, limite_delta=1000)
+
+        # Execute
+        indice.adicionar(casos[500:])
+        distancias, indices = indice.kneighbors(casos[550:555])
+
+        # Assert
+        assert (indices[:, 0] == np.arange(550, 555)).all()
+        assert np.allclose(distancias[:, 0], 0)
+
+    def test_relatorio_por_dimensao(self, casos):
+        """Testa se o relatório compara cada número de dimensões com a busca exata"""
+        # Execute
+        resultados = relatorio_projecao(casos, [1, 2], n_consultas=20, n_neighbors=10)
+
+        # Assert
+        assert [resultado['dimensoes'] for resultado in resultados] == [1, 2]
+        assert resultados[0]['variancia_explicada'] < resultados[1]['variancia_explicada']
+        assert resultados[1]['recall'] == pytest.approx(1.0)
@@ -0,0 +1,86 @@
+import pytest
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+from truco.indice_incremental import IndiceIncremental
+from truco.indice_quantizado import IndiceQuantizado
+
+
+@pytest.fixture
+def casos():
+    """Base de casos com atributos inteiros e o preenchimento -100, como a codificada pelo Dados"""
+    gerador = np.random.default_rng(0)
+    casos = gerador.integers(0, 53, (600, 5)).astype(float)
+    casos[gerador.random(casos.shape) < 0.3] = -100
+    return casos
+
+
+class TestIndiceQuantizado:
+    def test_matriz_uint8_com_preenchimento_em_zero(self, casos):
+        """Testa se a base é guardada em uint8, com o preenchimento -100 no código 0"""
+        # Execute
+        indice = IndiceQuantizado().fit(casos)
+
+        # Assert
+        assert indice._fit_X.dtype == np.uint8
+        assert (indice._fit_X[casos == -100] == 0).all()
+        assert indice._fit_X.nbytes * 8 == casos.nbytes
+
+    @pytest.mark.parametrize('metrica, p', [('l2', 2), ('l1', 1)])
+    def test_kneighbors_igual_busca_exata(self, casos, metrica, p):
+        """Testa se as distâncias sobre a base quantizada coincidem com a busca exata, inclusive em blocos e com consultas fora da faixa"""
+        # Setup
+        indice = IndiceQuantizado(n_neighbors=10, metrica=metrica, tamanho_bloco=512).fit(casos[:500])
+        consultas = np.vstack([casos[500:530], np.full((1, 5), 300.0)])
+
+        # Execute
+        distancias, indices = indice.kneighbors(consultas)
+
+        # Assert
+        esperadas, _ = NearestNeighbors(n_neighbors=10, p=p).fit(casos[:500]).kneighbors(consultas)
+        assert np.allclose(distancias, esperadas)
+        assert np.allclose(distancias, np.linalg.norm(casos[indices] - consultas[:, None, :], ord=p, axis=2))
+
+    def test_amplitude_acima_de_uint8(self):
+        """Testa se colunas que não cabem em uint8 são recusadas"""
+        # Execute / Assert
+        with pytest.raises(ValueError):
+            IndiceQuantizado().fit(np.array([[0.0], [300.0]]))
+
+    def test_delta_e_compactacao_na_metrica_do_indice(self, casos):
+        """Testa se o delta usa a métrica L1 do índice e se a compactação estende a base quantizada"""
+        # Setup
+        construir = lambda X: IndiceQuantizado(n_neighbors=5, metrica='l1').fit(X)
+        indice = IndiceIncremental(construir(casos[:500]), construir, limite_delta=1000)
+        indice.adicionar(casos[500:])
+        esperadas, _ = construir(casos).kneighbors(casos[550:555])
+
+        # Execute
+        distancias, _ = indice.kneighbors(casos[550:555])
+        indice.compactar()
+
+        # Assert
+        assert np.allclose(distancias, esperadas)
+        assert indice.principal._fit_X.dtype == np.uint8
+        assert len(indice.principal._fit_X) == 600
+        assert np.allclose(indice.kneighbors(casos[550:555])[0], esperadas)
+
+    def test_compactacao_arredonda_casos_retidos_com_fracao(self, casos):
+        """Testa se casos retidos com frações, dentro e fora da faixa da base, são compactados arredondados como as consultas,
+        com as mesmas distâncias antes e depois da compactação"""
+        for valor in [17.25, 60.75]:
+            # Setup
+            construir = lambda X: IndiceQuantizado(n_neighbors=5).fit(X)
+            indice = IndiceIncremental(construir(casos[:500]), construir, limite_delta=1000)
+            retidos = casos[500:510].copy()
+            retidos[:, 0] = valor
+            indice.adicionar(retidos)
+            antes = indice.kneighbors(retidos[:3])[0]
+
+            # Execute
+            indice.compactar()
+
+            # Assert
+            assert indice.erro_compactacao is None
+            assert len(indice.principal._fit_X) == 510
+            assert (indice.principal._fit_X[500:, 0] + indice.principal.deslocamento[0] == np.rint(retidos[:, 0])).all()
+            assert np.allclose(indice.kneighbors(retidos[:3])[0], antes)
@@ -0,0 +1,47 @@
+import pytest
+import uuid
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+from truco.memoria_compartilhada import publicar_objeto, anexar_objeto, liberar
+
+
+@pytest.fixture
+def nome():
+    """Nome único do segmento, para não colidir com outras execuções"""
+    return f'truco_teste_{uuid.uuid4().hex[:8]}'
+
+
+class TestMemoriaCompartilhada:
+    def test_anexar_reconstroi_arrays_somente_leitura(self, nome):
+        """Testa se o objeto anexado reproduz os arrays publicados, sem permitir escrita"""
+        # Setup
+        matriz = np.asfortranarray(np.arange(12, dtype=np.int16).reshape(4, 3))
+        segmentos = publicar_objeto(nome, {'matriz': matriz, 'colunas': ['a', 'b', 'c']})
+
+        try:
+            # Execute
+            base = anexar_objeto(nome)
+
+            # Assert
+            assert base['colunas'] == ['a', 'b', 'c']
+            assert (base['matriz'] == matriz).all()
+            assert base['matriz'].flags.f_contiguous
+            assert not (base['matriz'].flags.writeable)
+        finally:
+            liberar(segmentos)
+
+    def test_anexar_indice_treinado(self, nome):
+        """Testa se um índice treinado continua respondendo consultas após ser anexado"""
+        # Setup
+        X = np.random.default_rng(0).integers(0, 50, (200, 4)).astype(float)
+        nbrs = NearestNeighbors(n_neighbors=5, algorithm='ball_tree').fit(X)
+        segmentos = publicar_objeto(nome, {'nbrs': nbrs})
+
+        try:
+            # Execute
+            anexado = anexar_objeto(nome)['nbrs']
+
+            # Assert
+            assert (anexado.kneighbors(X[:10], return_distance=False) == nbrs.kneighbors(X[:10], return_distance=False)).all()
+        finally:
+            liberar(segmentos)
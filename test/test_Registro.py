@@ -0,0 +1,90 @@
+import pytest
+import numpy as np
+from truco.registro import Registro
+
+
+@pytest.fixture
+def registro():
+    """Registro com algumas colunas da base de casos, uma delas repetida"""
+    return Registro(['jogadorMao', 'cartaAltaRobo', 'quemPediuEnvido', 'jogadorMao'])
+
+
+class TestRegistro:
+    def test_inicia_zerado_sem_colunas_repetidas(self, registro):
+        """Testa se o registro começa zerado e com cada coluna em uma única posição"""
+        # Assert
+        assert registro.colunas == ['jogadorMao', 'cartaAltaRobo', 'quemPediuEnvido']
+        assert len(registro) == 3
+        assert registro.jogadorMao == 0
+
+    def test_campo_desconhecido_gera_erro(self, registro):
+        """Testa se atribuir ou ler um campo que não é coluna do registro gera AttributeError"""
+        # Execute / Assert
+        with pytest.raises(AttributeError):
+            registro.quemEnvido = 1
+        with pytest.raises(AttributeError):
+            registro.quemEnvido
+        assert not hasattr(registro, 'quemEnvido')
+
+    def test_valor_nao_numerico_gera_erro(self, registro):
+        """Testa se atribuir um valor não numérico gera TypeError, e se valores numéricos do numpy são aceitos"""
+        # Execute / Assert
+        with pytest.raises(TypeError):
+            registro.cartaAltaRobo = '12'
+        registro.cartaAltaRobo = np.int64(12)
+        registro.quemPediuEnvido = True
+        assert registro.cartaAltaRobo == 12
+        assert registro.quemPediuEnvido == 1
+
+    def test_as_query_sem_copia_e_na_ordem_das_colunas(self, registro):
+        """Testa se a consulta completa é uma visão do registro e se a consulta por colunas segue a ordem informada"""
+        # Setup
+        registro.jogadorMao = 1
+        registro.quemPediuEnvido = 2
+
+        # Execute
+        completa = registro.as_query()
+        parcial = registro.as_query(['quemPediuEnvido', 'jogadorMao'])
+
+        # Assert
+        assert completa.shape == (1, 3)
+        assert np.shares_memory(completa, registro.valores)
+        assert parcial.tolist() == [[2, 1]]
+
+    def test_copy_independente(self, registro):
+        """Testa se a cópia não altera o registro original"""
+        # Setup
+        copia = registro.copy()
+
+        # Execute
+        copia.jogadorMao = 2
+
+        # Assert
+        assert registro.jogadorMao == 0
+        assert copia.colunas == registro.colunas
+
+    def test_para_dataframe(self, registro):
+        """Testa se o registro vira um DataFrame de uma linha com índice idMao"""
+        # Setup
+        registro.cartaAltaRobo = 24
+
+        # Execute
+        df = registro.para_dataframe()
+
+        # Assert
+        assert list(df.columns) == registro.colunas
+        assert df.index.name == 'idMao'
+        assert df['cartaAltaRobo'].tolist() == [24]
+
+    def test_para_dataframe_mantem_inteiros(self, registro):
+        """Testa se colunas de valores inteiros são gravadas no csv sem casas decimais, e frações são mantidas"""
+        # Setup
+        registro.jogadorMao = 1
+        registro.cartaAltaRobo = 24
+        registro.quemPediuEnvido = 18.5
+
+        # Execute
+        csv = registro.para_dataframe().to_csv()
+
+        # Assert
+        assert csv.splitlines() == ['idMao,jogadorMao,cartaAltaRobo,quemPediuEnvido', '0,1,24,18.5']
@@ -0,0 +1,84 @@
+import pytest
+from unittest.mock import Mock
+from truco.cbr import Cbr
+from truco.cache import CacheLRU
+from truco.tabela_decisoes import maos_primeira_rodada, argumentos_decisao, parametros_tabela
+
+
+class TestTabelaDecisoes:
+    def test_maos_primeira_rodada_agrupa_por_pontuacao(self):
+        """Testa se as mãos são agrupadas pela pontuação alta, média e baixa, com todas as ordens possíveis na mão"""
+        # Execute
+        maos = maos_primeira_rodada()
+
+        # Assert
+        assert (52, 50, 42) in maos
+        assert all(alta >= media >= baixa for alta, media, baixa in maos)
+        assert len(maos[(52, 50, 42)]['pontuacoes']) == 6
+        assert maos[(52, 50, 42)]['envidos'] == {28}
+
+    def test_argumentos_envido_cobrem_pedidos_e_placar(self):
+        """Testa se os argumentos do envido combinam cada pedido, cada envido possível e as duas situações de placar"""
+        # Setup
+        maos = {(24, 16, 12): {'qualidade': 20.0, 'pontuacoes': {(24, 16, 12)}, 'envidos': {3, 25}}}
+
+        # Execute
+        argumentos = argumentos_decisao('envido', maos, [(24, 16, 12)])
+
+        # Assert
+        assert len(argumentos) == 4 * 2 * 2
+        assert ('Envido', 2, 25, True) in argumentos
+
+    def test_consultar_tabela(self):
+        """Testa se o Cbr responde pela tabela quando o estado foi pré-calculado e retorna None quando não foi"""
+        # Setup
+        cbr = Cbr.__new__(Cbr)
+        cbr.chave_consulta = Mock(return_value=(('truco', 0, b'resumo'), None))
+        cbr.tabela = {('truco', b'resumo', 20.0): 2}
+
+        # Execute
+        resposta = cbr.consultar_tabela('truco', (20.0,))
+        ausente = cbr.consultar_tabela('truco', (5.0,))
+
+        # Assert
+        assert resposta == 2
+        assert ausente is None
+
+    def test_parametros_tabela_incluem_expansao_de_vizinhos(self):
+        """Testa se a chave da tabela muda com o suporte mínimo e o k máximo da expansão de vizinhos"""
+        # Setup
+        cbr = Cbr.__new__(Cbr)
+        cbr.colunas_decisao = {'truco': ['jogadorMao']}
+        cbr.backend = 'ball_tree'
+        cbr.parametros_backend = {}
+        cbr.colunas_particao = []
+        cbr.suporte_minimo_particao = 1000
+        cbr.suporte_minimo = 1
+        cbr.k_maximo = 1600
+
+        # Execute
+        padrao = parametros_tabela(cbr)
+        cbr.suporte_minimo = 60
+        com_suporte = parametros_tabela(cbr)
+        cbr.k_maximo = 400
+        com_k_maximo = parametros_tabela(cbr)
+
+        # Assert
+        assert len({repr(padrao), repr(com_suporte), repr(com_k_maximo)}) == 3
+
+    def test_casos_retidos_descartam_tabela(self):
+        """Testa se, depois de um caso retido invalidar as consultas, as decisões deixam de usar a tabela"""
+        # Setup
+        cbr = Cbr.__new__(Cbr)
+        cbr.chave_consulta = Mock(return_value=(('truco', 0, b'resumo'), None))
+        cbr.tabela = {('truco', b'resumo', 20.0): 2}
+        cbr.versao_indice = 0
+        cbr.consultas_registro = {}
+        cbr.cache_vizinhos = CacheLRU(4)
+        cbr.modas_globais = {}
+
+        # Execute
+        cbr.invalidar_cache()
+
+        # Assert
+        assert cbr.consultar_tabela('truco', (20.0,)) is None
@@ -15,6 +15,8 @@ import os
 def reiniciarJogo():
     """Reseta todos os parâmetros do jogo, referente as rodadas"""
     dados.finalizar_partida()
+    cbr.reter_caso(dados.retornar_registro())
+    dados.resetar()
     jogador1.resetar()
     jogador2.resetar()
     baralho.resetar()
@@ -152,9 +154,11 @@ def turno_do_bot(carta_jogador_01):
 jogo = Jogo()
 baralho = Baralho()
 baralho.embaralhar() # Voltar a embaralhar para o jogo funcionar normalmente.
-cbr = Cbr()
+# Com TRUCO_BASE_COMPARTILHADA definida, a base de casos é anexada da memória compartilhada (python -m truco.memoria_compartilhada)
+base_compartilhada = os.environ.get('TRUCO_BASE_COMPARTILHADA')
+dados = Dados(base_compartilhada)
+cbr = Cbr(dados=dados)
 interface = Interface()
-dados = Dados()
 truco = Truco()
 flor = Flor()
 envido = Envido()
@@ -0,0 +1,84 @@
+import argparse
+import time
+import numpy as np
+from .indice import criar_indice
+
+
+def recall_vizinhos(indices_exatos, indices_aproximados):
+    """Fração média dos vizinhos exatos que também foram retornados pela busca avaliada (recall@k)."""
+    acertos = [len(np.intersect1d(exatos, aproximados)) for exatos, aproximados in zip(indices_exatos, indices_aproximados)]
+    return float(np.mean(acertos)) / indices_exatos.shape[1]
+
+
+def medir_consultas(indice, consultas, n_neighbors):
+    """Executa as consultas uma a uma, como no jogo, e retorna os vizinhos e a latência média em milissegundos."""
+    indices = []
+    inicio = time.perf_counter()
+    for consulta in consultas:
+        indices.append(indice.kneighbors(consulta.reshape(1, -1), n_neighbors=n_neighbors, return_distance=False)[0])
+
+    return np.array(indices), 1000 * (time.perf_counter() - inicio) / len(consultas)
+
+
+def relatorio_recall(X, backend, parametros=None, n_consultas=200, n_neighbors=100, semente=0):
+    """Compara um backend com a ball tree exata sobre a mesma matriz de casos, reportando recall@k e latência."""
+    X = np.asarray(X, dtype=np.float64)
+    consultas = X[np.random.default_rng(semente).choice(len(X), size=min(n_consultas, len(X)), replace=False)]
+    exato = criar_indice('ball_tree', n_neighbors).fit(X)
+    avaliado = criar_indice(backend, n_neighbors, **(parametros or {})).fit(X)
+    indices_exatos, latencia_exata = medir_consultas(exato, consultas, n_neighbors)
+    indices_avaliados, latencia_avaliada = medir_consultas(avaliado, consultas, n_neighbors)
+    return {
+        'backend': backend,
+        'parametros': parametros or {},
+        'recall': recall_vizinhos(indices_exatos, indices_avaliados),
+        'latencia_exata_ms': latencia_exata,
+        'latencia_ms': latencia_avaliada,
+    }
+
+
+def relatorio_projecao(X, dimensoes, n_consultas=200, n_neighbors=100, semente=0):
+    """Sobreposição dos vizinhos do índice projetado (PCA) com a busca exata em todas as dimensões, para cada número de dimensões,
+    com a variância preservada pela projeção e as latências. Serve para escolher o parâmetro dimensoes do backend projetado."""
+    X = np.asarray(X, dtype=np.float64)
+    consultas = X[np.random.default_rng(semente).choice(len(X), size=min(n_consultas, len(X)), replace=False)]
+    indices_exatos, latencia_exata = medir_consultas(criar_indice('ball_tree', n_neighbors).fit(X), consultas, n_neighbors)
+    resultados = []
+    for dimensao in dimensoes:
+        projetado = criar_indice('projetado', n_neighbors, dimensoes=dimensao).fit(X)
+        indices_projetados, latencia_projetada = medir_consultas(projetado, consultas, n_neighbors)
+        resultados.append({
+            'dimensoes': dimensao,
+            'variancia_explicada': projetado.variancia_explicada,
+            'recall': recall_vizinhos(indices_exatos, indices_projetados),
+            'latencia_exata_ms': latencia_exata,
+            'latencia_ms': latencia_projetada,
+        })
+
+    return resultados
+
+
+if __name__ == '__main__':
+    from .cbr import COLUNAS_DECISAO
+    from .dados import Dados
+
+    parser = argparse.ArgumentParser(description='Recall@k de um backend de índice contra a ball tree exata, sobre a base de casos.')
+    parser.add_argument('--backend', default='aproximado')
+    parser.add_argument('--parametro', action='append', default=[], metavar='NOME=VALOR', help='parâmetro inteiro do backend, ex.: n_arvores=16')
+    parser.add_argument('--consultas', type=int, default=200)
+    parser.add_argument('-k', type=int, default=100)
+    parser.add_argument('--dimensoes', type=int, nargs='+', help='compara o backend projetado com cada número de dimensões, em vez de --backend')
+    argumentos = parser.parse_args()
+    parametros = {nome: int(valor) for nome, valor in (parametro.split('=') for parametro in argumentos.parametro)}
+
+    casos = Dados().retornar_casos()
+    for decisao, colunas in COLUNAS_DECISAO.items():
+        if (argumentos.dimensoes):
+            for resultado in relatorio_projecao(casos[colunas], argumentos.dimensoes, argumentos.consultas, argumentos.k):
+                print(f"{decisao} ({len(colunas)} colunas -> {resultado['dimensoes']}): sobreposição@{argumentos.k} = {resultado['recall']:.3f} | "
+                      f"variância {resultado['variancia_explicada']:.3f} | {resultado['latencia_ms']:.2f} ms/consulta vs {resultado['latencia_exata_ms']:.2f} ms/consulta (ball_tree)")
+            continue
+
+        resultado = relatorio_recall(casos[colunas], argumentos.backend, parametros, argumentos.consultas, argumentos.k)
+        print(f"{decisao}: recall@{argumentos.k} = {resultado['recall']:.3f} | "
+              f"{resultado['latencia_ms']:.2f} ms/consulta ({argumentos.backend}) vs {resultado['latencia_exata_ms']:.2f} ms/consulta (ball_tree)")
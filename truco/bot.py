@@ -1,9 +1,19 @@
 import random 
 import pandas as pd
 
+# Tempo máximo (em segundos) de cada consulta ao CBR antes de o bot recorrer à heurística
+PRAZOS_DECISAO = {'jogar_carta': 0.05, 'truco': 0.05, 'envido': 0.05}
+# Limiares da heurística, próximos dos quartis superiores de qualidade da mão e de envido de uma mão sorteada
+LIMIAR_MAO_BOA = 19
+LIMIAR_MAO_FORTE = 32
+LIMIAR_ENVIDO_BOM = 26
+LIMIAR_ENVIDO_FORTE = 29
+
 class Bot():
-    def __init__(self, nome):
+    def __init__(self, nome, prazos=None):
         self.nome = nome
+        self.prazos = dict(PRAZOS_DECISAO, **(prazos or {}))
+        self.heuristica = {}
         self.mao = []
         self.mao_rank = []
         self.indices = []
@@ -29,6 +39,7 @@ class Bot():
         self.pontuacao_cartas, self.mao_rank = self.mao[0].classificar_carta(self.mao)
         self.calcular_qualidade_mao(self.pontuacao_cartas, self.mao_rank)
         self.envido = self.calcula_envido(self.mao)
+        self.heuristica = self.calcular_heuristica()
         # print(self.mostrar_mao())
 
 
@@ -66,17 +77,20 @@ class Bot():
         # Pedir truco
         if (len(self.mao) <= 2 and self.pediu_truco is False):
             # CHAMADA DO CBR OU OUTRA INTELIGÊNCIA DEVE OCORRER AQUI
-            truco = cbr.truco('truco', 1, self.qualidade_mao)
+            truco = cbr.truco('truco', 1, self.qualidade_mao, prazo=self.prazos['truco'])
             if (truco is None):
-                pass
+                truco = self.heuristica['truco']
 
-            elif (truco in [1, 2]):
+            if (truco in [1, 2]):
                 self.pediu_truco = True
                 return 4
 
         # Manda o valor de acordo com a rodada, para o CBR escolher as colunas/campos necessários
         # CHAMADA DO CBR OU OUTRA INTELIGÊNCIA DEVE OCORRER AQUI
-        escolha = cbr.jogar_carta(self.rodada, self.pontuacao_cartas)
+        escolha = cbr.jogar_carta(self.rodada, self.pontuacao_cartas, prazo=self.prazos['jogar_carta'])
+        if (escolha is None):
+            escolha = self.heuristica_carta()
+
         # print(escolha)
         self.ajustar_indices(escolha)
         self.rodada += 1
@@ -152,7 +166,11 @@ class Bot():
     def avaliar_truco(self, cbr, tipo, quem_pediu):
         """Verifica se a melhor jogada para o bot deve pedir, aceitar, recusar ou aumentar a aposta do truco."""
         # CHAMADA DO CBR OU OUTRA INTELIGÊNCIA DEVE OCORRER AQUI
-        return cbr.truco(tipo, quem_pediu, self.qualidade_mao)
+        escolha = cbr.truco(tipo, quem_pediu, self.qualidade_mao, prazo=self.prazos['truco'])
+        if (escolha is None):
+            return self.heuristica['truco']
+
+        return escolha
     
 
     def avaliar_envido(self, cbr, tipo, quem_pediu, pontos_totais_adversario):
@@ -165,7 +183,11 @@ class Bot():
             perdendo = False
 
         # CHAMADA DO CBR OU OUTRA INTELIGÊNCIA DEVE OCORRER AQUI
-        return cbr.envido(tipo, quem_pediu, self.envido, perdendo)
+        escolha = cbr.envido(tipo, quem_pediu, self.envido, perdendo, prazo=self.prazos['envido'])
+        if (escolha is None):
+            return self.heuristica_envido(tipo, quem_pediu)
+
+        return escolha
 
     def avaliar_pedir_envido(self):
         """Verifica se a melhor jogada para o bot seria pedir envido."""
@@ -179,6 +201,43 @@ class Bot():
         m3 = ((2 * m1) + m2) / (2+1)
         self.qualidade_mao = m3
 
+    def calcular_heuristica(self):
+        """Pré-calcula as respostas de truco e envido usadas quando o CBR não responde dentro do prazo."""
+        if (self.qualidade_mao >= LIMIAR_MAO_FORTE):
+            truco = 2
+        elif (self.qualidade_mao >= LIMIAR_MAO_BOA):
+            truco = 1
+        else:
+            truco = 0
+
+        return {
+            'truco': truco,
+            'pedir_envido': 6 if self.envido >= LIMIAR_ENVIDO_BOM else 0,
+            # Resposta a envido (6), real envido (7) e falta envido (8)
+            'envido': {
+                6: 2 if self.envido >= LIMIAR_ENVIDO_FORTE else int(self.envido >= LIMIAR_ENVIDO_BOM),
+                7: int(self.envido >= LIMIAR_ENVIDO_BOM),
+                8: int(self.envido >= LIMIAR_ENVIDO_FORTE),
+            },
+        }
+
+
+    def heuristica_envido(self, tipo, quem_pediu):
+        """Resposta de envido da heurística: pedir quando o bot avalia a primeira jogada, senão responder ao pedido do tipo informado."""
+        if (quem_pediu == 2 and self.heuristica['pedir_envido']):
+            return self.heuristica['pedir_envido']
+
+        return self.heuristica['envido'].get(tipo, 0)
+
+
+    def heuristica_carta(self):
+        """Carta da heurística: a mais forte, exceto na primeira rodada com mão fraca, em que guarda as melhores e joga a mais fraca."""
+        if (self.rodada == 1 and self.qualidade_mao < LIMIAR_MAO_BOA):
+            return self.pontuacao_cartas.index(min(self.pontuacao_cartas))
+
+        return self.pontuacao_cartas.index(max(self.pontuacao_cartas))
+
+
     def retorna_pontos_totais(self):
         """Retorna os pontos totais do bot."""
         return self.pontos
@@ -191,6 +250,7 @@ class Bot():
         self.indices = []
         self.pontuacao_cartas = []
         self.qualidade_mao = 0
+        self.heuristica = {}
         self.rodadas = 0
         self.envido = 0
         self.rodada = 1
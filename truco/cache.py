@@ -0,0 +1,44 @@
+import threading
+from collections import OrderedDict
+
+
+class CacheLRU():
+    def __init__(self, capacidade=1024):
+        self.capacidade = capacidade
+        self.itens = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+        # Consultas com prazo guardam resultados a partir de outra thread
+        self.trava = threading.Lock()
+
+    def obter(self, chave):
+        """Retorna o valor memorizado para a chave (ou None), contabilizando acertos e falhas."""
+        with self.trava:
+            valor = self.itens.get(chave)
+            if (valor is None):
+                self.falhas += 1
+                return None
+
+            self.itens.move_to_end(chave)
+            self.acertos += 1
+            return valor
+
+
+    def guardar(self, chave, valor):
+        """Memoriza o valor, descartando o item usado há mais tempo quando a capacidade é excedida."""
+        with self.trava:
+            self.itens[chave] = valor
+            self.itens.move_to_end(chave)
+            if (len(self.itens) > self.capacidade):
+                self.itens.popitem(last=False)
+
+
+    def limpar(self):
+        """Descarta todos os itens memorizados."""
+        with self.trava:
+            self.itens.clear()
+
+
+    def estatisticas(self):
+        """Retorna os contadores de acertos e falhas do cache."""
+        return {'acertos': self.acertos, 'falhas': self.falhas, 'tamanho': len(self.itens), 'capacidade': self.capacidade}
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from .indice import hash_arquivo, lembrar_hash
+
+VERSAO_CACHE = 1
+ARRAYS_CACHE = ('matriz', 'indice_casos', 'quantidades')
+
+
+def assinatura_arquivo(caminho):
+    """Retorna o tamanho e a data de modificação (ns) do arquivo, ou None se ele não existir."""
+    try:
+        estado = os.stat(caminho)
+    except OSError:
+        return None
+
+    return estado.st_size, estado.st_mtime_ns
+
+
+def caminho_cache(caminho_csv, colunas):
+    """Retorna o diretório do cache binário da base de casos, salvo ao lado do csv e separado por conjunto de colunas."""
+    chave = hashlib.blake2b(json.dumps(list(colunas)).encode(), digest_size=8).hexdigest()
+    return f'{caminho_csv}.{chave}.casos'
+
+
+def ler_metadados(diretorio):
+    """Lê os metadados do cache, ou retorna None se não existirem ou estiverem corrompidos."""
+    try:
+        with open(os.path.join(diretorio, 'metadados.json')) as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+
+def gravar_metadados(diretorio, metadados):
+    """Grava os metadados do cache de forma atômica."""
+    temporario = os.path.join(diretorio, f'metadados.json.{os.getpid()}.tmp')
+    with open(temporario, 'w') as arquivo:
+        json.dump(metadados, arquivo)
+
+    os.replace(temporario, os.path.join(diretorio, 'metadados.json'))
+
+
+def carregar_cache(caminho_csv, colunas, assinatura):
+    """Mapeia em memória (somente leitura) os arrays do cache, se ele corresponder ao csv atual; caso contrário, retorna None.
+    Com o mesmo tamanho e data de modificação o csv não é lido; com outra data, o cache ainda vale se o hash do conteúdo for o mesmo."""
+    diretorio = caminho_cache(caminho_csv, colunas)
+    metadados = ler_metadados(diretorio)
+    if (assinatura is None or metadados is None or metadados.get('versao') != VERSAO_CACHE or metadados.get('colunas') != list(colunas)):
+        return None
+
+    tamanho, modificacao = assinatura
+    if (metadados['tamanho'] != tamanho):
+        return None
+
+    if (metadados['modificacao'] != modificacao):
+        if (hash_arquivo(caminho_csv) != metadados['hash']):
+            return None
+
+        # Arquivo tocado sem alterar o conteúdo: as próximas cargas voltam a validar só pela data
+        metadados['modificacao'] = modificacao
+        gravar_metadados(diretorio, metadados)
+
+    lembrar_hash(caminho_csv, assinatura, metadados['hash'])
+    try:
+        base = {nome: np.load(os.path.join(diretorio, f'{nome}.npy'), mmap_mode='r') for nome in ARRAYS_CACHE}
+    except (OSError, ValueError):
+        return None
+
+    base['colunas_casos'] = metadados['colunas_casos']
+    base['nome_indice'] = metadados['nome_indice']
+    return base
+
+
+def salvar_cache(caminho_csv, colunas, base, assinatura):
+    """Grava os arrays da base de casos codificada, um .npy por array, em um diretório temporário que depois substitui o cache.
+    Nada é gravado se o csv mudou desde a assinatura tirada antes da leitura."""
+    hash_csv = hash_arquivo(caminho_csv)
+    if (assinatura_arquivo(caminho_csv) != assinatura):
+        return
+
+    diretorio = caminho_cache(caminho_csv, colunas)
+    temporario = f'{diretorio}.{os.getpid()}.tmp'
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+    for nome in ARRAYS_CACHE:
+        np.save(os.path.join(temporario, f'{nome}.npy'), base[nome])
+
+    gravar_metadados(temporario, {
+        'versao': VERSAO_CACHE,
+        'colunas': list(colunas),
+        'colunas_casos': list(base['colunas_casos']),
+        'nome_indice': base['nome_indice'],
+        'tamanho': assinatura[0],
+        'modificacao': assinatura[1],
+        'hash': hash_csv,
+    })
+    shutil.rmtree(diretorio, ignore_errors=True)
+    try:
+        os.replace(temporario, diretorio)
+    except OSError:
+        # Outro processo gravou o mesmo cache ao mesmo tempo: o dele é mantido
+        shutil.rmtree(temporario, ignore_errors=True)
@@ -1,138 +1,574 @@
-from sklearn.neighbors import NearestNeighbors
+import hashlib
+import time
+import numpy as np
 import pandas as pd
 import warnings
-from .dados import Dados
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from sklearn.neighbors import BallTree
+from .cache import CacheLRU
+from .dados import Dados, CAMINHO_CASOS, COLUNA_QUANTIDADE, COLUNAS_PEDIDO_ENVIDO
+from .histogramas import HistogramasArvore, VizinhancaAgregada
+from .indice import obter_indice, criar_indice, separar_parametros, aplicar_parametros_consulta
+from .indice_incremental import IndiceIncremental, anexar_linha
+from .indice_particionado import IndiceParticionado, construir_particoes
+from .memoria_compartilhada import anexar_objeto
+from .tabela_decisoes import carregar_tabela, parametros_tabela
+
+# Colunas consideradas na busca por similaridade de cada tipo de decisão
+COLUNAS_DECISAO = {
+    'jogar_carta': [
+        'jogadorMao', 'cartaAltaRobo', 'cartaMediaRobo', 'cartaBaixaRobo', 'primeiraCartaRobo', 'primeiraCartaHumano',
+        'segundaCartaRobo', 'segundaCartaHumano', 'terceiraCartaRobo', 'terceiraCartaHumano', 'ganhadorPrimeiraRodada', 'ganhadorSegundaRodada',
+        ],
+    'truco': [
+        'jogadorMao', 'cartaAltaRobo', 'cartaMediaRobo', 'cartaBaixaRobo', 'qualidadeMaoRobo', 'qualidadeMaoHumano',
+        'quemTruco', 'quemRetruco', 'quemValeQuatro', 'ganhadorPrimeiraRodada', 'ganhadorSegundaRodada',
+        ],
+    'envido': [
+        'jogadorMao', 'pontosEnvidoRobo', 'pontosEnvidoHumano', 'quemPediuEnvido', 'quemPediuRealEnvido', 'quemPediuFaltaEnvido',
+        ],
+}
+
+# Rótulos que filtram os vizinhos de cada decisão; todos precisam de suporte mínimo entre os vizinhos
+FILTROS_DECISAO = {
+    'jogar_carta': ['bot_venceu_mao'],
+    'truco': ['truco_ganho', 'truco_perdido'],
+    'envido': ['envido_ganho', 'envido_perdido'],
+}
+
+# Coluna da carta jogada pelo bot, de acordo com a rodada informada ao jogar_carta
+COLUNA_CARTA_RODADA = {3: 'primeiraCartaRobo', 2: 'segundaCartaRobo', 1: 'terceiraCartaRobo'}
+
+
+def argumento_por_registro(argumento, tamanho, nome):
+    """Converte um argumento das decisões em lote em uma lista com um valor por registro. Listas, tuplas e arrays são sempre
+    por registro e precisam ter exatamente tamanho valores; qualquer outro valor (um escalar) vale para todos os registros."""
+    if not (isinstance(argumento, (list, tuple, np.ndarray)) and np.ndim(argumento) > 0):
+        return [argumento] * tamanho
+
+    if (len(argumento) != tamanho):
+        raise ValueError(f'{nome} deve ter um valor por registro: {len(argumento)} valores para {tamanho} registros')
+
+    return list(argumento)
+
+
+def moda_vizinhos(valores, mascara=None, pesos=None):
+    """Retorna, para cada linha de vizinhos, o valor mais frequente entre os selecionados pela máscara e o seu suporte.
+    Com pesos, cada vizinho conta tantas vezes quanto o seu peso. Empates são resolvidos pelo vizinho mais próximo, como no value_counts do pandas."""
+    valores = np.asarray(valores)
+    if (mascara is None):
+        mascara = np.ones(valores.shape, dtype=bool)
+
+    if (pesos is None):
+        pesos = mascara
+    else:
+        pesos = np.where(mascara, pesos, 0)
+        mascara = pesos > 0
+
+    deslocados = valores.astype(np.intp) - int(valores.min())
+    largura = int(deslocados.max()) + 1
+    linhas = np.arange(valores.shape[0])[:, None]
+    contagens = np.bincount((linhas * largura + deslocados).ravel(), weights=pesos.ravel(), minlength=valores.shape[0] * largura)
+    frequencias = np.where(mascara, contagens.reshape(-1, largura)[linhas, deslocados], -1)
+    maximas = frequencias.max(axis=1)
+    primeiras = np.argmax(frequencias == maximas[:, None], axis=1)
+    return valores[linhas[:, 0], primeiras], np.maximum(maximas, 0)
+
 
 class Cbr():
-    def __init__(self):
+    def __init__(self, reconstruir_indice=False, colunas_decisao=None, capacidade_cache=1024, limite_delta=1000, backend='ball_tree', parametros_backend=None, base_compartilhada=None, dados=None, usar_tabela=True, colunas_particao=None, suporte_minimo_particao=1000, suporte_minimo=1, k_maximo=1600, k_agregacao=None):
         self.indice = 0
-        self.dados = Dados()
+        self.backend = backend
+        self.parametros_backend = parametros_backend or {}
+        # O Cbr consulta o registro do mesmo Dados em que o jogo grava as jogadas
+        self.dados = dados or Dados(base_compartilhada)
+        base_compartilhada = self.dados.base_compartilhada
         self.dataset = self.dados.retornar_casos()
+        self.casos = dict(self.dados.retornar_colunas_casos())
+        self.rotulos = dict(self.dados.retornar_rotulos())
+        self.tamanho_casos = len(self.dataset)
+        # Colunas codificadas de cada caso, sem a quantidade de linhas que ele representa
+        self.colunas_casos = [coluna for coluna in self.dataset.columns if coluna != COLUNA_QUANTIDADE]
         # self.dados = self.retornarSimilares()
-        self.nbrs = self.vizinhos_proximos()
+        self.colunas_decisao = colunas_decisao or COLUNAS_DECISAO
+        # Colunas discretas de contexto que dividem a base de casos em partições, cada uma com o seu índice
+        self.colunas_particao = list(colunas_particao or [])
+        self.suporte_minimo_particao = suporte_minimo_particao
+        # Vizinhos que atendem aos filtros de cada decisão: abaixo do suporte mínimo, k dobra até k_maximo e então vale a moda global
+        self.suporte_minimo = suporte_minimo
+        self.k_maximo = k_maximo
+        if (base_compartilhada):
+            # Índices publicados por outro processo: anexados sem cópia, com a configuração de quem os treinou
+            base = anexar_objeto(base_compartilhada)
+            self.backend = base['backend']
+            self.parametros_backend = base['parametros_backend']
+            self.colunas_decisao = base['colunas_decisao']
+            self.colunas_particao = base['colunas_particao']
+            self.suporte_minimo_particao = base['suporte_minimo_particao']
+            principais = base['nbrs']
+            self.particoes = base['particoes']
+            # A tabela publicada só vale se foi gerada com os mesmos parâmetros de decisão deste processo
+            self.tabela = base.get('tabela') if usar_tabela and base.get('parametros_tabela') == parametros_tabela(self) else None
+        else:
+            principais = {decisao: self.carregar_indice(colunas, reconstruir_indice) for decisao, colunas in self.colunas_decisao.items()}
+            self.particoes = {decisao: self.carregar_particoes(colunas, reconstruir_indice) for decisao, colunas in self.colunas_decisao.items()} if self.colunas_particao else {}
+            # Respostas pré-calculadas da primeira rodada (python -m truco.tabela_decisoes); sem a tabela, toda decisão consulta os vizinhos
+            self.tabela = carregar_tabela(self) if usar_tabela else None
+
+        self.nbrs = {decisao: IndiceIncremental(principais[decisao], self.vizinhos_proximos, limite_delta) for decisao in self.colunas_decisao}
+        for decisao, particoes in self.particoes.items():
+            self.nbrs[decisao] = IndiceParticionado(self.nbrs[decisao], particoes, len(self.colunas_particao), self.vizinhos_proximos, limite_delta)
+        self.versao_indice = 0
+        self.cache_vizinhos = CacheLRU(capacidade_cache)
+        self.consultas_registro = {}
+        # Consultas com prazo rodam em uma thread separada; criada apenas quando o primeiro prazo é usado
+        self.executor = None
+        self.busca_em_andamento = None
+        self.consultas_com_prazo = {decisao: 0 for decisao in self.colunas_decisao}
+        self.prazos_excedidos = {decisao: 0 for decisao in self.colunas_decisao}
+        self.expansoes = {decisao: {} for decisao in self.colunas_decisao}
+        self.fallbacks_marginais = {decisao: 0 for decisao in self.colunas_decisao}
+        self.modas_globais = {}
+        # A partir de k_agregacao vizinhos, as modas somam os histogramas dos nós da ball tree inteiramente dentro do raio da vizinhança.
+        # Desligado por padrão: só compensa quando as vizinhanças cobrem nós inteiros da árvore (poucas dimensões, casos sem muitos empates)
+        self.k_agregacao = k_agregacao
+        self.agregadores = {}
 
 
     def carregar_dataset(self):
-        """Carrega o dataset, caso necessário"""
-        df = pd.read_csv('dbtrucoimitacao_maos.csv', index_col='idMao').fillna(-100)
-        df.replace('ESPADAS', '1', inplace=True)
-        df.replace('OURO', '2', inplace=True)
-        df.replace('BASTOS', '3', inplace=True)
-        df.replace('COPAS', '4', inplace=True)
-        return df
+        """Carrega o dataset codificado, do cache binário da base de casos quando ele corresponde ao csv"""
+        return self.dados.carregar_casos_codificados()
 
 
     def vizinhos_proximos(self, df=None):
-        """Cálculo dos 100 Nearest Neighbors."""
+        """Cálculo dos 100 Nearest Neighbors, com o backend de índice configurado."""
         if (df is None):
-            return NearestNeighbors(n_neighbors=100, algorithm='ball_tree').fit(self.dataset)
-            
-        return NearestNeighbors(n_neighbors=100, algorithm='ball_tree').fit(df)
+            df = self.dataset
 
+        return criar_indice(self.backend, 100, **self.parametros_backend).fit(df)
 
-    def jogar_carta(self, rodada, pontuacao_cartas):
-        """Método que considera as jogadas em que o bot saiu vitorioso e retorna a pontuação mais próxima a ser jogada em determinada rodada."""
+
+    def carregar_indice(self, colunas, reconstruir=False):
+        """Carrega o índice persistido sobre as colunas informadas, treinando-o novamente apenas se os dados de origem mudaram.
+        Os parâmetros de consulta do backend (n_probe do ivf) não identificam o artefato: são aplicados ao índice carregado."""
+        construcao, consulta = separar_parametros(self.backend, self.parametros_backend)
+        parametros = {'n_neighbors': 100, 'backend': self.backend, **construcao}
+        nbrs = obter_indice(CAMINHO_CASOS, colunas, lambda: self.vizinhos_proximos(self.dataset[colunas]), parametros, reconstruir)
+        return aplicar_parametros_consulta(nbrs, consulta)
+
+
+    def carregar_particoes(self, colunas, reconstruir=False):
+        """Carrega os índices persistidos de cada partição da base de casos, treinando-os novamente apenas se os dados de origem mudaram."""
+        construcao, consulta = separar_parametros(self.backend, self.parametros_backend)
+        parametros = {'n_neighbors': 100, 'backend': self.backend, **construcao, 'particao': self.colunas_particao, 'suporte_minimo': self.suporte_minimo_particao}
+        chaves = np.column_stack([self.casos[coluna][:self.tamanho_casos] for coluna in self.colunas_particao])
+        # Partições com menos de k casos não teriam vizinhos suficientes
+        suporte_minimo = max(self.suporte_minimo_particao, 100)
+        particoes = obter_indice(CAMINHO_CASOS, colunas, lambda: construir_particoes(self.dataset[colunas].to_numpy(), chaves, self.vizinhos_proximos, suporte_minimo), parametros, reconstruir)
+        for _, nbrs in particoes.values():
+            aplicar_parametros_consulta(nbrs, consulta)
+
+        return particoes
+
+
+    def colunas_consulta(self, decisao):
+        """Colunas do registro usadas na consulta da decisão: as do índice, seguidas das colunas de partição."""
+        return self.colunas_decisao[decisao] + self.colunas_particao
+
+
+    def reter_caso(self, registro):
+        """Retém o registro de uma mão finalizada como novo caso, sem treinar novamente os índices: o caso entra no delta de cada índice."""
+        linha = pd.DataFrame(registro.as_query(self.colunas_casos), columns=self.colunas_casos).fillna(-100)
+        valores = {coluna: int(valor) for coluna, valor in linha.iloc[0].items()}
+        valores[COLUNA_QUANTIDADE] = 1
+        rotulos = {nome: bool(rotulo[0]) for nome, rotulo in self.dados.calcular_rotulos(linha).items()}
+        self.casos = anexar_linha(self.casos, self.tamanho_casos, valores)
+        self.rotulos = anexar_linha(self.rotulos, self.tamanho_casos, rotulos)
+        self.tamanho_casos += 1
+        for decisao in self.colunas_decisao:
+            self.nbrs[decisao].adicionar(linha[self.colunas_consulta(decisao)].to_numpy())
+
+        self.invalidar_cache()
+
+
+    def chave_consulta(self, decisao):
+        """Codifica o registro atual nas colunas da decisão e gera sua chave de cache, reaproveitando-a enquanto o registro não for alterado."""
         registro = self.dados.retornar_registro()
+        versao = self.dados.versao_registro
+        memorizada = self.consultas_registro.get(decisao)
+        if (memorizada is not None and memorizada[0] is registro and memorizada[1] == versao):
+            return memorizada[2], memorizada[3]
+
+        consulta, resumo = self.codificar_consulta(registro, decisao)
+        chave = (decisao, self.versao_indice, resumo)
+        self.consultas_registro[decisao] = (registro, versao, chave, consulta)
+        return chave, consulta
+
+
+    def codificar_consulta(self, registro, decisao):
+        """Projeta o registro nas colunas da decisão, retornando o vetor de consulta e o seu resumo (hash) usado como chave."""
+        consulta = registro.as_query(self.colunas_consulta(decisao))
+        return consulta, hashlib.blake2b(consulta.tobytes(), digest_size=16).digest()
+
+
+    def buscar_vizinhos(self, decisao, chave, consulta):
+        """Executa a busca no índice da decisão e memoriza o resultado no cache de vizinhos."""
+        for linhas, vizinhos in self.vizinhos_adaptativos(decisao, consulta):
+            if (len(linhas)):
+                indices = vizinhos[0]
+
+        indices.flags.writeable = False
+        self.cache_vizinhos.guardar(chave, indices)
+        return indices
+
+
+    def vizinhos_adaptativos(self, decisao, consultas):
+        """Busca os vizinhos de um lote de consultas, dobrando k apenas para as que não têm suporte mínimo nos filtros da decisão.
+        Gera pares (linhas do lote, vizinhos), um por valor de k; as linhas sem suporte mesmo com k_maximo saem no último par."""
         warnings.simplefilter(action='ignore', category=UserWarning)
-        distancias, indices = self.nbrs.kneighbors((registro.to_numpy().reshape(1, -1)))
-        jogadas_vencidas = self.dataset.iloc[indices.tolist()[0]]
-        jogadas_vencidas = jogadas_vencidas[(((jogadas_vencidas.ganhadorPrimeiraRodada == 2) & ((jogadas_vencidas.ganhadorSegundaRodada == 2)) | (jogadas_vencidas.ganhadorPrimeiraRodada == 2)) & (jogadas_vencidas.ganhadorTerceiraRodada == 2) | ((jogadas_vencidas.ganhadorSegundaRodada == 2) & (jogadas_vencidas.ganhadorTerceiraRodada == 2)))]
-        ordem_carta_jogada = 'CartaRobo'
-        if ((rodada) == 3): ordem_carta_jogada = 'primeira' + ordem_carta_jogada
-        elif ((rodada) == 2): ordem_carta_jogada = 'segunda' + ordem_carta_jogada
-        elif ((rodada) == 1): ordem_carta_jogada = 'terceira' + ordem_carta_jogada
-
-        valor_referencia = jogadas_vencidas[ordem_carta_jogada].value_counts().index.to_list()[0]
-        if (valor_referencia <= 0): 
-            return -1
-
-        carta_escolhida = min(pontuacao_cartas, key=lambda x:abs(x-valor_referencia))
-        # print(jogadas_vencidas[ordem_carta_jogada].value_counts())
-        # print(pontuacao_cartas)
-        # print(carta_escolhida)
-        # return carta_escolhida
-        return pontuacao_cartas.index(int(carta_escolhida))
-
-    def truco(self, tipo, quem_pediu, qualidade_mao_bot):
+        indice = self.nbrs[decisao]
+        k = min(indice.n_neighbors, len(indice))
+        linhas = np.arange(len(consultas))
+        indices = indice.kneighbors(consultas, n_neighbors=k, return_distance=False)
+        expandidos = None
+        while True:
+            suficientes = self.suporte_vizinhos(decisao, indices) >= self.suporte_minimo
+            limite = min(self.k_maximo, len(indice))
+            if (k >= limite):
+                self.fallbacks_marginais[decisao] += int((~suficientes).sum())
+                yield linhas, indices
+                return
+
+            yield linhas[suficientes], indices[suficientes]
+            if (suficientes.all()):
+                return
+
+            linhas = linhas[~suficientes]
+            k = min(2 * k, limite)
+            self.expansoes[decisao][k] = self.expansoes[decisao].get(k, 0) + len(linhas)
+            # Na primeira expansão, as consultas sem suporte voltam ao índice uma única vez, já com k_maximo vizinhos;
+            # cada expansão seguinte usa um prefixo maior dessa mesma resposta, sem nova busca
+            if (expandidos is None):
+                expandidos = indice.kneighbors(np.asarray(consultas)[linhas], n_neighbors=limite, return_distance=False)
+            else:
+                expandidos = expandidos[~suficientes]
+
+            indices = expandidos[:, :k]
+
+
+    def suporte_vizinhos(self, decisao, indices):
+        """Menor suporte (vizinhos ponderados) entre os filtros da decisão, para cada linha de vizinhos."""
+        pesos = self.pesos_vizinhos(indices)
+        return np.min([(pesos * self.rotulos[filtro][indices]).sum(axis=1) for filtro in FILTROS_DECISAO[decisao]], axis=0)
+
+
+    def estatisticas_expansao(self):
+        """Retorna, por decisão, quantas consultas expandiram para cada k e quantas recorreram à moda global."""
+        return {decisao: {'expansoes': dict(self.expansoes[decisao]), 'marginais': self.fallbacks_marginais[decisao]} for decisao in self.colunas_decisao}
+
+
+    def consultar_vizinhos(self, decisao, prazo=None):
+        """Retorna as posições dos casos mais próximos do registro atual, no índice da decisão informada.
+        Com prazo (em segundos), retorna None se a busca não terminar a tempo; o resultado atrasado ainda é guardado no cache."""
+        limite = None if prazo is None else time.perf_counter() + prazo
+        chave, consulta = self.chave_consulta(decisao)
+        indices = self.cache_vizinhos.obter(chave)
+        if (indices is not None):
+            return indices
+
+        if (limite is None):
+            return self.buscar_vizinhos(decisao, chave, consulta)
+
+        if (self.executor is None):
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cbr-consulta')
+
+        self.consultas_com_prazo[decisao] += 1
+        # No máximo uma busca em andamento: enquanto uma busca atrasada ocupa a thread, as novas consultas
+        # recorrem à heurística imediatamente em vez de esperar atrás dela
+        if (self.busca_em_andamento is not None and not self.busca_em_andamento.done()):
+            self.prazos_excedidos[decisao] += 1
+            return None
+
+        busca = self.executor.submit(self.buscar_vizinhos, decisao, chave, consulta)
+        self.busca_em_andamento = busca
+        try:
+            return busca.result(timeout=max(limite - time.perf_counter(), 0))
+        except TimeoutError:
+            # Se ainda não começou, a busca é descartada; se já está em execução, termina e guarda o resultado no cache
+            busca.cancel()
+            self.prazos_excedidos[decisao] += 1
+            return None
+
+
+    def invalidar_cache(self):
+        """Descarta as consultas memorizadas, quando os índices são reconstruídos ou recebem casos retidos.
+        A tabela da primeira rodada também é descartada: ela não conhece os casos retidos depois de gerada."""
+        self.versao_indice += 1
+        self.tabela = None
+        self.consultas_registro.clear()
+        self.cache_vizinhos.limpar()
+        self.modas_globais.clear()
+
+
+    def estatisticas_cache(self):
+        """Retorna os contadores de acertos e falhas do cache de vizinhos."""
+        return self.cache_vizinhos.estatisticas()
+
+
+    def estatisticas_prazo(self):
+        """Retorna, por decisão, quantas consultas tiveram prazo e quantas o excederam."""
+        return {decisao: {'consultas': self.consultas_com_prazo[decisao], 'excedidos': self.prazos_excedidos[decisao]} for decisao in self.colunas_decisao}
+
+
+    def consultar_tabela(self, decisao, argumentos):
+        """Resposta pré-calculada para o registro atual e os argumentos da decisão, ou None se o estado não está na tabela."""
+        if not (self.tabela):
+            return None
+
+        chave, _ = self.chave_consulta(decisao)
+        return self.tabela.get((decisao, chave[2]) + argumentos)
+
+
+    def jogar_carta(self, rodada, pontuacao_cartas, prazo=None):
+        """Método que considera as jogadas em que o bot saiu vitorioso e retorna a pontuação mais próxima a ser jogada em determinada rodada."""
+        resposta = self.consultar_tabela('jogar_carta', (rodada, tuple(pontuacao_cartas)))
+        if (resposta is not None):
+            return resposta
+
+        indices = self.consultar_vizinhos('jogar_carta', prazo)
+        if (indices is None):
+            return None
+
+        return int(self.decidir_jogar_carta(indices[None], [rodada], [pontuacao_cartas], self.chave_consulta('jogar_carta')[1])[0])
+
+    def truco(self, tipo, quem_pediu, qualidade_mao_bot, prazo=None):
         """Método que considera o pedido de truco e retorna a melhor opção entre aceitar, aumentar ou fugir."""
-        registro = self.dados.retornar_registro()
-        warnings.simplefilter(action='ignore', category=UserWarning)
-        distancias, indices = self.nbrs.kneighbors((registro.to_numpy().reshape(1, -1)))
-        jogadas = perdidas = self.dataset.iloc[indices.tolist()[0]]
-        jogadas = jogadas[(jogadas.quemGanhouTruco == 2)]
-        perdidas = perdidas[(perdidas.quemGanhouTruco == 1)]
-
-        vencidas = jogadas['quemGanhouTruco'].value_counts().index.to_list()[0]
-        perdidas = perdidas['quemGanhouTruco'].value_counts().index.to_list()[0]
-        retruco = jogadas['quemRetruco'].value_counts().index.to_list()[0]
-        qualidade_mao_humana = jogadas['qualidadeMaoHumano'].dropna().value_counts().index.to_list()[0]
-
-
-        if (vencidas > perdidas and qualidade_mao_bot > qualidade_mao_humana):
-            return 2
-        
-        elif (qualidade_mao_bot > qualidade_mao_humana):
-            return 1
-        
-        else:
-            return 0
+        resposta = self.consultar_tabela('truco', (qualidade_mao_bot,))
+        if (resposta is not None):
+            return resposta
+
+        indices = self.consultar_vizinhos('truco', prazo)
+        if (indices is None):
+            return None
 
+        return int(self.decidir_truco(indices[None], [qualidade_mao_bot], self.chave_consulta('truco')[1])[0])
 
-    def envido(self, tipo, quem_pediu, pontos_envido_robo, robo_perdendo=None):
+
+    def envido(self, tipo, quem_pediu, pontos_envido_robo, robo_perdendo=None, prazo=None):
         """Método que considera o pedido de envido e retorna a melhor opção entre aceitar, pedir real envido, falta envido ou fugir."""
-        registro = self.dados.retornar_registro()
-        warnings.simplefilter(action='ignore', category=UserWarning)
-        distancias, indices = self.nbrs.kneighbors((registro.to_numpy().reshape(1, -1)))
-        jogadas = self.dataset.iloc[indices.tolist()[0]]
-        ganhas = jogadas[((jogadas.pontosEnvidoRobo > jogadas.pontosEnvidoHumano) | (jogadas.quemGanhouEnvido == 2))]
-        perdidas = jogadas[((jogadas.pontosEnvidoRobo < jogadas.pontosEnvidoHumano) | (jogadas.quemGanhouEnvido == 1))]
-        # 'quemPediuEnvido', 'quemPediuFaltaEnvido', 'quemPediuRealEnvido', 'pontosEnvidoRobo', 'pontosEnvidoHumano', 'quemNegouEnvido', 'quemGanhouEnvido', 'quemEscondeuPontosEnvido'
-        # print(jogadas)
-        envido_ganhas = ganhas['quemGanhouEnvido'].value_counts().index.to_list()[0]
-        envido_perdidas = perdidas['quemGanhouEnvido'].value_counts().index.to_list()[0]
-        real_envido_ganhas = ganhas['quemPediuRealEnvido'].value_counts().index.to_list()[0]
-        real_envido_perdidas = perdidas['quemPediuFaltaEnvido'].value_counts().index.to_list()[0]
-        falta_envido_ganhas = ganhas['quemPediuFaltaEnvido'].value_counts().index.to_list()[0]
-        falta_envido_perdidas = perdidas['quemPediuFaltaEnvido'].value_counts().index.to_list()[0]
-        pontos_jogador = ganhas['pontosEnvidoHumano'].value_counts().index.to_list()[0]
+        # A consulta do envido usa os pontos do bot e o pedido, gravados no registro antes da busca
+        self.dados.pedido_envido(tipo, quem_pediu, pontos_envido_robo)
+        resposta = self.consultar_tabela('envido', (tipo, quem_pediu, pontos_envido_robo, bool(robo_perdendo)))
+        if (resposta is not None):
+            return resposta
 
-        # Condição especial quando o robô considera pedir o envido na primeira jogada
-        if (quem_pediu == 2 and pontos_envido_robo > 5):
-            if (pontos_jogador < pontos_envido_robo and real_envido_ganhas > real_envido_perdidas and envido_ganhas > envido_perdidas):
-                if (robo_perdendo):
-                    return 8
+        indices = self.consultar_vizinhos('envido', prazo)
+        if (indices is None):
+            return None
 
-                return 7
-            
-            elif (envido_ganhas > envido_perdidas or envido_ganhas < envido_perdidas):
-                if (robo_perdendo):
-                    return 8
+        return int(self.decidir_envido(indices[None], [tipo], [quem_pediu], [pontos_envido_robo], [robo_perdendo], self.chave_consulta('envido')[1])[0])
 
-                return 6
 
-        if (tipo == 6):
-            if (pontos_jogador < pontos_envido_robo and real_envido_ganhas > real_envido_perdidas and envido_ganhas > envido_perdidas):
-                return 2
+    def matriz_consulta(self, registros, decisao):
+        """Projeta um lote de registros (DataFrame, ou array nas colunas da base de casos) nas colunas do índice da decisão."""
+        colunas = self.colunas_consulta(decisao)
+        if (isinstance(registros, pd.DataFrame)):
+            return registros[colunas].to_numpy()
 
-            elif (real_envido_ganhas > real_envido_perdidas and envido_ganhas > envido_perdidas and robo_perdendo):
-                return 3
+        posicoes = [self.colunas_casos.index(coluna) for coluna in colunas]
+        return np.asarray(registros)[:, posicoes]
 
-            elif (envido_ganhas > envido_perdidas or envido_ganhas < envido_perdidas):
-                return 1
 
-            else:
-                return 0
+    def decidir_lote(self, registros, decisao, decidir, **argumentos):
+        """Aplica a decisão a um lote de registros, agrupando-os pelo k com que os vizinhos atingiram o suporte mínimo.
+        Os argumentos (por nome, na ordem da função de decisão) são convertidos em listas com um valor por registro."""
+        consultas = self.matriz_consulta(registros, decisao)
+        argumentos = [argumento_por_registro(argumento, len(consultas), nome) for nome, argumento in argumentos.items()]
+        respostas = np.empty(len(consultas), dtype=np.int64)
+        for linhas, indices in self.vizinhos_adaptativos(decisao, consultas):
+            if (len(linhas)):
+                respostas[linhas] = decidir(indices, *[[argumento[linha] for linha in linhas] for argumento in argumentos], consultas=consultas[linhas])
+
+        return respostas
+
+
+    def jogar_carta_lote(self, registros, rodadas, pontuacoes_cartas):
+        """Versão em lote do jogar_carta: retorna o índice da carta escolhida para cada registro (-1 para ir ao baralho).
+        rodadas é um valor por registro, ou um escalar para todos; pontuacoes_cartas é sempre uma mão (lista de pontuações) por registro."""
+        if not (isinstance(pontuacoes_cartas, (list, tuple)) and all(isinstance(pontuacao, (list, tuple, np.ndarray)) for pontuacao in pontuacoes_cartas)):
+            raise ValueError('pontuacoes_cartas deve ter uma mão (lista de pontuações) por registro')
+
+        return self.decidir_lote(registros, 'jogar_carta', self.decidir_jogar_carta, rodadas=rodadas, pontuacoes_cartas=pontuacoes_cartas)
 
-        elif (tipo == 7):
-            if ((pontos_jogador < pontos_envido_robo) or (envido_ganhas > envido_perdidas and real_envido_ganhas > real_envido_perdidas)):
-                return 1
 
+    def truco_lote(self, registros, qualidades_mao_bot):
+        """Versão em lote do truco: retorna 2 (aumentar), 1 (aceitar) ou 0 (fugir) para cada registro.
+        qualidades_mao_bot é um valor por registro, ou um escalar para todos."""
+        return self.decidir_lote(registros, 'truco', self.decidir_truco, qualidades_mao_bot=qualidades_mao_bot)
+
+
+    def envido_lote(self, registros, tipos, quem_pediu, pontos_envido_robo, robo_perdendo=None):
+        """Versão em lote do envido: retorna a resposta ao envido para cada registro, com os mesmos códigos do método envido.
+        Cada argumento é um valor por registro, ou um escalar para todos. Como no envido, os pontos do bot e o pedido são gravados
+        nos registros antes da consulta."""
+        tamanho = len(registros)
+        tipos = argumento_por_registro(tipos, tamanho, 'tipos')
+        quem_pediu = argumento_por_registro(quem_pediu, tamanho, 'quem_pediu')
+        pontos_envido_robo = argumento_por_registro(pontos_envido_robo, tamanho, 'pontos_envido_robo')
+        registros = self.registros_pedido_envido(registros, tipos, quem_pediu, pontos_envido_robo)
+        return self.decidir_lote(registros, 'envido', self.decidir_envido, tipos=tipos, quem_pediu=quem_pediu, pontos_envido_robo=pontos_envido_robo, robo_perdendo=robo_perdendo)
+
+
+    def registros_pedido_envido(self, registros, tipos, quem_pediu, pontos_envido_robo):
+        """Cópia do lote de registros com os pontos do bot e quem fez cada pedido gravados, como Dados.pedido_envido faz no registro do jogo."""
+        alteracoes = [('pontosEnvidoRobo', np.ones(len(tipos), dtype=bool), pontos_envido_robo)]
+        alteracoes += [(coluna, np.array([tipo_registro == tipo for tipo_registro in tipos], dtype=bool), quem_pediu) for tipo, coluna in COLUNAS_PEDIDO_ENVIDO.items()]
+        em_tabela = isinstance(registros, pd.DataFrame)
+        registros = registros.copy() if em_tabela else np.array(registros, dtype=np.float64)
+        for coluna, linhas, valores in alteracoes:
+            if (em_tabela):
+                registros[coluna] = np.where(linhas, valores, registros[coluna].to_numpy())
             else:
-                return 0
+                posicao = self.colunas_casos.index(coluna)
+                registros[:, posicao] = np.where(linhas, valores, registros[:, posicao])
+
+        return registros
+
+
+    def pesos_vizinhos(self, indices):
+        """Quantas linhas da base original cada vizinho representa, limitando a soma de cada registro a k: os k primeiros casos
+        por distância, contando repetições, são os mesmos vizinhos que a busca encontraria na base sem deduplicação."""
+        quantidades = self.casos[COLUNA_QUANTIDADE][indices]
+        anteriores = np.cumsum(quantidades, axis=1) - quantidades
+        return np.clip(indices.shape[1] - anteriores, 0, quantidades)
 
+
+    def moda_global(self, coluna, filtro=None):
+        """Moda de uma coluna entre todos os casos do filtro (ou da base inteira, se nenhum caso o atende), calculada uma vez por versão do índice."""
+        chave = (coluna, filtro)
+        if (chave not in self.modas_globais):
+            casos = np.arange(self.tamanho_casos)[None]
+            mascara = None if filtro is None else self.rotulos[filtro][casos]
+            if (mascara is not None and not mascara.any()):
+                mascara = None
+
+            self.modas_globais[chave] = moda_vizinhos(self.casos[coluna][casos], mascara, self.casos[COLUNA_QUANTIDADE][casos])[0][0]
+
+        return self.modas_globais[chave]
+
+
+    def agregacao(self, decisao, indices, consultas):
+        """Decomposição dos vizinhos (registros x k) das consultas para a contagem de votos pelos histogramas da árvore da decisão,
+        ou None se a agregação está desligada, k é menor que k_agregacao ou o índice não é uma ball tree euclidiana sem partições.
+        Os histogramas são refeitos quando a compactação troca a árvore."""
+        if (self.k_agregacao is None or consultas is None or indices.shape[1] < self.k_agregacao):
+            return None
+
+        indice = self.nbrs[decisao]
+        if not (isinstance(indice, IndiceIncremental)):
+            return None
+
+        with indice.trava:
+            principal, delta = indice.principal, indice.delta
+
+        arvore = getattr(principal, '_tree', None)
+        if not (isinstance(arvore, BallTree) and principal.effective_metric_ == 'euclidean'):
+            return None
+
+        memorizado = self.agregadores.get(decisao)
+        if (memorizado is None or memorizado[0] is not arvore):
+            memorizado = self.agregadores[decisao] = (arvore, HistogramasArvore(arvore))
+
+        return VizinhancaAgregada(memorizado[1], indices, consultas, self.pesos_vizinhos(indices), delta)
+
+
+    def moda_coluna(self, coluna, indices, filtro=None, agregacao=None):
+        """Moda de uma coluna da base de casos entre os vizinhos de cada registro que atendem ao filtro (nome do rótulo).
+        Com a decomposição dos mesmos vizinhos (agregacao), os votos vêm dos histogramas da árvore, com o mesmo resultado.
+        Linhas sem vizinhos no filtro, mesmo após a expansão de k, recebem a moda global da coluna."""
+        if (agregacao is not None):
+            selecionados = None if filtro is None else self.rotulos[filtro]
+            moda, suporte = agregacao.moda((coluna, filtro), self.casos[coluna], self.casos[COLUNA_QUANTIDADE], selecionados)
         else:
-            if ((pontos_jogador < pontos_envido_robo) or falta_envido_ganhas > falta_envido_perdidas and pontos_jogador < pontos_envido_robo):
-                return 1
+            mascara = None if filtro is None else self.rotulos[filtro][indices]
+            moda, suporte = moda_vizinhos(self.casos[coluna][indices], mascara, self.pesos_vizinhos(indices))
 
-            else:
-                return 0
\ No newline at end of file
+        if not (suporte.all()):
+            moda = np.where(suporte > 0, moda, self.moda_global(coluna, filtro))
+
+        return moda
+
+
+    def decidir_jogar_carta(self, indices, rodadas, pontuacoes_cartas, consultas=None):
+        """Escolhe a carta a partir dos vizinhos (registros x k): a mais próxima da carta mais jogada nas mãos vencidas pelo bot.
+        As consultas dos registros, se informadas, permitem contar os votos pelos histogramas da árvore."""
+        rodadas = np.asarray(rodadas)
+        valores_referencia = np.empty(len(indices), dtype=np.int64)
+        for rodada in np.unique(rodadas):
+            linhas = rodadas == rodada
+            agregacao = self.agregacao('jogar_carta', indices[linhas], None if consultas is None else consultas[linhas])
+            valores_referencia[linhas] = self.moda_coluna(COLUNA_CARTA_RODADA[rodada], indices[linhas], 'bot_venceu_mao', agregacao)
+
+        # Mãos com menos de três cartas são completadas com infinito, para nunca serem escolhidas
+        cartas = np.full((len(indices), 3), np.inf)
+        for i, pontuacao in enumerate(pontuacoes_cartas):
+            cartas[i, :len(pontuacao)] = pontuacao
+
+        escolhas = np.argmin(np.abs(cartas - valores_referencia[:, None]), axis=1)
+        return np.where(valores_referencia <= 0, -1, escolhas)
+
+
+    def decidir_truco(self, indices, qualidades_mao_bot, consultas=None):
+        """Decide o truco a partir dos vizinhos (registros x k), comparando a qualidade da mão do bot com a dos humanos nas mãos vencidas."""
+        agregacao = self.agregacao('truco', indices, consultas)
+        vencidas = self.moda_coluna('quemGanhouTruco', indices, 'truco_ganho', agregacao)
+        perdidas = self.moda_coluna('quemGanhouTruco', indices, 'truco_perdido', agregacao)
+        qualidade_mao_humana = self.moda_coluna('qualidadeMaoHumano', indices, 'truco_ganho', agregacao)
+
+        mao_melhor = np.asarray(qualidades_mao_bot) > qualidade_mao_humana
+        return np.select([(vencidas > perdidas) & mao_melhor, mao_melhor], [2, 1], 0)
+
+
+    def decidir_envido(self, indices, tipos, quem_pediu, pontos_envido_robo, robo_perdendo=None, consultas=None):
+        """Decide o envido a partir dos vizinhos (registros x k), comparando os envidos ganhos e perdidos nos casos similares."""
+        # 'quemPediuEnvido', 'quemPediuFaltaEnvido', 'quemPediuRealEnvido', 'pontosEnvidoRobo', 'pontosEnvidoHumano', 'quemNegouEnvido', 'quemGanhouEnvido', 'quemEscondeuPontosEnvido'
+        agregacao = self.agregacao('envido', indices, consultas)
+        envido_ganhas = self.moda_coluna('quemGanhouEnvido', indices, 'envido_ganho', agregacao)
+        envido_perdidas = self.moda_coluna('quemGanhouEnvido', indices, 'envido_perdido', agregacao)
+        real_envido_ganhas = self.moda_coluna('quemPediuRealEnvido', indices, 'envido_ganho', agregacao)
+        real_envido_perdidas = self.moda_coluna('quemPediuFaltaEnvido', indices, 'envido_perdido', agregacao)
+        falta_envido_ganhas = self.moda_coluna('quemPediuFaltaEnvido', indices, 'envido_ganho', agregacao)
+        falta_envido_perdidas = self.moda_coluna('quemPediuFaltaEnvido', indices, 'envido_perdido', agregacao)
+        pontos_jogador = self.moda_coluna('pontosEnvidoHumano', indices, 'envido_ganho', agregacao)
+
+        tamanho = len(indices)
+        # Tipos numéricos e 'Envido' no mesmo lote: como object, a comparação com 6, 7 ou 8 não vira comparação de strings
+        tipos = np.broadcast_to(np.asarray(tipos, dtype=object), tamanho)
+        quem_pediu = np.broadcast_to(quem_pediu, tamanho)
+        pontos_envido_robo = np.broadcast_to(pontos_envido_robo, tamanho)
+        perdendo = np.broadcast_to(np.asarray(robo_perdendo, dtype=object), tamanho).astype(bool)
+
+        pontos_maiores = pontos_jogador < pontos_envido_robo
+        envido_favoravel = envido_ganhas > envido_perdidas
+        real_envido_favoravel = (real_envido_ganhas > real_envido_perdidas) & envido_favoravel
+        envido_definido = envido_ganhas != envido_perdidas
+        # Condição especial quando o robô considera pedir o envido na primeira jogada
+        pedido_robo = (quem_pediu == 2) & (pontos_envido_robo > 5)
+
+        return np.select(
+            [
+                pedido_robo & pontos_maiores & real_envido_favoravel & perdendo,
+                pedido_robo & pontos_maiores & real_envido_favoravel,
+                pedido_robo & envido_definido & perdendo,
+                pedido_robo & envido_definido,
+                (tipos == 6) & pontos_maiores & real_envido_favoravel,
+                (tipos == 6) & real_envido_favoravel & perdendo,
+                (tipos == 6) & envido_definido,
+                tipos == 6,
+                (tipos == 7) & (pontos_maiores | real_envido_favoravel),
+                tipos == 7,
+                (pontos_maiores | ((falta_envido_ganhas > falta_envido_perdidas) & pontos_maiores)),
+            ],
+            [8, 7, 8, 6, 2, 3, 1, 0, 1, 0, 1],
+            0,
+        )
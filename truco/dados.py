@@ -1,31 +1,188 @@
+import functools
+import numpy as np
 import pandas as pd
-import os
+from .cache_casos import assinatura_arquivo, carregar_cache, salvar_cache
+from .escritor_jogadas import obter_escritor
+from .memoria_compartilhada import anexar_objeto
+from .registro import Registro
+
+CAMINHO_CASOS = 'dbtrucoimitacao_maos.csv'
+CAMINHO_JOGADAS = 'jogadas.csv'
+# Coluna com quantas linhas idênticas do csv cada caso representa
+COLUNA_QUANTIDADE = 'quantidadeCasos'
+
+# Códigos dos naipes nas colunas de naipe do csv (a base usa OURO; as cartas, OUROS)
+CODIGOS_NAIPES = {'ESPADAS': 1, 'OURO': 2, 'OUROS': 2, 'BASTOS': 3, 'COPAS': 4}
+COLUNAS_NAIPE = frozenset([
+    'naipeCartaAltaRobo', 'naipeCartaMediaRobo', 'naipeCartaBaixaRobo', 'naipeCartaAltaHumano', 'naipeCartaMediaHumano', 'naipeCartaBaixaHumano',
+    'naipePrimeiraCartaRobo', 'naipePrimeiraCartaHumano', 'naipeSegundaCartaRobo', 'naipeSegundaCartaHumano', 'naipeTerceiraCartaRobo', 'naipeTerceiraCartaHumano',
+])
+# Coluna do registro de quem fez cada pedido de envido, pelo tipo do pedido
+COLUNAS_PEDIDO_ENVIDO = {6: 'quemPediuEnvido', 7: 'quemPediuRealEnvido', 8: 'quemPediuFaltaEnvido'}
+# Linhas do csv lidas e codificadas por vez
+LINHAS_BLOCO_CSV = 1 << 16
+
+# Bases de casos já carregadas neste processo, compartilhadas entre todas as instâncias de Dados e o Cbr
+bases_carregadas = {}
+
+
+def altera_registro(metodo):
+    """Decorador dos métodos que alteram o registro, incrementando sua versão para invalidar consultas memorizadas."""
+    @functools.wraps(metodo)
+    def alterar(self, *args, **kwargs):
+        resultado = metodo(self, *args, **kwargs)
+        self.versao_registro += 1
+        return resultado
+
+    return alterar
+
+
+class BaseCasos():
+    def __init__(self, casos, rotulos=None):
+        self.casos = casos
+        self.rotulos = rotulos
+        self.colunas = None
+
 
 class Dados():
-    def __init__(self):
+    def __init__(self, base_compartilhada=None):
         self.colunas = ['idMao', 'jogadorMao', 'cartaAltaRobo', 'cartaMediaRobo', 'cartaBaixaRobo', 'cartaAltaHumano', 'cartaMediaHumano', 'cartaBaixaHumano', 'primeiraCartaRobo', 'primeiraCartaHumano', 'segundaCartaRobo', 'segundaCartaHumano', 'terceiraCartaRobo', 'terceiraCartaHumano', 'ganhadorPrimeiraRodada', 'ganhadorSegundaRodada', 'ganhadorTerceiraRodada', 'quemPediuEnvido', 'quemPediuFaltaEnvido', 'quemPediuRealEnvido', 'pontosEnvidoRobo', 'pontosEnvidoHumano', 'quemNegouEnvido', 'quemGanhouEnvido', 'quemFlor', 'quemContraFlor', 'quemContraFlorResto', 'quemNegouFlor', 'pontosFlorRobo', 'pontosFlorHumano', 'quemGanhouFlor', 'quemEscondeuPontosEnvido', 'quemEscondeuPontosFlor', 'quemTruco', 'quemRetruco', 'quemValeQuatro', 'quemNegouTruco', 'quemGanhouTruco','quemEnvidoEnvido', 'quemFlor', 'naipeCartaAltaRobo', 'naipeCartaMediaRobo', 'naipeCartaBaixaRobo', 'naipeCartaAltaHumano', 'naipeCartaMediaHumano', 'naipeCartaBaixaHumano', 'naipePrimeiraCartaRobo', 'naipePrimeiraCartaHumano', 'naipeSegundaCartaRobo', 'naipeSegundaCartaHumano', 'naipeTerceiraCartaRobo', 'naipeTerceiraCartaHumano', 'qualidadeMaoRobo', 'qualidadeMaoHumano']
-        self.registro = self.carregar_modelo_zerado()
-        self.casos = self.tratamento_inicial_df()
+        # Modelo de registro criado uma única vez; cada mão começa de uma cópia dele
+        self.modelo_registro = self.carregar_modelo_zerado()
+        self.registro = self.novo_registro()
+        self.versao_registro = 0
+        self.base_compartilhada = base_compartilhada
+        self.base = self.carregar_base_casos()
+        self.casos = self.base.casos.copy(deep=False)
+
+    def carregar_base_casos(self, recarregar=False):
+        """Retorna a base de casos do processo, lendo e codificando o csv (ou anexando a memória compartilhada) apenas na primeira vez."""
+        chave = (CAMINHO_CASOS, self.base_compartilhada, tuple(self.colunas))
+        if (recarregar or chave not in bases_carregadas):
+            if (self.base_compartilhada):
+                bases_carregadas[chave] = BaseCasos(*self.anexar_casos(self.base_compartilhada))
+            else:
+                bases_carregadas[chave] = BaseCasos(self.carregar_casos_codificados())
+
+        return bases_carregadas[chave]
+
+    def carregar_casos_codificados(self):
+        """Retorna os casos codificados e deduplicados do cache binário ao lado do csv, mapeado em memória.
+        O csv só é lido e codificado quando o cache não existe ou não corresponde mais a ele."""
+        assinatura = assinatura_arquivo(CAMINHO_CASOS)
+        base = carregar_cache(CAMINHO_CASOS, self.colunas, assinatura)
+        if (base is not None):
+            return self.montar_casos(base['matriz'], base['colunas_casos'], base['indice_casos'], base['nome_indice'], base['quantidades'])
+
+        casos = self.deduplicar_casos(self.tratamento_inicial_df())
+        if (assinatura is not None):
+            colunas = [coluna for coluna in casos.columns if coluna != COLUNA_QUANTIDADE]
+            salvar_cache(CAMINHO_CASOS, self.colunas, {
+                'colunas_casos': colunas,
+                'nome_indice': casos.index.name,
+                'indice_casos': np.asarray(casos.index),
+                # Ordem de colunas (Fortran): cada coluna é gravada como um bloco int16 contíguo
+                'matriz': np.asfortranarray(casos[colunas].to_numpy(), dtype=np.int16),
+                'quantidades': casos[COLUNA_QUANTIDADE].to_numpy(dtype=np.int32),
+            }, assinatura)
+
+        return casos
+
 
     def tratamento_inicial_df(self):
-        """Tratamento de dados do dataframe que será utilizado para alimentar a base de casos"""
-        df = pd.read_csv('dbtrucoimitacao_maos.csv', usecols=self.colunas, index_col='idMao').fillna(-100)
-        colunas_string = [
-            'naipeCartaAltaRobo', 'naipeCartaMediaRobo','naipeCartaBaixaRobo', 'naipeCartaAltaHumano','naipeCartaMediaHumano', 'naipeCartaBaixaHumano','naipePrimeiraCartaRobo', 'naipePrimeiraCartaHumano',	'naipeSegundaCartaRobo', 'naipeSegundaCartaHumano','naipeTerceiraCartaRobo', 'naipeTerceiraCartaHumano',
-            ]
-        colunas_int = [col for col in df.columns if col not in colunas_string]
-        df.replace('ESPADAS', '1', inplace=True)
-        df.replace('OURO', '2', inplace=True)
-        df.replace('BASTOS', '3', inplace=True)
-        df.replace('COPAS', '4', inplace=True)
-        df[colunas_string] = df[colunas_string].fillna(-66)
-        # df.loc[:, df.dtypes == object] = df.loc[:, df.dtypes == object].astype(int)
-        # df = df[df.columns].astype(int)
-        df[colunas_int] = df[colunas_int].astype('int16')
+        """Tratamento de dados do dataframe que será utilizado para alimentar a base de casos.
+        O csv é lido em blocos de LINHAS_BLOCO_CSV linhas, com tipos explícitos: cada bloco já é codificado (naipes e -100) direto em int16."""
+        colunas = [coluna for coluna in dict.fromkeys(self.colunas) if coluna != 'idMao']
+        tipos = {coluna: 'category' if coluna in COLUNAS_NAIPE else 'float32' for coluna in colunas}
+        tipos['idMao'] = 'int64'
+        blocos = []
+        indices = []
+        with pd.read_csv(CAMINHO_CASOS, usecols=self.colunas, index_col='idMao', dtype=tipos, chunksize=LINHAS_BLOCO_CSV) as leitor:
+            for bloco in leitor:
+                # usecols mantém a ordem das colunas do arquivo
+                colunas = list(bloco.columns)
+                blocos.append(self.codificar_bloco(bloco))
+                indices.append(bloco.index.to_numpy())
+
+        # Ordem de colunas (Fortran): o DataFrame usa a matriz sem copiá-la
+        matriz = np.empty((sum(len(bloco) for bloco in blocos), len(colunas)), dtype=np.int16, order='F')
+        inicio = 0
+        for bloco in blocos:
+            matriz[inicio:inicio + len(bloco)] = bloco
+            inicio += len(bloco)
+
+        indice = pd.Index(np.concatenate(indices) if indices else np.empty(0, dtype=np.int64), name='idMao')
         # df = df[colunas_int] > 0 # Desativar essa condição para obter um Bot que vai mais vezes ao baralho
+        return pd.DataFrame(matriz, columns=colunas, index=indice, copy=False)
+
+
+    def codificar_bloco(self, bloco):
+        """Codifica um bloco lido do csv em uma matriz int16: naipes pelo seu código e valores ausentes como -100."""
+        matriz = np.empty(bloco.shape, dtype=np.int16)
+        for posicao, coluna in enumerate(bloco.columns):
+            if (coluna in COLUNAS_NAIPE):
+                matriz[:, posicao] = self.codificar_naipes(bloco[coluna])
+            else:
+                matriz[:, posicao] = np.nan_to_num(bloco[coluna].to_numpy(), nan=-100)
+
+        return matriz
+
+
+    def codificar_naipes(self, naipes):
+        """Converte uma coluna categórica de naipes em seus códigos, mapeando apenas as categorias distintas; ausentes viram -100."""
+        categorias = naipes.cat.categories
+        desconhecidos = [naipe for naipe in categorias if naipe not in CODIGOS_NAIPES]
+        if (desconhecidos):
+            raise ValueError(f'Naipes desconhecidos na coluna {naipes.name}: {desconhecidos}')
+
+        # O código -1 (valor ausente) indexa o último elemento da tabela
+        tabela = np.array([CODIGOS_NAIPES[naipe] for naipe in categorias] + [-100], dtype=np.int16)
+        return tabela[naipes.cat.codes.to_numpy()]
+
+
+    def deduplicar_casos(self, df):
+        """Agrupa as linhas codificadas idênticas em um único caso (o primeiro), com a quantidade de repetições na coluna COLUNA_QUANTIDADE."""
+        quantidades = df.groupby(list(df.columns), sort=False, dropna=False).size()
+        df = df[~df.duplicated(keep='first')].copy()
+        # Com sort=False os grupos seguem a ordem da primeira ocorrência, a mesma das linhas mantidas
+        df[COLUNA_QUANTIDADE] = quantidades.to_numpy(dtype=np.int32)
         return df
 
 
+    def anexar_casos(self, nome):
+        """Anexa, sem cópia, a base de casos e os rótulos publicados em memória compartilhada por outro processo."""
+        base = anexar_objeto(nome)
+        return self.montar_casos(base['matriz'], base['colunas'], base['indice_casos'], base['nome_indice'], base['quantidades']), base['rotulos']
+
+
+    def montar_casos(self, matriz, colunas, indice_casos, nome_indice, quantidades):
+        """Monta o DataFrame de casos sobre a matriz codificada, sem copiá-la, com a quantidade de cada caso."""
+        indice = pd.Index(indice_casos, name=nome_indice)
+        casos = pd.DataFrame(matriz, columns=colunas, index=indice, copy=False)
+        casos[COLUNA_QUANTIDADE] = quantidades
+        return casos
+
+
+    def calcular_rotulos(self, casos):
+        """Materializa, uma única vez, os resultados de cada caso usados como filtro nas decisões do Cbr."""
+        primeira = casos['ganhadorPrimeiraRodada'].to_numpy() == 2
+        segunda = casos['ganhadorSegundaRodada'].to_numpy() == 2
+        terceira = casos['ganhadorTerceiraRodada'].to_numpy() == 2
+        pontos_robo = casos['pontosEnvidoRobo'].to_numpy()
+        pontos_humano = casos['pontosEnvidoHumano'].to_numpy()
+        quem_ganhou_envido = casos['quemGanhouEnvido'].to_numpy()
+        quem_ganhou_truco = casos['quemGanhouTruco'].to_numpy()
+        rotulos = {
+            'bot_venceu_mao': (((primeira & segunda) | primeira) & terceira) | (segunda & terceira),
+            'envido_ganho': (pontos_robo > pontos_humano) | (quem_ganhou_envido == 2),
+            'envido_perdido': (pontos_robo < pontos_humano) | (quem_ganhou_envido == 1),
+            'truco_ganho': quem_ganhou_truco == 2,
+            'truco_perdido': quem_ganhou_truco == 1,
+        }
+        return {nome: np.ascontiguousarray(rotulo, dtype=bool) for nome, rotulo in rotulos.items()}
+
+
+    @altera_registro
     def cartas_jogadas_pelo_bot(self, rodada, carta_robo):
         """Adicionada as cartas jogadas pelo bot a base de casos"""
         if (rodada == 'primeira'):
@@ -40,6 +197,7 @@ class Dados():
             self.registro.terceiraCartaRobo = carta_robo.retornar_numero()
             self.registro.naipeTerceiraCartaRobo = carta_robo.retornar_naipe_codificado()
 
+    @altera_registro
     def primeira_rodada(self, pontuacao_cartas, mao_rank, qualidade_mao_bot, carta_humano):
         """Adiciona na base de casos as cartas jogadas pelo bot na primeira rodada"""
         self.registro.jogadorMao = 1
@@ -49,11 +207,12 @@ class Dados():
         # self.registro.ganhadorPrimeiraRodada = 2
         # self.registro.ganhadorSegundaRodada = 2
         # self.registro.ganhadorTerceiraRodada = 2
-        self.registro.qualidadeMaoBot = qualidade_mao_bot
+        self.registro.qualidadeMaoRobo = qualidade_mao_bot
         self.registro.primeiraCartaHumano = carta_humano.retornar_numero()
         self.registro.naipePrimeiraCartaHumano = carta_humano.retornar_naipe_codificado()
 
 
+    @altera_registro
     def segunda_rodada(self, primeira_carta_humano, primeira_carta_robo, ganhador_primeira_rodada):
         """Adiciona na base de casos as cartas jogadas pelo oponente na segunda rodada"""
         self.registro.ganhadorPrimeiraRodada = ganhador_primeira_rodada
@@ -64,16 +223,18 @@ class Dados():
 
     
 
+    @altera_registro
     def terceira_rodada(self, segunda_carta_humano, segunda_carta_robo, ganhador_segunda_rodada):
         """Adiciona na base de casos as cartas jogadas pelo oponente na segunda rodada"""
         self.registro.ganhadorSegundaRodada = ganhador_segunda_rodada
-        self.registro.SegundaCartaHumano = segunda_carta_humano.retornar_numero()
+        self.registro.segundaCartaHumano = segunda_carta_humano.retornar_numero()
         self.registro.naipeSegundaCartaHumano = segunda_carta_humano.retornar_naipe_codificado()
         self.registro.terceiraCartaRobo = segunda_carta_robo.retornar_numero()
         self.registro.terceiraCartaRobo = segunda_carta_robo.retornar_numero()
 
 
 
+    @altera_registro
     def finalizar_rodadas(self, terceira_carta_humano, terceira_carta_robo, ganhador_terceira_rodada):
         """Adiciona na base de casos as cartas jogadas pelo oponente na terceira rodada"""
         self.registro.ganhadorTerceiraRodada = ganhador_terceira_rodada
@@ -84,14 +245,25 @@ class Dados():
 
 
 
+    @altera_registro
     def envido(self, quem_envido, quem_real_envido, quem_falta_envido, quem_ganhou_envido):
         """Adiciona na base de casos as informações referentes ao envido"""
-        self.registro.quemEnvido = quem_envido
-        self.registro.quemRealEnvido = quem_real_envido
-        self.registro.quemFaltaEnvido = quem_falta_envido
+        self.registro.quemPediuEnvido = quem_envido
+        self.registro.quemPediuRealEnvido = quem_real_envido
+        self.registro.quemPediuFaltaEnvido = quem_falta_envido
         self.registro.quemGanhouEnvido = quem_ganhou_envido
 
 
+    @altera_registro
+    def pedido_envido(self, tipo, quem_pediu, pontos_envido_robo):
+        """Adiciona na base de casos os pontos de envido do bot e o pedido que ele vai responder (6 envido, 7 real envido, 8 falta envido),
+        antes da consulta do Cbr: sem eles, a consulta do envido não tem nenhuma informação da mão."""
+        self.registro.pontosEnvidoRobo = pontos_envido_robo
+        if (tipo in COLUNAS_PEDIDO_ENVIDO):
+            setattr(self.registro, COLUNAS_PEDIDO_ENVIDO[tipo], quem_pediu)
+
+
+    @altera_registro
     def truco(self, quem_truco, quem_retruco, quem_vale_quatro, quem_negou_truco, quem_ganhou_truco):
         """Adiciona na base de casos as informações referentes ao truco"""
         self.registro.quemTruco = quem_truco
@@ -102,6 +274,7 @@ class Dados():
 
 
 
+    @altera_registro
     def flor(self, quem_flor, quem_contraflor, quem_contraflor_resto, pontos_flor_robo):
         """Adiciona na base de casos as informações referentes a flor"""
         self.registro.quemGanhouFlor = 2
@@ -111,18 +284,21 @@ class Dados():
         self.registro.pontosFlorRobo = pontos_flor_robo
     
 
+    @altera_registro
     def vencedor_envido(self, quem_ganhou_envido, quem_negou_envido):
         """Adiciona na base de casos as informações referentes ao truco"""
         self.registro.quemGanhouEnvido = quem_ganhou_envido
         self.registro.quemNegouEnvido = quem_negou_envido
 
 
+    @altera_registro
     def vencedor_truco(self, quem_ganhou_truco, quem_negou_truco):
         """Adiciona na base de casos as informações referentes ao vencedor do truco"""
         self.registro.quemNegouTruco = quem_negou_truco
         self.registro.quemGanhouTruco = quem_ganhou_truco
 
 
+    @altera_registro
     def vencedor_flor(self, quem_ganhou_flor, quem_negou_flor):
         """Adiciona na base de casos as informações referentes ao vencedor da flor"""
         self.registro.quemGanhouFlor = quem_ganhou_flor
@@ -130,8 +306,13 @@ class Dados():
 
 
     def carregar_modelo_zerado(self):
-        """Carrega um dataframe zerado, para ser utilizado como modelo de caso."""
-        return pd.read_csv('modelo_registro.csv', usecols=self.colunas, index_col='idMao')
+        """Cria um registro zerado com as colunas da base de casos, para ser utilizado como modelo de caso."""
+        return Registro([coluna for coluna in self.colunas if coluna != 'idMao'])
+
+
+    def novo_registro(self):
+        """Retorna um registro zerado, copiado do modelo mantido em memória."""
+        return self.modelo_registro.copy()
 
 
     def retornar_registro(self):
@@ -142,17 +323,34 @@ class Dados():
     def retornar_casos(self):
         """Retorna os casos."""
         return self.casos
+
+
+    def retornar_rotulos(self):
+        """Retorna os rótulos de resultado dos casos, calculados uma única vez por base carregada."""
+        if (self.base.rotulos is None):
+            self.base.rotulos = self.calcular_rotulos(self.base.casos)
+
+        return self.base.rotulos
+
+
+    def retornar_colunas_casos(self):
+        """Retorna os casos como arrays contíguos e somente leitura, um por coluna (int16, e int32 para a quantidade), convertidos uma única vez por base carregada."""
+        if (self.base.colunas is None):
+            colunas = {coluna: np.ascontiguousarray(self.base.casos[coluna].to_numpy(), dtype=np.int32 if coluna == COLUNA_QUANTIDADE else np.int16) for coluna in self.base.casos.columns}
+            for array in colunas.values():
+                array.flags.writeable = False
+
+            self.base.colunas = colunas
+
+        return self.base.colunas
     
    
     def finalizar_partida(self):
-        """Método para salvar as jogadas da partida em um csv."""
-        if not(os.path.isfile('jogadas.csv')):
-            self.registro.to_csv('jogadas.csv', header=self.registro.columns)
-        else:
-            self.registro.to_csv('jogadas.csv', mode='a', header=False)
+        """Enfileira as jogadas da partida para o escritor do csv, que as grava em segundo plano."""
+        obter_escritor(CAMINHO_JOGADAS).registrar(self.registro.copy())
 
 
     def resetar(self):
-        """Resetar variáveis ligadas a rodada."""
-        self.casos = self.tratamento_inicial_df()
-        self.registro = self.carregar_modelo_zerado()
\ No newline at end of file
+        """Resetar variáveis ligadas a rodada: apenas o registro da mão, pois a base de casos não muda durante o jogo."""
+        self.registro = self.novo_registro()
+        self.versao_registro += 1
\ No newline at end of file
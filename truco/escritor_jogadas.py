@@ -0,0 +1,166 @@
+import atexit
+import os
+import queue
+import threading
+import time
+import numpy as np
+from .registro import tabela_registros
+
+# Marcador de fechamento enviado pela fila à thread de escrita; descarregar envia um threading.Event próprio
+FECHAR = object()
+
+# Escritores deste processo, um por arquivo: todas as partidas que gravam no mesmo csv compartilham a fila e o arquivo aberto
+escritores = {}
+trava_escritores = threading.Lock()
+
+
+class EscritorJogadas():
+    """Grava os registros das mãos finalizadas no csv de jogadas em segundo plano, com um único arquivo aberto.
+    As partidas apenas enfileiram o registro (a fila tem no máximo limite_fila registros); a thread de escrita grava em lotes
+    de até linhas_lote linhas, ou quando o registro mais antigo do lote espera há intervalo segundos, e ao fechar."""
+
+    def __init__(self, caminho, limite_fila=10000, linhas_lote=256, intervalo=1.0):
+        self.caminho = caminho
+        self.linhas_lote = linhas_lote
+        self.intervalo = intervalo
+        self.fila = queue.Queue(maxsize=limite_fila)
+        self.trava = threading.Lock()
+        # Sinaliza o fim de um fechamento: enquanto a thread antiga não termina, nenhuma outra é iniciada na mesma fila
+        self.fechada = threading.Condition(self.trava)
+        self.fechando = False
+        self.thread = None
+        self.arquivo = None
+        self.erro = None
+
+    def registrar(self, registro):
+        """Enfileira o registro para gravação; só bloqueia se a fila estiver cheia."""
+        # Sob a trava, o registro não pode ficar na fila atrás do marcador de fechamento
+        with self.trava:
+            self.fechada.wait_for(lambda: not self.fechando)
+            if (self.thread is None):
+                self.thread = threading.Thread(target=self.executar, name='escritor-jogadas', daemon=True)
+                self.thread.start()
+
+            self.fila.put(registro)
+
+
+    def executar(self):
+        """Laço da thread de escrita: acumula registros e grava o lote quando ele enche, vence o intervalo ou chega um marcador."""
+        lote = []
+        inicio = 0.0
+        while True:
+            espera = None if not lote else max(inicio + self.intervalo - time.monotonic(), 0)
+            try:
+                item = self.fila.get(timeout=espera)
+            except queue.Empty:
+                lote = self.gravar(lote)
+                continue
+
+            if (isinstance(item, threading.Event)):
+                lote = self.gravar(lote)
+                item.set()
+                continue
+
+            if (item is FECHAR):
+                self.gravar(lote)
+                if (self.arquivo is not None):
+                    self.arquivo.close()
+                    self.arquivo = None
+
+                return
+
+            if not (lote):
+                inicio = time.monotonic()
+
+            lote.append(item)
+            if (len(lote) >= self.linhas_lote):
+                lote = self.gravar(lote)
+
+
+    def gravar(self, lote):
+        """Grava o lote no csv em uma única escrita, com o cabeçalho se o arquivo estiver vazio, e retorna um lote vazio.
+        Um erro de escrita é guardado e levantado na próxima chamada de descarregar ou fechar; o lote é descartado."""
+        try:
+            # Registros com outras colunas são gravados em escritas separadas, na ordem em que chegaram
+            grupos = []
+            for registro in lote:
+                if (grupos and grupos[-1][0] == registro.colunas):
+                    grupos[-1][1].append(registro.valores)
+                else:
+                    grupos.append((registro.colunas, [registro.valores]))
+
+            for colunas, valores in grupos:
+                if (self.arquivo is None):
+                    self.arquivo = open(self.caminho, 'a', newline='')
+
+                # Mesmo formato do registro.para_dataframe().to_csv: a coluna idMao é o índice zerado do registro
+                tabela_registros(colunas, np.vstack(valores)).to_csv(self.arquivo, header=self.arquivo.tell() == 0)
+                self.arquivo.flush()
+        except Exception as erro:
+            self.erro = erro
+
+        return []
+
+
+    def descarregar(self):
+        """Bloqueia até que os registros enfileirados antes da chamada estejam gravados no arquivo.
+        Espera apenas o próprio marcador: registros enfileirados depois por outras partidas não a atrasam."""
+        gravado = threading.Event()
+        with self.trava:
+            self.fechada.wait_for(lambda: not self.fechando)
+            ativa = self.thread is not None
+            if (ativa):
+                self.fila.put(gravado)
+
+        if (ativa):
+            gravado.wait()
+
+        self.levantar_erro()
+
+
+    def fechar(self):
+        """Grava os registros pendentes, fecha o arquivo e encerra a thread; um novo registro a reabre.
+        Até a thread terminar, novos registros esperam, de modo que nunca há duas threads consumindo a mesma fila."""
+        with self.trava:
+            self.fechada.wait_for(lambda: not self.fechando)
+            thread = self.thread
+            if (thread is not None):
+                self.fechando = True
+                self.fila.put(FECHAR)
+
+        if (thread is not None):
+            thread.join()
+            with self.trava:
+                self.thread = None
+                self.fechando = False
+                self.fechada.notify_all()
+
+        self.levantar_erro()
+
+
+    def levantar_erro(self):
+        """Levanta, uma única vez, o erro de escrita ocorrido na thread."""
+        erro = self.erro
+        if (erro is not None):
+            self.erro = None
+            raise erro
+
+
+def obter_escritor(caminho):
+    """Retorna o escritor do arquivo informado, criando-o na primeira vez."""
+    chave = os.path.abspath(caminho)
+    with trava_escritores:
+        if (chave not in escritores):
+            escritores[chave] = EscritorJogadas(chave)
+
+        return escritores[chave]
+
+
+@atexit.register
+def fechar_escritores():
+    """Grava os registros pendentes de todos os escritores ao fim do processo."""
+    with trava_escritores:
+        abertos = list(escritores.values())
+
+    for escritor in abertos:
+        escritor.fechar()
@@ -0,0 +1,156 @@
+import numpy as np
+
+# Margem relativa nas comparações com o raio da vizinhança: distâncias dentro dela são tratadas como empatadas com o raio
+TOLERANCIA_RAIO = 1e-7
+
+
+def distancias_quadradas(dados, consultas):
+    """Distância euclidiana ao quadrado entre pares de linhas; a mesma expressão vale para os casos das folhas e os da lista de vizinhos."""
+    diferencas = dados - consultas
+    return np.einsum('ij,ij->i', diferencas, diferencas)
+
+
+def somar_por_linha(linhas, valores, tamanho):
+    """Soma as linhas de valores (pares x colunas) agrupadas pela linha de destino, retornando uma matriz (tamanho x colunas)."""
+    totais = np.zeros((tamanho, valores.shape[1]))
+    if (len(linhas)):
+        ordem = np.argsort(linhas, kind='stable')
+        linhas = linhas[ordem]
+        inicios = np.flatnonzero(np.r_[True, linhas[1:] != linhas[:-1]])
+        totais[linhas[inicios]] = np.add.reduceat(valores[ordem], inicios, axis=0)
+
+    return totais
+
+
+class HistogramasArvore():
+    """Histogramas ponderados das colunas de resultado em cada nó de uma ball tree euclidiana (NearestNeighbors com
+    algorithm='ball_tree'), para contar os votos dos vizinhos por subárvores inteiras. Os nós seguem a ordem de heap do
+    sklearn: filhos do nó i em 2i+1 e 2i+2, todas as folhas no último nível."""
+
+    def __init__(self, arvore):
+        dados, ordem, nos, limites = arvore.get_arrays()
+        self.dados = np.asarray(dados)
+        self.ordem = np.asarray(ordem, dtype=np.intp)
+        self.inicio = np.asarray(nos['idx_start'], dtype=np.intp)
+        self.fim = np.asarray(nos['idx_end'], dtype=np.intp)
+        self.folha = np.asarray(nos['is_leaf'], dtype=bool)
+        self.raio = np.asarray(nos['radius'], dtype=np.float64)
+        self.centros = np.asarray(limites[0], dtype=np.float64)
+        self.histogramas = {}
+
+    def __len__(self):
+        return len(self.ordem)
+
+
+    def casos_folhas(self, folhas):
+        """Retorna, para cada caso das folhas informadas, a posição da sua folha na lista e a posição do caso na base."""
+        tamanhos = self.fim[folhas] - self.inicio[folhas]
+        deslocamentos = np.arange(tamanhos.sum()) - np.repeat(np.cumsum(tamanhos) - tamanhos, tamanhos)
+        return np.repeat(np.arange(len(folhas)), tamanhos), self.ordem[np.repeat(self.inicio[folhas], tamanhos) + deslocamentos]
+
+
+    def histograma(self, chave, valores, quantidades, selecionados=None):
+        """Histogramas da coluna identificada pela chave (coluna, filtro), construídos no primeiro uso: cada caso da árvore pesa a sua
+        quantidade, ou zero fora do filtro. As folhas são somadas por bincount e cada nó interno é a soma dos seus dois filhos.
+        Retorna os valores distintos, o código de cada caso entre eles, a matriz (nós x valores) e o peso de cada caso."""
+        if (chave not in self.histogramas):
+            tamanho = len(self)
+            pesos = np.asarray(quantidades[:tamanho], dtype=np.float64)
+            if (selecionados is not None):
+                pesos = np.where(selecionados[:tamanho], pesos, 0)
+
+            unicos, codigos = np.unique(np.asarray(valores[:tamanho]), return_inverse=True)
+            codigos = codigos.ravel()
+            largura = len(unicos)
+            folhas = np.flatnonzero(self.folha)
+            posicoes, casos = self.casos_folhas(folhas)
+            histograma = np.bincount(folhas[posicoes] * largura + codigos[casos], weights=pesos[casos], minlength=len(self.folha) * largura).reshape(-1, largura)
+            for nivel in range(int(np.log2(len(self.folha))) - 1, -1, -1):
+                nos = np.arange(2 ** nivel - 1, 2 ** (nivel + 1) - 1)
+                nos = nos[~self.folha[nos]]
+                histograma[nos] = histograma[2 * nos + 1] + histograma[2 * nos + 2]
+
+            self.histogramas[chave] = (unicos, codigos, histograma, pesos)
+
+        return self.histogramas[chave]
+
+
+    def percorrer(self, consultas, raios2):
+        """Desce a árvore nível a nível, para todas as consultas ao mesmo tempo, separando os nós inteiramente dentro da bola de
+        raio² raios2 de cada consulta e os casos mais próximos que o raio nas folhas que cortam a bola; os nós inteiramente fora
+        são descartados. Retorna os pares (consulta, nó) e (consulta, caso)."""
+        margens = TOLERANCIA_RAIO * (1 + raios2)
+        pares_nos = ([], [])
+        pares_casos = ([], [])
+        consulta, no = np.arange(len(consultas)), np.zeros(len(consultas), dtype=np.intp)
+        while (len(consulta)):
+            distancias = np.sqrt(distancias_quadradas(self.centros[no], consultas[consulta]))
+            raio2, margem = raios2[consulta], margens[consulta]
+            # Com o dobro da margem, nenhum caso de um nó interno fica, por arredondamento, entre os empatados com o raio
+            dentro = (distancias + self.raio[no]) ** 2 < raio2 - 2 * margem
+            fora = (distancias > self.raio[no]) & ((distancias - self.raio[no]) ** 2 > raio2 + margem)
+            pares_nos[0].append(consulta[dentro])
+            pares_nos[1].append(no[dentro])
+            cortam = ~dentro & ~fora
+            folhas = cortam & self.folha[no]
+            if (folhas.any()):
+                posicoes, casos = self.casos_folhas(no[folhas])
+                consultas_casos = consulta[folhas][posicoes]
+                internos = distancias_quadradas(self.dados[casos], consultas[consultas_casos]) < raios2[consultas_casos] - margens[consultas_casos]
+                pares_casos[0].append(consultas_casos[internos])
+                pares_casos[1].append(casos[internos])
+
+            descer = cortam & ~self.folha[no]
+            consulta, no = np.repeat(consulta[descer], 2), (2 * no[descer][:, None] + np.array([1, 2])).ravel()
+
+        return tuple(np.concatenate(par).astype(np.intp) if par else np.empty(0, dtype=np.intp) for par in pares_nos + pares_casos)
+
+
+class VizinhancaAgregada():
+    """Decomposição dos vizinhos de um lote de consultas (registros x k) para a contagem de votos pelos histogramas. A vizinhança
+    de cada consulta é a bola com o raio do último vizinho de peso positivo: os nós da árvore inteiramente dentro dela entram
+    pelo histograma e as folhas que a cortam são medidas caso a caso. Os vizinhos empatados com o raio (quais deles a busca
+    devolve depende da ordem da árvore) e os do delta do índice incremental são contados pela própria lista, com os seus pesos."""
+
+    def __init__(self, histogramas, indices, consultas, pesos, delta):
+        self.histogramas = histogramas
+        self.indices = indices
+        self.pesos = pesos
+        consultas = np.asarray(consultas, dtype=np.float64)
+        tamanho = len(histogramas)
+        na_arvore = indices < tamanho
+        coordenadas = np.empty(indices.shape + (consultas.shape[1],))
+        coordenadas[na_arvore] = histogramas.dados[indices[na_arvore]]
+        coordenadas[~na_arvore] = delta[indices[~na_arvore] - tamanho]
+        distancias2 = distancias_quadradas(coordenadas.reshape(-1, consultas.shape[1]), np.repeat(consultas, indices.shape[1], axis=0)).reshape(indices.shape)
+        ultimos = indices.shape[1] - 1 - np.argmax((pesos > 0)[:, ::-1], axis=1)
+        raios2 = distancias2[np.arange(len(indices)), ultimos]
+        empatados = distancias2 >= (raios2 - TOLERANCIA_RAIO * (1 + raios2))[:, None]
+        self.avulsos = (pesos > 0) & (empatados | ~na_arvore)
+        self.consultas_nos, self.nos, self.consultas_casos, self.casos = histogramas.percorrer(consultas, raios2)
+
+
+    def moda(self, chave, valores, quantidades, selecionados=None):
+        """Moda e suporte de uma coluna em cada linha, iguais aos de moda_vizinhos sobre a lista de vizinhos com os mesmos pesos e
+        filtro (selecionados, por caso). Empates no máximo são resolvidos pelo vizinho mais próximo, como no value_counts do pandas."""
+        unicos, codigos, histograma, pesos_casos = self.histogramas.histograma(chave, valores, quantidades, selecionados)
+        valores_lista = valores[self.indices]
+        votos = self.pesos if selecionados is None else np.where(selecionados[self.indices], self.pesos, 0)
+        linhas, colunas = np.nonzero(self.avulsos & (votos > 0))
+        distintos = np.union1d(unicos, valores_lista[linhas, colunas])
+        tamanho, largura = len(self.indices), len(distintos)
+        posicoes = np.searchsorted(distintos, unicos)
+
+        totais = np.zeros((tamanho, largura))
+        totais[:, posicoes] = somar_por_linha(self.consultas_nos, histograma[self.nos], tamanho)
+        totais += np.bincount(self.consultas_casos * largura + posicoes[codigos[self.casos]], weights=pesos_casos[self.casos], minlength=tamanho * largura).reshape(tamanho, largura)
+        totais += np.bincount(linhas * largura + np.searchsorted(distintos, valores_lista[linhas, colunas]), weights=votos[linhas, colunas], minlength=tamanho * largura).reshape(tamanho, largura)
+
+        maximas = totais.max(axis=1)
+        modas = distintos[np.argmax(totais, axis=1)]
+        for linha in np.flatnonzero((maximas > 0) & ((totais == maximas[:, None]).sum(axis=1) > 1)):
+            # O primeiro vizinho com voto cujo valor está entre os empatados
+            candidatos = np.isin(valores_lista[linha], distintos[totais[linha] == maximas[linha]]) & (votos[linha] > 0)
+            modas[linha] = valores_lista[linha, np.argmax(candidatos)]
+
+        return np.where(maximas > 0, modas, valores_lista[:, 0]), maximas
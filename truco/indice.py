@@ -0,0 +1,164 @@
+import glob
+import hashlib
+import json
+import os
+import joblib
+from sklearn.neighbors import NearestNeighbors
+from .indice_aproximado import IndiceAproximado
+from .indice_bruto import IndiceForcaBruta
+from .indice_ivf import IndiceIVF
+from .indice_projetado import IndiceProjetado
+from .indice_quantizado import IndiceQuantizado
+
+VERSAO_INDICE = 2
+TAMANHO_BLOCO_HASH = 1 << 20
+
+# Hashes de arquivos já calculados neste processo
+hashes_arquivos = {}
+
+# Parâmetros lidos apenas nas consultas de cada backend: não mudam o índice treinado, ficam fora da chave do artefato
+# e são aplicados ao índice carregado
+PARAMETROS_CONSULTA = {'ivf': ('n_probe',)}
+
+
+def criar_indice(backend='ball_tree', n_neighbors=100, **parametros):
+    """Cria o estimador de vizinhos (ainda não treinado) do backend informado."""
+    if (backend == 'ball_tree'):
+        return NearestNeighbors(n_neighbors=n_neighbors, algorithm='ball_tree', **parametros)
+
+    elif (backend == 'aproximado'):
+        return IndiceAproximado(n_neighbors=n_neighbors, **parametros)
+
+    elif (backend == 'forca_bruta'):
+        return IndiceForcaBruta(n_neighbors=n_neighbors, **parametros)
+
+    elif (backend == 'ivf'):
+        return IndiceIVF(n_neighbors=n_neighbors, **parametros)
+
+    elif (backend == 'projetado'):
+        return IndiceProjetado(n_neighbors=n_neighbors, **parametros)
+
+    elif (backend == 'quantizado'):
+        return IndiceQuantizado(n_neighbors=n_neighbors, **parametros)
+
+    raise ValueError(f'Backend de índice desconhecido: {backend}')
+
+
+def separar_parametros(backend, parametros):
+    """Separa os parâmetros do backend nos de construção, que identificam o artefato, e nos lidos apenas nas consultas."""
+    nomes = PARAMETROS_CONSULTA.get(backend, ())
+    construcao = {nome: valor for nome, valor in parametros.items() if nome not in nomes}
+    consulta = {nome: valor for nome, valor in parametros.items() if nome in nomes}
+    return construcao, consulta
+
+
+def aplicar_parametros_consulta(indice, parametros):
+    """Aplica os parâmetros de consulta ao índice carregado, que pode ter sido treinado com outros valores deles."""
+    for nome, valor in parametros.items():
+        setattr(indice, nome, valor)
+
+    return indice
+
+
+def chave_hash(caminho, assinatura):
+    """Chave dos hashes memorizados: o caminho absoluto com o tamanho e a data de modificação do arquivo."""
+    return (os.path.abspath(caminho), *assinatura)
+
+
+def lembrar_hash(caminho, assinatura, hash_):
+    """Memoriza o hash de um arquivo já conhecido (por exemplo, pelo cache da base de casos) para a assinatura informada."""
+    hashes_arquivos[chave_hash(caminho, assinatura)] = hash_
+
+
+def hash_arquivo(caminho):
+    """Calcula o hash do conteúdo de um arquivo, lendo-o em blocos; o arquivo só é relido se o tamanho ou a data de modificação mudarem."""
+    estado = os.stat(caminho)
+    chave = chave_hash(caminho, (estado.st_size, estado.st_mtime_ns))
+    if (chave not in hashes_arquivos):
+        h = hashlib.blake2b(digest_size=16)
+        with open(caminho, 'rb') as arquivo:
+            for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO_HASH), b''):
+                h.update(bloco)
+
+        hashes_arquivos[chave] = h.hexdigest()
+
+    return hashes_arquivos[chave]
+
+
+def grupo_indice(colunas, parametros=None):
+    """Identifica o artefato independentemente do csv de origem: as colunas e todos os parâmetros (backend, seus parâmetros,
+    colunas de partição, tabela). Configurações diferentes no mesmo diretório formam grupos diferentes e não removem os artefatos umas das outras."""
+    identidade = [list(colunas), parametros or {}]
+    return hashlib.blake2b(json.dumps(identidade, sort_keys=True, default=str).encode(), digest_size=8).hexdigest()
+
+
+def chave_indice(caminho_csv, colunas, parametros=None):
+    """Gera a chave do índice: o grupo do artefato, seguido da versão calculada a partir do csv da base de casos, das colunas e dos parâmetros."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(VERSAO_INDICE).encode())
+    h.update(hash_arquivo(caminho_csv).encode())
+    h.update(json.dumps(list(colunas)).encode())
+    h.update(json.dumps(parametros or {}, sort_keys=True, default=str).encode())
+    return f'{grupo_indice(colunas, parametros)}.{h.hexdigest()}'
+
+
+def caminho_indice(caminho_csv, chave):
+    """Retorna o caminho do artefato do índice, salvo ao lado do csv da base de casos."""
+    return f'{caminho_csv}.{chave}.indice'
+
+
+def remover_obsoletos(caminho_csv, chave):
+    """Remove os artefatos do mesmo grupo (mesmas colunas e parâmetros) gerados de outro csv ou de outra versão, e os do formato antigo (sem grupo no nome), que não são mais carregados."""
+    grupo = chave.split('.')[0]
+    for caminho in glob.glob(f'{glob.escape(caminho_csv)}.*.indice'):
+        partes = caminho[len(caminho_csv) + 1:-len('.indice')].split('.')
+        if ((len(partes) == 1 or partes[0] == grupo) and caminho != caminho_indice(caminho_csv, chave)):
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+
+
+def salvar_indice(nbrs, caminho, chave):
+    """Serializa o índice treinado (árvore e matriz de casos codificada) em disco."""
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    joblib.dump({'versao': VERSAO_INDICE, 'chave': chave, 'nbrs': nbrs}, temporario)
+    os.replace(temporario, caminho)
+
+
+def carregar_indice(caminho, chave):
+    """Carrega o índice do disco mapeando seus arrays em memória (somente leitura). Retorna None se não existir ou estiver desatualizado."""
+    if not (os.path.isfile(caminho)):
+        return None
+
+    try:
+        artefato = joblib.load(caminho, mmap_mode='r')
+    except Exception:
+        return None
+
+    if (artefato.get('versao') != VERSAO_INDICE or artefato.get('chave') != chave):
+        return None
+
+    return artefato['nbrs']
+
+
+def obter_indice(caminho_csv, colunas, construir, parametros=None, reconstruir=False):
+    """Retorna o índice persistido para a base de casos, reconstruindo e salvando apenas quando os dados de origem mudaram."""
+    chave = chave_indice(caminho_csv, colunas, parametros)
+    caminho = caminho_indice(caminho_csv, chave)
+    if not (reconstruir):
+        nbrs = carregar_indice(caminho, chave)
+        if (nbrs is not None):
+            return nbrs
+
+    salvar_indice(construir(), caminho, chave)
+    remover_obsoletos(caminho_csv, chave)
+    # Recarrega o artefato recém-salvo para que o processo use a versão mapeada em memória
+    return carregar_indice(caminho, chave)
+
+
+if __name__ == '__main__':
+    # Etapa de build: treina e persiste o índice da base de casos atual
+    from .cbr import Cbr
+    Cbr(reconstruir_indice=True)
+    print('Índice da base de casos gerado.')
@@ -0,0 +1,107 @@
+import numpy as np
+
+
+class IndiceAproximado():
+    """Floresta de projeções aleatórias para busca aproximada de vizinhos.
+    Mais árvores (n_arvores) e folhas maiores (tamanho_folha) aumentam o recall e o custo de cada consulta."""
+
+    def __init__(self, n_neighbors=100, n_arvores=8, tamanho_folha=256, semente=0):
+        self.n_neighbors = n_neighbors
+        self.n_arvores = n_arvores
+        self.tamanho_folha = tamanho_folha
+        self.semente = semente
+
+    def fit(self, X):
+        """Constrói as árvores, cada uma particionando recursivamente os casos pela mediana de uma projeção aleatória."""
+        self._fit_X = np.ascontiguousarray(X, dtype=np.float64)
+        self.normas = np.einsum('ij,ij->i', self._fit_X, self._fit_X)
+        rng = np.random.default_rng(self.semente)
+        self.arvores = [self.construir_arvore(rng) for _ in range(self.n_arvores)]
+        return self
+
+
+    def construir_arvore(self, rng):
+        """Constrói uma árvore em arrays planos: direção e limiar de cada nó interno, filhos e intervalo de cada folha."""
+        n, dimensoes = self._fit_X.shape
+        ordem = np.arange(n)
+        direcoes, limiares, esquerdos, direitos, inicios, fins = [], [], [], [], [], []
+        pilha = [(0, n, -1, False)]
+        while (pilha):
+            inicio, fim, pai, lado_direito = pilha.pop()
+            no = len(limiares)
+            if (pai >= 0):
+                (direitos if lado_direito else esquerdos)[pai] = no
+
+            direcao = rng.standard_normal(dimensoes)
+            limiar = 0.0
+            divide = False
+            if (fim - inicio > self.tamanho_folha):
+                projecoes = self._fit_X[ordem[inicio:fim]] @ direcao
+                limiar = np.median(projecoes)
+                menores = projecoes <= limiar
+                meio = inicio + int(menores.sum())
+                # Casos repetidos podem cair todos do mesmo lado; nesse caso o nó vira folha
+                divide = inicio < meio < fim
+                if (divide):
+                    trecho = ordem[inicio:fim]
+                    ordem[inicio:fim] = np.concatenate([trecho[menores], trecho[~menores]])
+
+            direcoes.append(direcao)
+            limiares.append(limiar)
+            esquerdos.append(-1)
+            direitos.append(-1)
+            inicios.append(inicio)
+            fins.append(fim)
+            if (divide):
+                pilha.append((meio, fim, no, True))
+                pilha.append((inicio, meio, no, False))
+
+        return {
+            'ordem': ordem,
+            'direcoes': np.array(direcoes),
+            'limiares': np.array(limiares),
+            'esquerdos': np.array(esquerdos),
+            'direitos': np.array(direitos),
+            'inicios': np.array(inicios),
+            'fins': np.array(fins),
+        }
+
+
+    def folhas(self, arvore, X):
+        """Desce todas as consultas em paralelo até a folha de cada uma."""
+        nos = np.zeros(len(X), dtype=np.intp)
+        ativos = arvore['esquerdos'][nos] >= 0
+        while (ativos.any()):
+            atuais = nos[ativos]
+            projecoes = np.einsum('ij,ij->i', X[ativos], arvore['direcoes'][atuais])
+            nos[ativos] = np.where(projecoes <= arvore['limiares'][atuais], arvore['esquerdos'][atuais], arvore['direitos'][atuais])
+            ativos = arvore['esquerdos'][nos] >= 0
+
+        return nos
+
+
+    def kneighbors(self, X, n_neighbors=None, return_distance=True):
+        """Busca os vizinhos entre os candidatos das folhas alcançadas em todas as árvores, com distância exata."""
+        n_neighbors = min(n_neighbors or self.n_neighbors, len(self._fit_X))
+        X = np.asarray(X, dtype=np.float64)
+        folhas = [(arvore, self.folhas(arvore, X)) for arvore in self.arvores]
+        distancias = np.empty((len(X), n_neighbors))
+        indices = np.empty((len(X), n_neighbors), dtype=np.intp)
+        for i, consulta in enumerate(X):
+            candidatos = np.unique(np.concatenate([
+                arvore['ordem'][arvore['inicios'][folha[i]]:arvore['fins'][folha[i]]] for arvore, folha in folhas
+                ]))
+            # Poucos candidatos: recorre à busca exata para sempre devolver n_neighbors vizinhos
+            if (len(candidatos) < n_neighbors):
+                candidatos = np.arange(len(self._fit_X))
+
+            quadrados = np.maximum(self.normas[candidatos] - 2 * (self._fit_X[candidatos] @ consulta) + consulta @ consulta, 0)
+            proximos = np.argpartition(quadrados, n_neighbors - 1)[:n_neighbors]
+            proximos = proximos[np.lexsort((candidatos[proximos], quadrados[proximos]))]
+            distancias[i] = np.sqrt(quadrados[proximos])
+            indices[i] = candidatos[proximos]
+
+        if (return_distance):
+            return distancias, indices
+
+        return indices
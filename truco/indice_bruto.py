@@ -0,0 +1,67 @@
+import numpy as np
+
+
+class IndiceForcaBruta():
+    """Busca exata por força bruta sobre a base de casos padronizada em uma matriz float32 contígua.
+    As distâncias são calculadas com produto de matrizes (BLAS), em blocos de no máximo tamanho_bloco distâncias para limitar a memória."""
+
+    def __init__(self, n_neighbors=100, padronizar=True, tamanho_bloco=1 << 22):
+        self.n_neighbors = n_neighbors
+        self.padronizar = padronizar
+        self.tamanho_bloco = tamanho_bloco
+
+    def fit(self, X):
+        """Padroniza a base de casos e guarda a matriz float32 com as normas ao quadrado de cada caso.
+        A base original (usada pelo índice incremental para reconstruir o índice) é mantida em int16 quando os atributos cabem nele."""
+        self._fit_X = np.ascontiguousarray(X)
+        if (self._fit_X.dtype.kind == 'f' and np.array_equal(self._fit_X, np.round(self._fit_X)) and self._fit_X.size and -2 ** 15 <= self._fit_X.min() and self._fit_X.max() < 2 ** 15):
+            self._fit_X = self._fit_X.astype(np.int16)
+
+        self.media = np.zeros(self._fit_X.shape[1])
+        self.desvio = np.ones(self._fit_X.shape[1])
+        if (self.padronizar):
+            self.media = self._fit_X.mean(axis=0)
+            self.desvio = self._fit_X.std(axis=0)
+            self.desvio[self.desvio == 0] = 1
+
+        self.matriz = self.transformar(self._fit_X)
+        self.normas = np.einsum('ij,ij->i', self.matriz, self.matriz)
+        return self
+
+
+    def transformar(self, X):
+        """Leva casos ou consultas ao espaço padronizado (float32) em que as distâncias são medidas."""
+        return np.ascontiguousarray((np.asarray(X, dtype=np.float64) - self.media) / self.desvio, dtype=np.float32)
+
+
+    def kneighbors(self, X, n_neighbors=None, return_distance=True):
+        """Busca os vizinhos de um lote de consultas, mantendo os k melhores de cada bloco com argpartition."""
+        n_neighbors = min(n_neighbors or self.n_neighbors, len(self.matriz))
+        consultas = self.transformar(X)
+        normas_consultas = np.einsum('ij,ij->i', consultas, consultas)
+        # Blocos de consultas e de casos limitam a matriz de distâncias a tamanho_bloco elementos por vez
+        passo_casos = min(len(self.matriz), self.tamanho_bloco)
+        passo_consultas = max(1, self.tamanho_bloco // passo_casos)
+        distancias = np.empty((len(consultas), n_neighbors), dtype=np.float32)
+        indices = np.empty((len(consultas), n_neighbors), dtype=np.intp)
+        for inicio_consultas in range(0, len(consultas), passo_consultas):
+            lote = slice(inicio_consultas, inicio_consultas + passo_consultas)
+            melhores_distancias = np.empty((len(consultas[lote]), 0), dtype=np.float32)
+            melhores_indices = np.empty((len(consultas[lote]), 0), dtype=np.intp)
+            for inicio in range(0, len(self.matriz), passo_casos):
+                bloco = slice(inicio, inicio + passo_casos)
+                quadrados = self.normas[bloco][None, :] - 2 * (consultas[lote] @ self.matriz[bloco].T) + normas_consultas[lote, None]
+                candidatos = np.hstack([melhores_distancias, quadrados])
+                posicoes = np.hstack([melhores_indices, np.broadcast_to(np.arange(inicio, inicio + quadrados.shape[1]), quadrados.shape)])
+                escolhidos = np.argpartition(candidatos, n_neighbors - 1, axis=1)[:, :n_neighbors]
+                melhores_distancias = np.take_along_axis(candidatos, escolhidos, axis=1)
+                melhores_indices = np.take_along_axis(posicoes, escolhidos, axis=1)
+
+            ordem = np.lexsort((melhores_indices, melhores_distancias), axis=1)
+            distancias[lote] = np.take_along_axis(melhores_distancias, ordem, axis=1)
+            indices[lote] = np.take_along_axis(melhores_indices, ordem, axis=1)
+
+        if (return_distance):
+            return np.sqrt(np.maximum(distancias, 0)), indices
+
+        return indices
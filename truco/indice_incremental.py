@@ -0,0 +1,161 @@
+import threading
+import warnings
+import numpy as np
+
+
+def anexar_linha(colunas, tamanho, valores):
+    """Escreve uma linha na posição `tamanho` das colunas. Os arrays originais (que podem estar em memória compartilhada ou
+    mapeados de arquivo) nunca são alterados nem copiados: na primeira escrita a coluna passa a ser uma ColunaCrescente."""
+    for nome, valor in valores.items():
+        coluna = colunas[nome]
+        if not (isinstance(coluna, ColunaCrescente)):
+            colunas[nome] = coluna = ColunaCrescente(coluna[:tamanho])
+
+        coluna.anexar(valor)
+
+    return colunas
+
+
+class ColunaCrescente():
+    """Coluna da base de casos formada por um array base imutável e uma cauda própria do processo, com as linhas retidas depois.
+    A indexação por posições (arrays de índices, como os vizinhos) lê da base ou da cauda, sem copiar a base."""
+
+    def __init__(self, base):
+        self.base = base
+        self.tamanho_base = len(base)
+        self.cauda = np.empty(16, dtype=base.dtype)
+        self.tamanho_cauda = 0
+        self.dtype = base.dtype
+
+    def __len__(self):
+        return self.tamanho_base + self.tamanho_cauda
+
+
+    def anexar(self, valor):
+        """Acrescenta um valor ao fim da coluna, dobrando a capacidade da cauda quando necessário."""
+        if (self.tamanho_cauda == len(self.cauda)):
+            cauda = np.empty(2 * len(self.cauda), dtype=self.dtype)
+            cauda[:self.tamanho_cauda] = self.cauda
+            self.cauda = cauda
+
+        self.cauda[self.tamanho_cauda] = valor
+        self.tamanho_cauda += 1
+
+
+    def __getitem__(self, posicoes):
+        """Valores nas posições informadas (array de índices de qualquer forma, ou fatia)."""
+        if (isinstance(posicoes, slice)):
+            posicoes = np.arange(len(self))[posicoes]
+
+        posicoes = np.asarray(posicoes)
+        na_cauda = posicoes >= self.tamanho_base
+        if not (na_cauda.any()):
+            return self.base[posicoes]
+
+        valores = self.base[np.where(na_cauda, 0, posicoes)] if self.tamanho_base else np.empty(posicoes.shape, dtype=self.dtype)
+        valores[na_cauda] = self.cauda[posicoes[na_cauda] - self.tamanho_base]
+        return valores
+
+
+class IndiceIncremental():
+    def __init__(self, principal, construir, limite_delta=1000):
+        self.principal = principal
+        self.construir = construir
+        self.limite_delta = limite_delta
+        self.n_neighbors = principal.n_neighbors
+        self.matriz_principal = np.asarray(principal._fit_X)
+        self.delta = np.empty((0, self.matriz_principal.shape[1]), dtype=np.float64)
+        self.trava = threading.Lock()
+        self.compactacao = None
+        self.compactacoes = 0
+        # Erro da última compactação: enquanto houver, o delta não dispara novas compactações em segundo plano
+        self.erro_compactacao = None
+
+    def __len__(self):
+        return len(self.matriz_principal) + len(self.delta)
+
+
+    def adicionar(self, linhas):
+        """Adiciona novos casos ao segmento delta, disparando a compactação em segundo plano quando o limite é excedido."""
+        linhas = np.asarray(linhas, dtype=np.float64).reshape(-1, self.delta.shape[1])
+        with self.trava:
+            self.delta = np.vstack([self.delta, linhas])
+            compactar = len(self.delta) >= self.limite_delta and self.compactacao is None and self.erro_compactacao is None
+            if (compactar):
+                self.compactacao = threading.Thread(target=self.compactar, daemon=True)
+
+        if (compactar):
+            self.compactacao.start()
+
+
+    def compactar(self):
+        """Reconstrói o índice principal incorporando o delta atual; casos retidos durante a reconstrução permanecem no delta.
+        Backends que sabem estender o índice treinado (estender) recebem só o delta, sem treinar novamente.
+        Uma falha é guardada em erro_compactacao e avisada: o delta continua sendo consultado, mas novas compactações
+        em segundo plano não são disparadas até que uma chamada direta a compactar tenha sucesso."""
+        try:
+            with self.trava:
+                indice = self.principal
+                principal = self.matriz_principal
+                delta = self.delta
+
+            estender = getattr(indice, 'estender', None)
+            novo = self.construir(np.vstack([principal, delta])) if estender is None else estender(delta)
+            with self.trava:
+                self.principal = novo
+                self.matriz_principal = np.asarray(novo._fit_X)
+                self.delta = self.delta[len(delta):]
+                self.compactacoes += 1
+                self.erro_compactacao = None
+
+        except Exception as erro:
+            with self.trava:
+                self.erro_compactacao = erro
+
+            warnings.warn(f'Falha na compactação do índice; o delta de {len(delta)} casos será mantido: {erro!r}', RuntimeWarning)
+
+        finally:
+            with self.trava:
+                self.compactacao = None
+
+
+    def aguardar_compactacao(self):
+        """Bloqueia até o fim da compactação em andamento, se houver."""
+        compactacao = self.compactacao
+        if (compactacao is not None):
+            compactacao.join()
+
+
+    def kneighbors(self, X, n_neighbors=None, return_distance=True):
+        """Busca os vizinhos no índice principal e no delta (força bruta), mesclando os resultados pela distância."""
+        n_neighbors = n_neighbors or self.n_neighbors
+        with self.trava:
+            principal = self.principal
+            tamanho_principal = len(self.matriz_principal)
+            delta = self.delta
+
+        X = np.asarray(X, dtype=np.float64)
+        distancias, indices = principal.kneighbors(X, n_neighbors=min(n_neighbors, tamanho_principal))
+        if (len(delta)):
+            # Backends com outra métrica expõem medir; os que medem distâncias em outro espaço (padronizado, projetado), transformar
+            medir = getattr(principal, 'medir', None)
+            transformar = getattr(principal, 'transformar', None)
+            if (medir is not None):
+                distancias_delta = medir(X, delta)
+            else:
+                if (transformar is not None):
+                    X, delta = transformar(X), transformar(delta)
+
+                distancias_delta = np.sqrt(((X[:, None, :] - delta[None, :, :]) ** 2).sum(axis=2))
+
+            indices_delta = np.broadcast_to(np.arange(tamanho_principal, tamanho_principal + len(delta)), distancias_delta.shape)
+            distancias = np.hstack([distancias, distancias_delta])
+            indices = np.hstack([indices, indices_delta])
+            ordem = np.argsort(distancias, axis=1, kind='stable')[:, :n_neighbors]
+            distancias = np.take_along_axis(distancias, ordem, axis=1)
+            indices = np.take_along_axis(indices, ordem, axis=1)
+
+        if (return_distance):
+            return distancias, indices
+
+        return indices
@@ -0,0 +1,103 @@
+import numpy as np
+
+
+def atribuir_clusters(X, centroides, tamanho_bloco=1 << 22):
+    """Retorna o centroide mais próximo de cada caso, calculando as distâncias em blocos de no máximo tamanho_bloco elementos."""
+    normas = np.einsum('ij,ij->i', centroides, centroides)
+    passo = max(1, tamanho_bloco // len(centroides))
+    atribuicoes = np.empty(len(X), dtype=np.intp)
+    for inicio in range(0, len(X), passo):
+        # |x|² é o mesmo para todos os centroides e não altera o mais próximo
+        atribuicoes[inicio:inicio + passo] = np.argmin(normas[None, :] - 2 * (X[inicio:inicio + passo] @ centroides.T), axis=1)
+
+    return atribuicoes
+
+
+def kmeans(X, n_clusters, iteracoes=20, semente=0):
+    """K-means (Lloyd) com inicialização k-means++; clusters que ficam vazios mantêm o centroide anterior."""
+    rng = np.random.default_rng(semente)
+    centroides = np.empty((n_clusters, X.shape[1]))
+    centroides[0] = X[rng.integers(len(X))]
+    distancias = ((X - centroides[0]) ** 2).sum(axis=1)
+    for i in range(1, n_clusters):
+        total = distancias.sum()
+        escolhido = rng.choice(len(X), p=distancias / total) if total > 0 else rng.integers(len(X))
+        centroides[i] = X[escolhido]
+        distancias = np.minimum(distancias, ((X - centroides[i]) ** 2).sum(axis=1))
+
+    for _ in range(iteracoes):
+        atribuicoes = atribuir_clusters(X, centroides)
+        contagens = np.bincount(atribuicoes, minlength=n_clusters)
+        somas = np.zeros_like(centroides)
+        np.add.at(somas, atribuicoes, X)
+        novos = np.where(contagens[:, None] > 0, somas / np.maximum(contagens, 1)[:, None], centroides)
+        if (np.allclose(novos, centroides)):
+            break
+
+        centroides = novos
+
+    return centroides
+
+
+class IndiceIVF():
+    """Arquivo invertido: os casos são agrupados por k-means e cada consulta busca apenas nos n_probe clusters de centroide mais próximo.
+    Mais clusters sondados (n_probe) aumentam o recall e o custo de cada consulta; novos casos entram no cluster mais próximo, sem reagrupar."""
+
+    def __init__(self, n_neighbors=100, n_clusters=None, n_probe=8, iteracoes=20, semente=0):
+        self.n_neighbors = n_neighbors
+        self.n_clusters = n_clusters
+        self.n_probe = n_probe
+        self.iteracoes = iteracoes
+        self.semente = semente
+
+    def fit(self, X):
+        """Agrupa os casos (por padrão em √n clusters) e monta as listas de casos de cada cluster."""
+        self._fit_X = np.ascontiguousarray(X, dtype=np.float64)
+        n_clusters = min(self.n_clusters or max(1, int(np.sqrt(len(self._fit_X)))), len(self._fit_X))
+        self.centroides = kmeans(self._fit_X, n_clusters, self.iteracoes, self.semente)
+        self.montar_listas(atribuir_clusters(self._fit_X, self.centroides))
+        return self
+
+
+    def montar_listas(self, atribuicoes):
+        """Ordena os casos por cluster: os casos do cluster c são ordem[inicios[c]:inicios[c + 1]]."""
+        self.atribuicoes = atribuicoes
+        self.ordem = np.argsort(atribuicoes, kind='stable')
+        self.inicios = np.concatenate([[0], np.cumsum(np.bincount(atribuicoes, minlength=len(self.centroides)))])
+        self.normas = np.einsum('ij,ij->i', self._fit_X, self._fit_X)
+
+
+    def estender(self, linhas):
+        """Retorna um novo índice com os casos informados no fim da base, cada um no cluster de centroide mais próximo, sem reagrupar."""
+        linhas = np.asarray(linhas, dtype=np.float64).reshape(-1, self._fit_X.shape[1])
+        novo = IndiceIVF(self.n_neighbors, self.n_clusters, self.n_probe, self.iteracoes, self.semente)
+        novo._fit_X = np.vstack([self._fit_X, linhas])
+        novo.centroides = self.centroides
+        novo.montar_listas(np.concatenate([self.atribuicoes, atribuir_clusters(linhas, self.centroides)]))
+        return novo
+
+
+    def kneighbors(self, X, n_neighbors=None, return_distance=True):
+        """Busca os vizinhos entre os casos dos n_probe clusters mais próximos de cada consulta, com distância exata.
+        Se esses clusters tiverem menos de k casos, os próximos clusters em distância também são sondados."""
+        n_neighbors = min(n_neighbors or self.n_neighbors, len(self._fit_X))
+        X = np.asarray(X, dtype=np.float64)
+        tamanhos = np.diff(self.inicios)
+        normas_centroides = np.einsum('ij,ij->i', self.centroides, self.centroides)
+        sondagens = np.argsort(normas_centroides[None, :] - 2 * (X @ self.centroides.T), axis=1, kind='stable')
+        distancias = np.empty((len(X), n_neighbors))
+        indices = np.empty((len(X), n_neighbors), dtype=np.intp)
+        for i, consulta in enumerate(X):
+            suficientes = np.searchsorted(np.cumsum(tamanhos[sondagens[i]]), n_neighbors) + 1
+            clusters = sondagens[i, :max(self.n_probe, suficientes)]
+            candidatos = np.concatenate([self.ordem[self.inicios[c]:self.inicios[c + 1]] for c in clusters])
+            quadrados = np.maximum(self.normas[candidatos] - 2 * (self._fit_X[candidatos] @ consulta) + consulta @ consulta, 0)
+            proximos = np.argpartition(quadrados, n_neighbors - 1)[:n_neighbors]
+            proximos = proximos[np.lexsort((candidatos[proximos], quadrados[proximos]))]
+            distancias[i] = np.sqrt(quadrados[proximos])
+            indices[i] = candidatos[proximos]
+
+        if (return_distance):
+            return distancias, indices
+
+        return indices
@@ -0,0 +1,78 @@
+import numpy as np
+from .indice_incremental import IndiceIncremental
+
+
+def construir_particoes(matriz, chaves, construir, suporte_minimo):
+    """Treina um índice para cada combinação de valores das colunas de partição com pelo menos suporte_minimo casos.
+    Retorna {chave: (posições dos casos na base, índice treinado)}; as combinações mais esparsas ficam com o índice global."""
+    valores, inversos, contagens = np.unique(np.asarray(chaves, dtype=np.int64), axis=0, return_inverse=True, return_counts=True)
+    grupos = np.split(np.argsort(inversos.ravel(), kind='stable'), np.cumsum(contagens)[:-1])
+    particoes = {}
+    for valor, posicoes in zip(valores, grupos):
+        if (len(posicoes) >= suporte_minimo):
+            particoes[tuple(int(v) for v in valor)] = (posicoes, construir(matriz[posicoes]))
+
+    return particoes
+
+
+class IndiceParticionado():
+    """Índice dividido pelos valores de colunas discretas de contexto: cada consulta busca apenas os casos do seu contexto.
+    As consultas trazem, depois das colunas da decisão, os valores das colunas de partição. Contextos sem partição usam o índice global."""
+
+    def __init__(self, global_, particoes, n_chaves, construir, limite_delta=1000):
+        self.global_ = global_
+        self.n_chaves = n_chaves
+        self.n_neighbors = global_.n_neighbors
+        self.n_colunas = global_.matriz_principal.shape[1]
+        self.posicoes = {chave: np.asarray(posicoes, dtype=np.intp) for chave, (posicoes, _) in particoes.items()}
+        self.particoes = {chave: IndiceIncremental(principal, construir, limite_delta) for chave, (_, principal) in particoes.items()}
+        self.consultas_particao = 0
+        self.consultas_globais = 0
+
+    def __len__(self):
+        return len(self.global_)
+
+
+    def adicionar(self, linhas):
+        """Adiciona novos casos ao índice global e, quando o contexto tem partição, também ao índice dela."""
+        for linha in np.asarray(linhas, dtype=np.float64).reshape(-1, self.n_colunas + self.n_chaves):
+            chave = tuple(int(v) for v in linha[self.n_colunas:])
+            posicao = len(self.global_)
+            self.global_.adicionar(linha[:self.n_colunas])
+            if (chave in self.particoes):
+                self.posicoes[chave] = np.append(self.posicoes[chave], posicao)
+                self.particoes[chave].adicionar(linha[:self.n_colunas])
+
+
+    def aguardar_compactacao(self):
+        """Bloqueia até o fim das compactações em andamento no índice global e nas partições."""
+        self.global_.aguardar_compactacao()
+        for indice in self.particoes.values():
+            indice.aguardar_compactacao()
+
+
+    def kneighbors(self, X, n_neighbors=None, return_distance=True):
+        """Agrupa as consultas pelo contexto e busca cada grupo na sua partição (ou no índice global), retornando posições da base inteira."""
+        n_neighbors = n_neighbors or self.n_neighbors
+        X = np.asarray(X, dtype=np.float64)
+        consultas = X[:, :self.n_colunas]
+        contextos, inversos = np.unique(X[:, self.n_colunas:].astype(np.int64), axis=0, return_inverse=True)
+        inversos = inversos.ravel()
+        distancias = np.empty((len(X), n_neighbors))
+        indices = np.empty((len(X), n_neighbors), dtype=np.intp)
+        for grupo, contexto in enumerate(contextos):
+            linhas = inversos == grupo
+            chave = tuple(int(v) for v in contexto)
+            # Com k maior que a partição (expansão de vizinhos), a busca vai para o índice global
+            if (chave in self.particoes and len(self.particoes[chave]) >= n_neighbors):
+                distancias[linhas], locais = self.particoes[chave].kneighbors(consultas[linhas], n_neighbors)
+                indices[linhas] = self.posicoes[chave][locais]
+                self.consultas_particao += int(linhas.sum())
+            else:
+                distancias[linhas], indices[linhas] = self.global_.kneighbors(consultas[linhas], n_neighbors)
+                self.consultas_globais += int(linhas.sum())
+
+        if (return_distance):
+            return distancias, indices
+
+        return indices
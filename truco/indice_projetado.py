@@ -0,0 +1,33 @@
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+
+
+class IndiceProjetado():
+    """Busca exata (ball tree) sobre a projeção dos casos nas componentes principais (PCA) da base de casos.
+    As colunas codificadas são muito correlacionadas: poucas dimensões preservam a maior parte das distâncias e barateiam a busca."""
+
+    def __init__(self, n_neighbors=100, dimensoes=4):
+        self.n_neighbors = n_neighbors
+        self.dimensoes = dimensoes
+
+    def fit(self, X):
+        """Ajusta a projeção pela decomposição SVD da base centralizada e treina a ball tree sobre os casos projetados."""
+        self._fit_X = np.ascontiguousarray(X, dtype=np.float64)
+        self.media = self._fit_X.mean(axis=0)
+        _, singulares, componentes = np.linalg.svd(self._fit_X - self.media, full_matrices=False)
+        self.componentes = np.ascontiguousarray(componentes[:self.dimensoes].T)
+        variancias = singulares ** 2
+        self.variancia_explicada = float(variancias[:self.dimensoes].sum() / variancias.sum()) if variancias.sum() else 1.0
+        self.arvore = NearestNeighbors(n_neighbors=self.n_neighbors, algorithm='ball_tree').fit(self.transformar(self._fit_X))
+        return self
+
+
+    def transformar(self, X):
+        """Leva casos ou consultas ao espaço projetado em que as distâncias são medidas."""
+        return (np.asarray(X, dtype=np.float64) - self.media) @ self.componentes
+
+
+    def kneighbors(self, X, n_neighbors=None, return_distance=True):
+        """Busca os vizinhos das consultas projetadas, com distâncias medidas no espaço projetado."""
+        n_neighbors = min(n_neighbors or self.n_neighbors, len(self._fit_X))
+        return self.arvore.kneighbors(self.transformar(X), n_neighbors=n_neighbors, return_distance=return_distance)
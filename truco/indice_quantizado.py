@@ -0,0 +1,105 @@
+import numpy as np
+
+METRICAS = ('l2', 'l1')
+
+
+class IndiceQuantizado():
+    """Busca exata por força bruta sobre a base de casos quantizada em uint8 (1 byte por atributo, contra 8 do float64 da ball tree).
+    Cada coluna é deslocada pelo seu menor valor, de modo que o preenchimento -100 vira 0: a base treinada precisa ter atributos inteiros
+    com amplitude de até 255, e as distâncias entre os seus casos são exatas. Consultas e casos retidos com frações (como a qualidade
+    da mão) são arredondados para o inteiro mais próximo. As distâncias são L2 (padrão) ou L1, calculadas em blocos de tamanho_bloco elementos."""
+
+    def __init__(self, n_neighbors=100, metrica='l2', tamanho_bloco=1 << 22):
+        if (metrica not in METRICAS):
+            raise ValueError(f'Métrica desconhecida: {metrica}')
+
+        self.n_neighbors = n_neighbors
+        self.metrica = metrica
+        self.tamanho_bloco = tamanho_bloco
+
+    def fit(self, X):
+        """Calcula o deslocamento de cada coluna e guarda a matriz uint8 com as normas ao quadrado de cada caso."""
+        X = np.asarray(X, dtype=np.float64)
+        if not (np.array_equal(X, np.round(X))):
+            raise ValueError('A base quantizada exige atributos inteiros')
+
+        self.deslocamento = X.min(axis=0)
+        amplitudes = X.max(axis=0) - self.deslocamento
+        if ((amplitudes > 255).any()):
+            raise ValueError(f'Colunas com amplitude acima de 255 não cabem em uint8: {np.flatnonzero(amplitudes > 255).tolist()}')
+
+        self._fit_X = np.ascontiguousarray(X - self.deslocamento, dtype=np.uint8)
+        self.normas = np.einsum('ij,ij->i', self._fit_X, self._fit_X, dtype=np.int32)
+        return self
+
+
+    def estender(self, linhas):
+        """Retorna um novo índice com os casos informados no fim da base, arredondados como as consultas e quantizados com o mesmo
+        deslocamento. Se algum caso sair da faixa do deslocamento atual, a base inteira é quantizada novamente."""
+        linhas = np.rint(np.asarray(linhas, dtype=np.float64).reshape(-1, self._fit_X.shape[1]) - self.deslocamento)
+        novo = IndiceQuantizado(self.n_neighbors, self.metrica, self.tamanho_bloco)
+        if ((linhas < 0).any() or (linhas > 255).any()):
+            return novo.fit(np.vstack([self._fit_X + self.deslocamento, linhas + self.deslocamento]))
+
+        novo.deslocamento = self.deslocamento
+        novo._fit_X = np.vstack([self._fit_X, linhas.astype(np.uint8)])
+        novo.normas = np.einsum('ij,ij->i', novo._fit_X, novo._fit_X, dtype=np.int32)
+        return novo
+
+
+    def medir(self, X, casos):
+        """Distâncias, na métrica do índice, entre consultas e casos não quantizados (delta do índice incremental), ambos arredondados
+        como na base quantizada: as distâncias ao delta não mudam quando a compactação o incorpora."""
+        diferencas = np.rint(np.asarray(X, dtype=np.float64))[:, None, :] - np.rint(np.asarray(casos, dtype=np.float64))[None, :, :]
+        if (self.metrica == 'l1'):
+            return np.abs(diferencas).sum(axis=2)
+
+        return np.sqrt((diferencas ** 2).sum(axis=2))
+
+
+    def distancias_bloco(self, consultas, normas_consultas, bloco, tipo):
+        """Distâncias (L1, ou L2 ao quadrado) de um lote de consultas aos casos de um bloco, direto dos códigos inteiros."""
+        casos = self._fit_X[bloco]
+        if (self.metrica == 'l1'):
+            return np.abs(casos[None, :, :].astype(np.int32) - consultas[:, None, :]).sum(axis=2)
+
+        # Produto escalar em ponto flutuante (BLAS): com inteiros pequenos, o resultado é exato
+        produtos = consultas.astype(tipo) @ casos.astype(tipo).T
+        return self.normas[bloco][None, :] - 2 * produtos.astype(np.int64) + normas_consultas[:, None]
+
+
+    def kneighbors(self, X, n_neighbors=None, return_distance=True):
+        """Busca os vizinhos de um lote de consultas, mantendo os k melhores de cada bloco com argpartition."""
+        n_neighbors = min(n_neighbors or self.n_neighbors, len(self._fit_X))
+        # Consultas fora da faixa da base mantêm códigos negativos ou acima de 255: ficam em int32, sem saturar
+        consultas = np.rint(np.asarray(X, dtype=np.float64) - self.deslocamento).astype(np.int32)
+        normas_consultas = np.einsum('ij,ij->i', consultas, consultas, dtype=np.int64)
+        maximo = int(np.abs(consultas).max(initial=0)) + 255
+        tipo = np.float32 if maximo * maximo * self._fit_X.shape[1] < (1 << 24) else np.float64
+        # Na L1 o bloco materializa as diferenças de cada atributo; na L2, apenas a matriz de distâncias
+        largura = self._fit_X.shape[1] if self.metrica == 'l1' else 1
+        passo_casos = max(1, min(len(self._fit_X), self.tamanho_bloco // largura))
+        passo_consultas = max(1, self.tamanho_bloco // (passo_casos * largura))
+        distancias = np.empty((len(consultas), n_neighbors), dtype=np.int64)
+        indices = np.empty((len(consultas), n_neighbors), dtype=np.intp)
+        for inicio_consultas in range(0, len(consultas), passo_consultas):
+            lote = slice(inicio_consultas, inicio_consultas + passo_consultas)
+            melhores_distancias = np.empty((len(consultas[lote]), 0), dtype=np.int64)
+            melhores_indices = np.empty((len(consultas[lote]), 0), dtype=np.intp)
+            for inicio in range(0, len(self._fit_X), passo_casos):
+                bloco = slice(inicio, inicio + passo_casos)
+                medidas = self.distancias_bloco(consultas[lote], normas_consultas[lote], bloco, tipo)
+                candidatos = np.hstack([melhores_distancias, medidas])
+                posicoes = np.hstack([melhores_indices, np.broadcast_to(np.arange(inicio, inicio + medidas.shape[1]), medidas.shape)])
+                escolhidos = np.argpartition(candidatos, n_neighbors - 1, axis=1)[:, :n_neighbors]
+                melhores_distancias = np.take_along_axis(candidatos, escolhidos, axis=1)
+                melhores_indices = np.take_along_axis(posicoes, escolhidos, axis=1)
+
+            ordem = np.lexsort((melhores_indices, melhores_distancias), axis=1)
+            distancias[lote] = np.take_along_axis(melhores_distancias, ordem, axis=1)
+            indices[lote] = np.take_along_axis(melhores_indices, ordem, axis=1)
+
+        if (return_distance):
+            return (distancias.astype(np.float64) if self.metrica == 'l1' else np.sqrt(distancias)), indices
+
+        return indices
@@ -0,0 +1,129 @@
+import io
+import pickle
+import signal
+import struct
+import numpy as np
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+NOME_BASE_COMPARTILHADA = 'truco_casos'
+ALINHAMENTO = 64
+
+# Segmentos anexados neste processo, mantidos vivos enquanto os arrays que apontam para eles estiverem em uso
+anexados = {}
+# Segmentos criados por este processo, que continuam registrados no resource_tracker até serem liberados
+publicados = set()
+
+
+class SegmentoAnexado(SharedMemory):
+    def close(self):
+        """Mantém o mapeamento aberto: os arrays anexados apontam para ele até o fim do processo."""
+
+
+class PicklerCompartilhado(pickle.Pickler):
+    def reducer_override(self, objeto):
+        """Serializa arrays mapeados de arquivo (np.memmap) como ndarray, para que também saiam do pickle como buffers."""
+        if (isinstance(objeto, np.memmap)):
+            return np.asarray(objeto).__reduce_ex__(5)
+
+        return NotImplemented
+
+
+def abrir_segmento(nome):
+    """Abre um segmento existente sem registrá-lo no resource_tracker, que o apagaria ao fim deste processo."""
+    try:
+        return SegmentoAnexado(name=nome, track=False)
+    except TypeError:
+        segmento = SegmentoAnexado(name=nome)
+        if (nome not in publicados):
+            resource_tracker.unregister(segmento._name, 'shared_memory')
+
+        return segmento
+
+
+def publicar_objeto(nome, objeto):
+    """Publica um objeto em memória compartilhada: os arrays numpy vão para um segmento de dados e o restante do pickle para um manifesto."""
+    buffers = []
+    arquivo = io.BytesIO()
+    PicklerCompartilhado(arquivo, protocol=5, buffer_callback=buffers.append).dump(objeto)
+    cabecalho = arquivo.getvalue()
+    brutos = [buffer.raw() for buffer in buffers]
+    posicoes = []
+    tamanho = 0
+    for bruto in brutos:
+        posicoes.append((tamanho, bruto.nbytes))
+        tamanho += -(-bruto.nbytes // ALINHAMENTO) * ALINHAMENTO
+
+    dados = SharedMemory(name=f'{nome}_dados', create=True, size=max(tamanho, 1))
+    publicados.add(dados.name)
+    for (inicio, bytes_), bruto in zip(posicoes, brutos):
+        dados.buf[inicio:inicio + bytes_] = bruto.cast('B')
+
+    manifesto = pickle.dumps({'cabecalho': cabecalho, 'posicoes': posicoes})
+    segmento_manifesto = SharedMemory(name=f'{nome}_manifesto', create=True, size=len(manifesto) + 8)
+    publicados.add(segmento_manifesto.name)
+    segmento_manifesto.buf[:8] = struct.pack('<Q', len(manifesto))
+    segmento_manifesto.buf[8:8 + len(manifesto)] = manifesto
+    return [segmento_manifesto, dados]
+
+
+def anexar_objeto(nome):
+    """Reconstrói, sem cópia, um objeto publicado por outro processo. Os arrays apontam para a memória compartilhada e são somente leitura."""
+    if (nome in anexados):
+        return anexados[nome][0]
+
+    segmento_manifesto = abrir_segmento(f'{nome}_manifesto')
+    tamanho = struct.unpack('<Q', bytes(segmento_manifesto.buf[:8]))[0]
+    manifesto = pickle.loads(bytes(segmento_manifesto.buf[8:8 + tamanho]))
+    dados = abrir_segmento(f'{nome}_dados')
+    buffers = [dados.buf[inicio:inicio + bytes_].toreadonly() for inicio, bytes_ in manifesto['posicoes']]
+    objeto = pickle.loads(manifesto['cabecalho'], buffers=buffers)
+    anexados[nome] = (objeto, [segmento_manifesto, dados])
+    return objeto
+
+
+def liberar(segmentos):
+    """Fecha e remove os segmentos publicados por este processo."""
+    for segmento in segmentos:
+        segmento.close()
+        segmento.unlink()
+        publicados.discard(segmento.name)
+
+
+def base_casos_compartilhavel(cbr):
+    """Reúne o que os processos de jogo precisam da base de casos: matriz codificada, quantidades, rótulos e índices de cada decisão."""
+    from .dados import COLUNA_QUANTIDADE
+    from .tabela_decisoes import parametros_tabela
+    colunas = cbr.colunas_casos
+    # Ordem de colunas (Fortran): cada coluna da matriz é um array int16 contíguo
+    matriz = np.asfortranarray(np.column_stack([cbr.casos[coluna][:cbr.tamanho_casos] for coluna in colunas]), dtype=np.int16)
+    return {
+        'colunas': colunas,
+        'nome_indice': cbr.dataset.index.name,
+        'indice_casos': np.asarray(cbr.dataset.index),
+        'matriz': matriz,
+        'quantidades': np.ascontiguousarray(cbr.casos[COLUNA_QUANTIDADE][:cbr.tamanho_casos]),
+        'rotulos': {nome: np.ascontiguousarray(rotulo[:cbr.tamanho_casos]) for nome, rotulo in cbr.rotulos.items()},
+        'colunas_decisao': cbr.colunas_decisao,
+        'backend': cbr.backend,
+        'parametros_backend': cbr.parametros_backend,
+        'nbrs': {decisao: getattr(indice, 'global_', indice).principal for decisao, indice in cbr.nbrs.items()},
+        'colunas_particao': cbr.colunas_particao,
+        'suporte_minimo_particao': cbr.suporte_minimo_particao,
+        'particoes': cbr.particoes,
+        'tabela': cbr.tabela,
+        'parametros_tabela': parametros_tabela(cbr),
+    }
+
+
+if __name__ == '__main__':
+    # Processo carregador: publica a base de casos e a mantém disponível até ser interrompido
+    from .cbr import Cbr
+    segmentos = publicar_objeto(NOME_BASE_COMPARTILHADA, base_casos_compartilhavel(Cbr()))
+    print(f"Base de casos publicada em memória compartilhada como '{NOME_BASE_COMPARTILHADA}'. Ctrl+C para encerrar.")
+    try:
+        signal.pause()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        liberar(segmentos)
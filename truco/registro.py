@@ -0,0 +1,75 @@
+import numbers
+import numpy as np
+import pandas as pd
+
+
+class Registro():
+    """Registro de uma mão em um array float64 de tamanho fixo, com a posição de cada coluna pré-calculada.
+    Atribuir um campo que não é coluna do registro gera AttributeError, em vez de criar um atributo que nunca chega às consultas."""
+
+    __slots__ = ('colunas', 'posicoes', 'valores')
+
+    def __init__(self, colunas, valores=None, posicoes=None):
+        # Colunas repetidas na lista de origem ocupam uma única posição
+        colunas = list(dict.fromkeys(colunas))
+        object.__setattr__(self, 'colunas', colunas)
+        object.__setattr__(self, 'posicoes', posicoes if posicoes is not None else {coluna: i for i, coluna in enumerate(colunas)})
+        object.__setattr__(self, 'valores', np.zeros(len(colunas)) if valores is None else np.array(valores, dtype=np.float64).reshape(len(colunas)))
+
+    def __getattr__(self, nome):
+        # Chamado só para nomes que não são atributos do objeto: colunas do registro
+        posicao = object.__getattribute__(self, 'posicoes').get(nome)
+        if (posicao is None):
+            raise AttributeError(f'O registro não tem a coluna {nome}')
+
+        return self.valores[posicao]
+
+    def __setattr__(self, nome, valor):
+        self.definir(nome, valor)
+
+    def __len__(self):
+        return len(self.colunas)
+
+    def __reduce__(self):
+        return (Registro, (self.colunas, self.valores))
+
+
+    def definir(self, coluna, valor):
+        """Grava o valor numérico na coluna, recusando colunas desconhecidas (AttributeError) e valores não numéricos (TypeError)."""
+        posicao = self.posicoes.get(coluna)
+        if (posicao is None):
+            raise AttributeError(f'O registro não tem a coluna {coluna}')
+
+        if not (isinstance(valor, numbers.Real)):
+            raise TypeError(f'Valor não numérico para a coluna {coluna}: {valor!r}')
+
+        self.valores[posicao] = valor
+
+
+    def copy(self):
+        """Retorna um registro independente com os mesmos valores, compartilhando o mapa de colunas."""
+        return Registro(self.colunas, self.valores, self.posicoes)
+
+
+    def as_query(self, colunas=None):
+        """Vetor de consulta (1 x colunas) para o kneighbors: sem colunas, uma visão sem cópia do registro inteiro;
+        com colunas, apenas os valores delas, na ordem informada."""
+        if (colunas is None):
+            return self.valores.reshape(1, -1)
+
+        return self.valores[[self.posicoes[coluna] for coluna in colunas]].reshape(1, -1)
+
+
+    def para_dataframe(self, indice='idMao'):
+        """Converte o registro em um DataFrame de uma linha, no formato gravado em jogadas.csv."""
+        return tabela_registros(self.colunas, self.as_query(), indice)
+
+
+def tabela_registros(colunas, valores, indice='idMao'):
+    """DataFrame com uma linha por registro (índice zerado, como no jogadas.csv), com as colunas de valores inteiros em int64:
+    o csv mantém 1 e 24 em vez de 1.0 e 24.0, e só colunas como qualidadeMaoRobo com frações ficam em ponto flutuante."""
+    valores = np.asarray(valores, dtype=np.float64).reshape(-1, len(colunas))
+    tabela = pd.DataFrame(valores, columns=colunas, index=pd.Index(np.zeros(len(valores), dtype=np.int64), name=indice))
+    inteiras = [coluna for coluna, inteira in zip(colunas, (valores == np.round(valores)).all(axis=0)) if inteira]
+    tabela[inteiras] = tabela[inteiras].astype(np.int64)
+    return tabela
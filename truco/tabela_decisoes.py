@@ -0,0 +1,154 @@
+import itertools
+import numpy as np
+from .baralho import Baralho
+from .bot import Bot
+from .carta import Carta
+from .dados import CAMINHO_CASOS
+from .indice import obter_indice, chave_indice, caminho_indice, carregar_indice
+
+VERSAO_TABELA = 4
+# Pedidos de envido que o bot responde antes da primeira carta: (tipo, quem_pediu), como chamados pelo Envido e pelo turno do humano
+PEDIDOS_ENVIDO = [(6, 1), (7, 1), (8, 1), ('Envido', 2)]
+
+
+def maos_primeira_rodada():
+    """Enumera as mãos possíveis do bot, agrupadas pela pontuação das cartas alta, média e baixa.
+    Para cada grupo retorna a qualidade da mão, as ordens em que as pontuações podem aparecer na mão e os envidos possíveis."""
+    bot = Bot('tabela')
+    maos = {}
+    for mao in itertools.permutations(Baralho().cartas, 3):
+        pontuacao, mao_rank = mao[0].classificar_carta(list(mao))
+        if not ({'Alta', 'Media', 'Baixa'} <= set(mao_rank)):
+            # Mãos com cartas de mesma força não têm as três classificações e não chegam a ser jogadas pelo bot
+            continue
+
+        ordem = tuple(pontuacao[mao_rank.index(rank)] for rank in ['Alta', 'Media', 'Baixa'])
+        if (ordem not in maos):
+            bot.calcular_qualidade_mao(pontuacao, mao_rank)
+            maos[ordem] = {'qualidade': bot.qualidade_mao, 'pontuacoes': set(), 'envidos': set()}
+
+        maos[ordem]['pontuacoes'].add(tuple(pontuacao))
+        maos[ordem]['envidos'].add(bot.calcula_envido(list(mao)))
+
+    return maos
+
+
+def registros_primeira_rodada(dados, maos):
+    """Gera os registros possíveis na primeira rodada: o modelo zerado (bot joga primeiro) e, para cada mão,
+    o registro após a primeira carta do humano. Retorna pares (registro, mãos que podem produzi-lo)."""
+    modelo = dados.novo_registro()
+    registros = [(modelo, list(maos))]
+    numeros = sorted({carta.retornar_numero() for carta in Baralho().cartas})
+    for ordem in maos:
+        for numero in numeros:
+            dados.registro = modelo.copy()
+            dados.primeira_rodada(list(ordem), ['Alta', 'Media', 'Baixa'], maos[ordem]['qualidade'], Carta(numero, 'ESPADAS'))
+            registros.append((dados.registro, [ordem]))
+
+    return registros
+
+
+def argumentos_decisao(decisao, maos, ordens):
+    """Argumentos com que o bot pode chamar a decisão na primeira rodada, para as mãos informadas."""
+    if (decisao == 'jogar_carta'):
+        return {(1, pontuacao) for ordem in ordens for pontuacao in maos[ordem]['pontuacoes']}
+
+    if (decisao == 'truco'):
+        return {(maos[ordem]['qualidade'],) for ordem in ordens}
+
+    envidos = {envido for ordem in ordens for envido in maos[ordem]['envidos']}
+    return {(tipo, quem_pediu, envido, perdendo) for tipo, quem_pediu in PEDIDOS_ENVIDO for envido in envidos for perdendo in [False, True]}
+
+
+def consultas_decisao(cbr, decisao, registros, maos):
+    """Agrupa os argumentos da decisão pela consulta que o Cbr faria: {resumo: (consulta, argumentos)}.
+    No envido, a consulta é feita depois de gravar no registro os pontos do bot e o pedido, como em Cbr.envido."""
+    consultas = {}
+    for registro, ordens in registros:
+        argumentos = argumentos_decisao(decisao, maos, ordens)
+        if (decisao != 'envido'):
+            consulta, resumo = cbr.codificar_consulta(registro, decisao)
+            consultas.setdefault(resumo, (consulta, set()))[1].update(argumentos)
+            continue
+
+        for argumento in argumentos:
+            tipo, quem_pediu, envido, _ = argumento
+            cbr.dados.registro = registro.copy()
+            cbr.dados.pedido_envido(tipo, quem_pediu, envido)
+            consulta, resumo = cbr.codificar_consulta(cbr.dados.registro, decisao)
+            consultas.setdefault(resumo, (consulta, set()))[1].add(argumento)
+
+    return consultas
+
+
+def decidir(cbr, decisao, indices, argumentos):
+    """Aplica a decisão do Cbr a um lote de vizinhos (registros x k), um registro por tupla de argumentos."""
+    if (decisao == 'jogar_carta'):
+        return cbr.decidir_jogar_carta(indices, [rodada for rodada, _ in argumentos], [list(pontuacao) for _, pontuacao in argumentos])
+
+    if (decisao == 'truco'):
+        return cbr.decidir_truco(indices, [qualidade for qualidade, in argumentos])
+
+    tipos, quem_pediu, envidos, perdendo = zip(*argumentos)
+    return cbr.decidir_envido(indices, np.array(tipos, dtype=object), list(quem_pediu), list(envidos), list(perdendo))
+
+
+def gerar_tabela(cbr):
+    """Executa as decisões do Cbr sobre todos os estados alcançáveis da primeira rodada e retorna a tabela
+    {(decisão, resumo da consulta, *argumentos): resposta}, com a mesma expansão de vizinhos das consultas do jogo."""
+    maos = maos_primeira_rodada()
+    registro_original = cbr.dados.registro
+    try:
+        registros = registros_primeira_rodada(cbr.dados, maos)
+        consultas_decisoes = {decisao: consultas_decisao(cbr, decisao, registros, maos) for decisao in cbr.colunas_decisao}
+    finally:
+        cbr.dados.registro = registro_original
+
+    tabela = {}
+    for decisao, consultas in consultas_decisoes.items():
+        resumos = list(consultas)
+        for linhas, vizinhos in cbr.vizinhos_adaptativos(decisao, np.vstack([consultas[resumo][0] for resumo in resumos])):
+            posicoes = []
+            argumentos = []
+            for linha in linhas:
+                candidatos = sorted(consultas[resumos[linha]][1], key=repr)
+                posicoes += [linha] * len(candidatos)
+                argumentos += candidatos
+
+            if (argumentos):
+                respostas = decidir(cbr, decisao, vizinhos[np.searchsorted(linhas, posicoes)], argumentos)
+                for posicao, argumento, resposta in zip(posicoes, argumentos, respostas):
+                    tabela[(decisao, resumos[posicao]) + argumento] = int(resposta)
+
+    return tabela
+
+
+def parametros_tabela(cbr):
+    """Chave de versão da tabela: as respostas dependem da base de casos, das colunas, das partições, do backend de busca
+    e da expansão de vizinhos (suporte mínimo e k máximo)."""
+    colunas = list(cbr.colunas_decisao.items())
+    parametros = {
+        'tabela': VERSAO_TABELA, 'n_neighbors': 100, 'backend': cbr.backend, **cbr.parametros_backend, 'particao': cbr.colunas_particao,
+        'suporte_minimo': cbr.suporte_minimo_particao, 'suporte_minimo_vizinhos': cbr.suporte_minimo, 'k_maximo': cbr.k_maximo,
+    }
+    return colunas, parametros
+
+
+def obter_tabela(cbr, reconstruir=False):
+    """Retorna a tabela persistida ao lado do csv da base de casos, gerando-a apenas quando os dados de origem mudaram."""
+    colunas, parametros = parametros_tabela(cbr)
+    return obter_indice(CAMINHO_CASOS, colunas, lambda: gerar_tabela(cbr), parametros, reconstruir)
+
+
+def carregar_tabela(cbr):
+    """Carrega a tabela já gerada para a base de casos atual, sem gerá-la. Retorna None se não existir ou estiver desatualizada."""
+    colunas, parametros = parametros_tabela(cbr)
+    chave = chave_indice(CAMINHO_CASOS, colunas, parametros)
+    return carregar_indice(caminho_indice(CAMINHO_CASOS, chave), chave)
+
+
+if __name__ == '__main__':
+    # Etapa de build: gera a tabela de decisões da primeira rodada para a base de casos atual
+    from .cbr import Cbr
+    tabela = obter_tabela(Cbr(usar_tabela=False), reconstruir=True)
+    print(f'Tabela de decisões da primeira rodada gerada com {len(tabela)} estados.')